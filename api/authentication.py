@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import threading
+import time
+from collections import OrderedDict
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from api.metrics import metrics
+
+
+def get_values(obj):
+    return tuple(getattr(obj, field.attname) for field in obj._meta.concrete_fields)
+
+
+def from_values(model, db, values):
+    return model.from_db(db, [field.attname for field in model._meta.concrete_fields], values)
+
+
+class TokenCache(object):
+    """
+    Bounded LRU map of token key to `(user_id, credentials)` whose entries
+    expire `TTL` seconds after they were loaded. Only field values are kept;
+    every hit builds new `User` and `Token` instances, so what a request
+    does to `request.user` stays in that request.
+
+    Entries are dropped by the signal handlers in `api.signals` when a token
+    is deleted or its user is deactivated or deleted, but only in the
+    process that made the change: the TTL bounds how long other processes
+    keep accepting them.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def options(self):
+        options = {'MAXSIZE': 10000, 'TTL': 60}
+        options.update(getattr(settings, 'TOKEN_CACHE', {}))
+        return options
+
+    def get(self, key):
+        """
+        Return new `(user, token)` instances for `key`, or None.
+        """
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None or entry[0] < time.time():
+                self.misses += 1
+                return None
+            self.entries[key] = entry
+            self.hits += 1
+        db, user_values, token_values = entry[2]
+        user = from_values(User, db, user_values)
+        token = from_values(Token, db, token_values)
+        token.user = user
+        return user, token
+
+    def set(self, key, credentials):
+        user, token = credentials
+        options = self.options
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (time.time() + options['TTL'], user.pk, (user._state.db, get_values(user), get_values(token)))
+            while len(self.entries) > options['MAXSIZE']:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def invalidate_user(self, user_id):
+        with self.lock:
+            for key, (expires, cached_user_id, values) in list(self.entries.items()):
+                if cached_user_id == user_id:
+                    del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'size': len(self.entries),
+                'maxsize': self.options['MAXSIZE'],
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+token_cache = TokenCache()
+
+
+@metrics.register_collector
+def collect_token_cache():
+    stats = token_cache.stats()
+    return [
+        ('ticapi_token_cache_entries', "Tokens held by the authentication cache.", {(): stats['size']}),
+        ('ticapi_token_cache_lookups', "Authentication cache lookups since the process started.",
+         {(('result', 'hit'),): stats['hits'], (('result', 'miss'),): stats['misses']}),
+        ('ticapi_token_cache_evictions', "Tokens evicted from the authentication cache.", {(): stats['evictions']}),
+    ]
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    `TokenAuthentication` that looks tokens up in `token_cache` before
+    running the Token and User query.
+    """
+
+    def authenticate_credentials(self, key):
+        credentials = token_cache.get(key)
+        if credentials is None:
+            credentials = super(CachedTokenAuthentication, self).authenticate_credentials(key)
+            token_cache.set(key, credentials)
+        return credentials
+
+
+class QueryTokenAuthentication(CachedTokenAuthentication):
+    """
+    Also accepts the token as a `token` query parameter, for clients such as
+    `EventSource` that cannot set headers. Query strings are written to the
+    access logs of gunicorn and of any proxy in front of it, so whoever reads
+    those logs can use the token; this is only accepted by the event stream,
+    and deployments that log requests should strip `token` from the logged
+    URLs or have clients send the header.
+    """
+
+    def authenticate(self, request):
+        credentials = super(QueryTokenAuthentication, self).authenticate(request)
+        if credentials is None and request.query_params.get('token'):
+            return self.authenticate_credentials(request.query_params['token'])
+        return credentials
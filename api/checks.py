@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.contrib.auth.models import User
+from django.core.checks import Tags, Warning, register
+from django.db import connection
+
+from api.models import UserEmail
+
+
+@register(Tags.database)
+def check_shared_emails(app_configs, **kwargs):
+    """
+    Warn about the users that cannot log in because another user owns their
+    email in `UserEmail`, e.g. legacy accounts created before emails were
+    unique. Run by `migrate` and `check --tag database`.
+    """
+    if UserEmail._meta.db_table not in connection.introspection.table_names():
+        return []
+    users = User.objects.exclude(email='').exclude(pk__in=UserEmail.objects.values('user_id')).order_by('pk')
+    usernames = list(users.values_list('username', flat=True)[:20])
+    if not usernames:
+        return []
+    return [Warning(
+        "{} users share their email with another user and cannot log in: {}.".format(
+            users.count(), ', '.join(usernames)
+        ),
+        hint="Give each of them an email of their own.",
+        obj=UserEmail,
+        id='api.W001',
+    )]
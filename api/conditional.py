@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Conditional GET helpers. ETags are derived from version stamps the views
+can read with one cheap query, so a matching `If-None-Match` is answered
+with 304 before any task query or serializer runs.
+
+The stamps leave out values that change without a write, such as the
+relative `modified` dates and the unflushed `viewed` counts, so the ETags
+are weak: equal ETags promise an equivalent body, not the same bytes.
+"""
+from __future__ import unicode_literals
+
+import hashlib
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from django.utils.http import parse_etags, quote_etag
+
+from api.serializers import UserSerializer
+
+
+def get_user_stamp(user):
+    """
+    Return the fields of `user` embedded in every project and task payload.
+    """
+    return [getattr(user, field.attname) for field in user._meta.concrete_fields
+            if field.name not in UserSerializer.Meta.exclude]
+
+
+def make_etag(request, *parts):
+    """
+    Build a weak ETag from version stamps, the requesting user and the
+    query string (filters and cursors change the representation).
+    """
+    parts = parts + tuple(get_user_stamp(request.user)) + (request.GET.urlencode(),)
+    digest = hashlib.md5(':'.join('{}'.format(part) for part in parts).encode('utf-8')).hexdigest()
+    return 'W/' + quote_etag(digest)
+
+
+def is_not_modified(request, etag):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if not if_none_match:
+        return False
+    # If-None-Match uses the weak comparison function
+    strip = lambda value: value[2:] if value.startswith('W/') else value
+    etags = [strip(value) for value in parse_etags(if_none_match)]
+    return '*' in etags or strip(etag) in etags
+
+
+def not_modified(etag):
+    response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    response['ETag'] = etag
+    return response
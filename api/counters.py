@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import connection
+from django.db.models import F
+
+from api.metrics import metrics
+from ticapi.db import pool
+
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter(object):
+    """
+    Buffers `viewed` increments in process and writes them behind in batched
+    `UPDATE ... SET viewed = viewed + n` statements, so reading a project or
+    a task never writes (or locks) its row.
+
+    The buffer is flushed once a request finishes if `FLUSH_INTERVAL`
+    seconds went by or more than `MAX_PENDING` objects are pending, when the
+    process exits and by the `flush_view_counters` command.
+    """
+
+    batch_size = 500
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = defaultdict(int)
+        self.last_flush = time.time()
+
+    @property
+    def options(self):
+        options = {'FLUSH_INTERVAL': 5, 'MAX_PENDING': 1000}
+        options.update(getattr(settings, 'VIEW_COUNTERS', {}))
+        return options
+
+    def add(self, model, pk):
+        """
+        Count a view of the `model` row `pk`, return its unflushed views.
+        """
+        key = (model, pk)
+        with self.lock:
+            self.pending[key] += 1
+            return self.pending[key]
+
+    def incr(self, obj):
+        """
+        Count a view of `obj` and reflect the not yet flushed views of this
+        process on its `viewed` attribute.
+        """
+        obj.viewed += self.add(obj.__class__, obj.pk)
+
+    def is_due(self):
+        options = self.options
+        return self.pending and (
+            len(self.pending) >= options['MAX_PENDING'] or
+            time.time() - self.last_flush >= options['FLUSH_INTERVAL']
+        )
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, defaultdict(int)
+            self.last_flush = time.time()
+
+        batches = defaultdict(list)
+        for (model, pk), count in pending.items():
+            batches[(model, count)].append(pk)
+
+        flushed = 0
+        for (model, count), pks in batches.items():
+            for start in range(0, len(pks), self.batch_size):
+                chunk = pks[start:start + self.batch_size]
+                try:
+                    model._default_manager.filter(pk__in=chunk).update(viewed=F('viewed') + count)
+                except Exception:
+                    logger.exception("Could not flush %s view counters", model.__name__)
+                    with self.lock:
+                        for pk in chunk:
+                            self.pending[(model, pk)] += count
+                else:
+                    flushed += len(chunk)
+        # Runs after Django closed the connection of the request: hand the one
+        # opened here back to the pool instead of holding it while idle. Not
+        # pooled, the connection is kept for `CONN_MAX_AGE`.
+        if pool.get_options()['ENABLED'] and not connection.in_atomic_block:
+            connection.close()
+        return flushed
+
+    def flush_if_due(self, **kwargs):
+        if self.is_due():
+            self.flush()
+
+
+view_counter = ViewCounter()
+
+
+@metrics.register_collector
+def collect_view_counter():
+    with view_counter.lock:
+        pending = len(view_counter.pending)
+    return [('ticapi_view_counter_pending', "Objects with views not yet written to the database.", {(): pending})]
+
+request_finished.connect(view_counter.flush_if_due, dispatch_uid='api.counters.flush_if_due')
+atexit.register(view_counter.flush)
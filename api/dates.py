@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Calendar day helpers. Days are turned into half-open `[start, end)` ranges
+of aware datetimes so date filters compare the bare `created` column and
+can use its indexes.
+"""
+from __future__ import unicode_literals
+
+from datetime import datetime, time, timedelta
+
+import pytz
+
+from django.utils import timezone
+
+
+def get_timezone(name=None):
+    """
+    Return the time zone called `name`, or the current time zone.
+    """
+    if name:
+        return pytz.timezone(name)
+    return timezone.get_current_timezone()
+
+
+def get_bucket_timezone():
+    """
+    Time zone the days of `TaskDayBucket` are counted in.
+    """
+    return timezone.get_default_timezone()
+
+
+def start_of_day(day, tz):
+    # Midnight can be skipped by a DST change; is_dst picks the later instant
+    return timezone.make_aware(datetime.combine(day, time.min), tz, is_dst=False)
+
+
+def day_range(first, last, tz):
+    """
+    Return the `(start, end)` datetimes covering the days `first` to `last`
+    inclusive in `tz`. Either day may be None for an open range.
+    """
+    start = start_of_day(first, tz) if first else None
+    end = start_of_day(last + timedelta(days=1), tz) if last else None
+    return start, end
+
+
+def local_day(value, tz=None):
+    return timezone.localtime(value, tz or get_bucket_timezone()).date()
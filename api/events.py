@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+"""
+Server-sent events of project and task writes.
+
+The write paths call `publish()`, which hands the events to the broker once
+the transaction commits. The broker delivers them to the `hub` of every
+process, and the hub fans each event out to the `/api/events/` streams
+subscribed to its user or project channel. `LocalBroker` only reaches the
+streams of its own process, which is enough for a single process and for
+tests; `PostgresBroker` relays events between processes with LISTEN/NOTIFY.
+
+Events only carry ids (`{"type": "task.updated", "id": 7, "project": 3}`);
+clients fetch the rows themselves, e.g. from `/api/sync/`.
+"""
+from __future__ import unicode_literals
+
+import json
+import select
+import threading
+import time
+from collections import OrderedDict
+
+from rest_framework import renderers
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.http import StreamingHttpResponse
+from django.utils.module_loading import import_string
+from django.utils.six.moves import queue
+
+from api.metrics import metrics
+
+
+NOTIFY_CHANNEL = 'ticapi_events'
+
+
+def get_options():
+    options = {
+        'ENABLED': True, 'BROKER': None, 'QUEUE_SIZE': 100, 'HEARTBEAT': 15,
+        'MAX_AGE': 300, 'MAX_STREAMS': 8, 'RETRY': 3000,
+    }
+    options.update(getattr(settings, 'EVENTS', {}))
+    return options
+
+
+def user_channel(user_id):
+    return 'user:{}'.format(user_id)
+
+
+def project_channel(project_id):
+    return 'project:{}'.format(project_id)
+
+
+class Subscription(object):
+    """
+    Bounded queue of the events of one stream. A stream that falls behind
+    by more than `size` events is flagged `overflowed` instead of growing.
+    """
+
+    def __init__(self, channels, size):
+        self.channels = channels
+        self.queue = queue.Queue(size)
+        self.overflowed = False
+        self.closed = False
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except queue.Full:
+            self.overflowed = True
+            return False
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def clear(self):
+        self.overflowed = False
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                return
+
+
+class Hub(object):
+    """
+    Subscriptions of the streams open in this process, by channel.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.channels = {}
+        self.count = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, channels, size, limit=None):
+        """
+        Return a `Subscription` to `channels`, or None when `limit` streams
+        are already open.
+        """
+        with self.lock:
+            if limit is not None and self.count >= limit:
+                return None
+            subscription = Subscription(channels, size)
+            for channel in channels:
+                self.channels.setdefault(channel, set()).add(subscription)
+            self.count += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            if subscription.closed:
+                return
+            subscription.closed = True
+            for channel in subscription.channels:
+                subscriptions = self.channels.get(channel)
+                if subscriptions is not None:
+                    subscriptions.discard(subscription)
+                    if not subscriptions:
+                        del self.channels[channel]
+            self.count -= 1
+
+    def dispatch(self, channels, event):
+        """
+        Queue `event` once on every subscription to any of `channels`.
+        """
+        with self.lock:
+            targets = set()
+            for channel in channels:
+                targets.update(self.channels.get(channel, ()))
+        delivered = sum(1 for subscription in targets if subscription.put(event))
+        with self.lock:
+            self.delivered += delivered
+            self.dropped += len(targets) - delivered
+
+    def broadcast(self, event):
+        with self.lock:
+            targets = set(subscription for subscriptions in self.channels.values() for subscription in subscriptions)
+        for subscription in targets:
+            subscription.put(event)
+
+
+hub = Hub()
+
+
+class LocalBroker(object):
+    """
+    Carries published `{'channels': [...], 'event': {...}}` messages to the
+    hub of this process only. Brokers reaching other processes override
+    `publish` and `start`.
+    """
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def publish(self, messages):
+        for message in messages:
+            self.hub.dispatch(message['channels'], message['event'])
+
+    def start(self):
+        """
+        Start delivering messages to this process, called when a stream opens.
+        """
+
+
+class PostgresBroker(LocalBroker):
+    """
+    Sends messages with `pg_notify` and listens for them on a dedicated
+    connection, in a thread started by the first stream of the process.
+    """
+    # NOTIFY payloads are limited to 8000 bytes
+    max_payload = 7000
+    poll_interval = 5
+
+    def __init__(self, hub):
+        super(PostgresBroker, self).__init__(hub)
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def publish(self, messages):
+        payloads = []
+        for message in messages:
+            data = json.dumps(message, separators=(',', ':'))
+            if payloads and len(payloads[-1]) + len(data) + 1 < self.max_payload:
+                payloads[-1] += ',' + data
+            else:
+                payloads.append(data)
+        with connection.cursor() as cursor:
+            for payload in payloads:
+                cursor.execute('SELECT pg_notify(%s, %s)', [NOTIFY_CHANNEL, '[' + payload + ']'])
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='api.events.PostgresBroker')
+                self.thread.daemon = True
+                self.thread.start()
+
+    def listen(self):
+        # Held by this thread for good and reopened whenever it breaks, so it
+        # must not be checked out of the pool of `ticapi.db.pool`.
+        connect = getattr(connection, 'get_unpooled_connection', connection.get_new_connection)
+        listener = connect(connection.get_connection_params())
+        try:
+            listener.autocommit = True
+            listener.cursor().execute('LISTEN {}'.format(NOTIFY_CHANNEL))
+        except Exception:
+            listener.close()
+            raise
+        return listener
+
+    def run(self):
+        while True:
+            try:
+                listener = self.listen()
+            except Exception:
+                time.sleep(self.poll_interval)
+                continue
+            # Events sent while the listener was away are lost
+            self.hub.broadcast({'type': 'resync'})
+            try:
+                while True:
+                    if select.select([listener], [], [], self.poll_interval) == ([], [], []):
+                        continue
+                    listener.poll()
+                    while listener.notifies:
+                        for message in json.loads(listener.notifies.pop(0).payload):
+                            self.hub.dispatch(message['channels'], message['event'])
+            except Exception:
+                try:
+                    listener.close()
+                except Exception:
+                    pass
+                time.sleep(self.poll_interval)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """
+    Return the broker of the process: `EVENTS['BROKER']` when set, otherwise
+    `PostgresBroker` on PostgreSQL and `LocalBroker` elsewhere.
+    """
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = get_options()['BROKER']
+                if path:
+                    broker_class = import_string(path)
+                elif connection.vendor == 'postgresql':
+                    broker_class = PostgresBroker
+                else:
+                    broker_class = LocalBroker
+                _broker = broker_class(hub)
+    return _broker
+
+
+def publish(event_type, rows):
+    """
+    Publish an `event_type` event for each `(id, user_id, project_id)` row
+    to the user and project channels once the current transaction commits.
+    """
+    if not get_options()['ENABLED']:
+        return
+    messages = [
+        {
+            'channels': [user_channel(user_id), project_channel(project_id)],
+            'event': OrderedDict([('type', event_type), ('id', object_id), ('project', project_id)]),
+        }
+        for object_id, user_id, project_id in rows
+    ]
+    if messages:
+        transaction.on_commit(lambda: get_broker().publish(messages))
+
+
+def format_event(event):
+    return 'event: {}\ndata: {}\n\n'.format(event['type'], json.dumps(event, separators=(',', ':')))
+
+
+def stream(subscription, options):
+    """
+    Yield the `text/event-stream` body of a subscription: its events, a
+    comment every `HEARTBEAT` seconds so proxies keep the connection open,
+    and a `resync` event when events were dropped. Ends after `MAX_AGE`
+    seconds; browsers reconnect after `RETRY` milliseconds.
+    """
+    try:
+        # Release the database connection of the request while the stream waits
+        connection.close()
+        yield 'retry: {}\n\n'.format(options['RETRY'])
+        deadline = time.time() + options['MAX_AGE']
+        while time.time() < deadline:
+            event = subscription.get(min(options['HEARTBEAT'], max(deadline - time.time(), 0)))
+            if subscription.overflowed:
+                subscription.clear()
+                yield format_event({'type': 'resync'})
+            elif event is None:
+                yield ': keepalive\n\n'
+            else:
+                yield format_event(event)
+    finally:
+        hub.unsubscribe(subscription)
+
+
+class EventStreamResponse(StreamingHttpResponse):
+    """
+    Streams a subscription and releases it when the server closes the
+    response, even if the client went away before the body was read.
+    """
+
+    def __init__(self, subscription, options):
+        super(EventStreamResponse, self).__init__(stream(subscription, options), content_type='text/event-stream')
+        self.subscription = subscription
+        self['Cache-Control'] = 'no-cache'
+        self['X-Accel-Buffering'] = 'no'
+
+    def close(self):
+        hub.unsubscribe(self.subscription)
+        super(EventStreamResponse, self).close()
+
+
+class EventStreamRenderer(renderers.BaseRenderer):
+    """
+    Lets `Accept: text/event-stream` requests through content negotiation;
+    only the error responses of the stream view are rendered with it.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return format_event(dict(data, type='error')).encode('utf-8')
+
+
+@metrics.register_collector
+def collect_event_streams():
+    with hub.lock:
+        count, delivered, dropped = hub.count, hub.delivered, hub.dropped
+    return [
+        ('ticapi_event_streams', "Open server-sent event streams.", {(): count}),
+        ('ticapi_events_delivered', "Events queued on streams since the process started.", {(): delivered}),
+        ('ticapi_events_dropped', "Events dropped from streams that fell behind.", {(): dropped}),
+    ]
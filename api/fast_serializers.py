@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Read-only fast path for the list endpoints.
+
+`CompiledSerializer` reads the field declarations of an existing
+`ModelSerializer` once and generates a function turning one `.values()` row
+into the same `OrderedDict` the serializer would build from a model
+instance. Nested serializers listed in `nested_serializers` are compiled
+into the same row (their columns are read through the join) and memoized
+by foreign key, `SerializerMethodField`s call the serializer's own method
+with a proxy exposing the row as attributes, and every other field goes
+through its `to_representation`, so the rendered JSON is byte-identical.
+"""
+from __future__ import unicode_literals
+
+import threading
+from collections import OrderedDict
+
+from rest_framework import serializers
+
+from api.metrics import metrics
+
+
+class RowProxy(object):
+    """
+    Attribute access to the columns of a `.values()` row, for the methods of
+    `SerializerMethodField`s.
+    """
+    __slots__ = ('row', 'prefix', 'pk_name')
+
+    def __init__(self, row, prefix, pk_name):
+        self.row = row
+        self.prefix = prefix
+        self.pk_name = pk_name
+
+    def __getattr__(self, name):
+        if name == 'pk':
+            name = self.pk_name
+        try:
+            return self.row[self.prefix + name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+MISSING = object()
+
+
+class CompiledSerializer(object):
+    # Fields whose `to_representation` is the identity for the values the
+    # database adapters return.
+    passthrough_fields = (serializers.IntegerField, serializers.CharField)
+
+    def __init__(self, serializer_class, prefix=''):
+        self.serializer_class = serializer_class
+        self.prefix = prefix
+        self.model = serializer_class.Meta.model
+        self.columns = [prefix + field.attname for field in self.model._meta.concrete_fields]
+        self.function = self.compile()
+
+    def compile(self):
+        serializer = self.serializer_class(context={})
+        nested_serializers = getattr(self.serializer_class, 'nested_serializers', {})
+        namespace = {
+            'OrderedDict': OrderedDict,
+            'RowProxy': RowProxy,
+            'MISSING': MISSING,
+        }
+        lines = []
+        items = []
+
+        for index, field in enumerate(serializer._readable_fields):
+            name = field.field_name
+            value = 'value_{}'.format(index)
+
+            if name in nested_serializers:
+                nested = CompiledSerializer(nested_serializers[name], '{}{}__'.format(self.prefix, name))
+                self.columns += [column for column in nested.columns if column not in self.columns]
+                key = self.prefix + self.model._meta.get_field(name).attname
+                namespace['nested_{}'.format(index)] = nested.function
+                namespace['class_{}'.format(index)] = nested.serializer_class
+                lines += [
+                    '    key = (class_{}, row[{!r}])'.format(index, key),
+                    '    {} = memo.get(key, MISSING)'.format(value),
+                    '    if {} is MISSING:'.format(value),
+                    '        {} = memo[key] = nested_{}(row, memo)'.format(value, index),
+                ]
+
+            elif isinstance(field, serializers.SerializerMethodField):
+                namespace['method_{}'.format(index)] = getattr(serializer, field.method_name)
+                lines.append('    {} = method_{}(proxy)'.format(value, index))
+
+            else:
+                if field.source == '*' or '.' in field.source:
+                    raise ValueError("Cannot compile field '{}' of {}".format(name, self.serializer_class.__name__))
+                column = self.prefix + self.model._meta.get_field(field.source).attname
+                if isinstance(field, self.passthrough_fields + (serializers.PrimaryKeyRelatedField,)):
+                    lines.append('    {} = row[{!r}]'.format(value, column))
+                else:
+                    namespace['convert_{}'.format(index)] = field.to_representation
+                    lines += [
+                        '    {} = row[{!r}]'.format(value, column),
+                        '    if {} is not None:'.format(value),
+                        '        {} = convert_{}({})'.format(value, index, value),
+                    ]
+            items.append('({!r}, {})'.format(name, value))
+
+        source = '\n'.join(
+            ['def serialize(row, memo):',
+             '    proxy = RowProxy(row, {!r}, {!r})'.format(self.prefix, self.model._meta.pk.attname)] +
+            lines +
+            ['    return OrderedDict([{}])'.format(', '.join(items))]
+        )
+        exec(compile(source, '<compiled {}>'.format(self.serializer_class.__name__), 'exec'), namespace)
+        return namespace['serialize']
+
+    def values(self, queryset):
+        """
+        Return `queryset` as `.values()` rows holding every column the
+        compiled function reads.
+        """
+        return queryset.values(*self.columns)
+
+    def serialize(self, rows, memo=None):
+        memo = {} if memo is None else memo
+        function = self.function
+        with metrics.timer('serialize'):
+            return [function(row, memo) for row in rows]
+
+
+_compiled = {}
+_lock = threading.Lock()
+
+
+def get_compiled(serializer_class):
+    """
+    Return the `CompiledSerializer` of `serializer_class`, compiling it once
+    per process.
+    """
+    compiled = _compiled.get(serializer_class)
+    if compiled is None:
+        with _lock:
+            compiled = _compiled.get(serializer_class)
+            if compiled is None:
+                compiled = _compiled[serializer_class] = CompiledSerializer(serializer_class)
+    return compiled
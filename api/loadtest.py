@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Helpers of the load testing commands: concurrent HTTP clients, latency
+statistics and a gunicorn server started for the duration of a run.
+"""
+from __future__ import division, unicode_literals
+
+import math
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+from django.conf import settings
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of the sorted list `values`.
+    """
+    if not values:
+        return None
+    return values[max(int(math.ceil(fraction * len(values))) - 1, 0)]
+
+
+def summarize(latencies, errors, elapsed):
+    """
+    Return the throughput and latency percentiles, in milliseconds, of one run.
+    """
+    latencies = sorted(latencies)
+    milliseconds = lambda value: round(value * 1000, 2) if value is not None else None
+    return OrderedDict([
+        ('requests', len(latencies) + errors),
+        ('errors', errors),
+        ('seconds', round(elapsed, 3)),
+        ('throughput', round(len(latencies) / elapsed, 1) if elapsed else None),
+        ('p50', milliseconds(percentile(latencies, 0.50))),
+        ('p95', milliseconds(percentile(latencies, 0.95))),
+        ('p99', milliseconds(percentile(latencies, 0.99))),
+        ('max', milliseconds(latencies[-1] if latencies else None)),
+    ])
+
+
+def run_clients(request, clients, count, session_factory=None):
+    """
+    Call `request(session, client, number)` `count` times from each of
+    `clients` threads, every thread with its own session made by
+    `session_factory(client)`, a keep-alive `requests.Session` by default.
+    `request` returns whether the response was a success. Returns
+    `(latencies, errors, elapsed)`.
+    """
+    lock = threading.Lock()
+    latencies = []
+    errors = [0]
+    start_event = threading.Event()
+
+    def run(client):
+        session = session_factory(client) if session_factory else requests.Session()
+        own = []
+        failed = 0
+        start_event.wait()
+        for number in range(count):
+            start = time.time()
+            try:
+                ok = request(session, client, number)
+            except requests.RequestException:
+                ok = False
+            if ok:
+                own.append(time.time() - start)
+            else:
+                failed += 1
+        if hasattr(session, 'close'):
+            session.close()
+        with lock:
+            latencies.extend(own)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=run, args=(client,)) for client in range(clients)]
+    for thread in threads:
+        thread.start()
+    start = time.time()
+    start_event.set()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0], time.time() - start
+
+
+class Server(object):
+    """
+    Run `gunicorn ticapi.wsgi` with `ticapi/gunicorn_conf.py` and the given
+    environment overrides while the context is active.
+    """
+    startup_timeout = 30
+
+    def __init__(self, port, **environ):
+        self.port = port
+        self.environ = environ
+        self.process = None
+
+    @property
+    def base_url(self):
+        return 'http://127.0.0.1:{}'.format(self.port)
+
+    def __enter__(self):
+        environ = dict(os.environ, PORT=str(self.port), **dict((key, str(value)) for key, value in self.environ.items()))
+        self.process = subprocess.Popen(
+            [sys.executable, '-c', 'from gunicorn.app.wsgiapp import run; run()',
+             '--config', os.path.join(settings.BASE_DIR, 'ticapi', 'gunicorn_conf.py'),
+             '--bind', '127.0.0.1:{}'.format(self.port), 'ticapi.wsgi'],
+            cwd=settings.BASE_DIR, env=environ
+        )
+        deadline = time.time() + self.startup_timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("gunicorn exited with status {}".format(self.process.returncode))
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=1).close()
+                return self
+            except socket.error:
+                time.sleep(0.2)
+        self.__exit__(None, None, None)
+        raise RuntimeError("gunicorn did not start listening on port {}".format(self.port))
+
+    def __exit__(self, *args):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            self.process.wait()
@@ -0,0 +1,66 @@
+from __future__ import division
+
+import time
+
+from rest_framework.renderers import JSONRenderer
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.fast_serializers import get_compiled
+from api.models import Project, Task
+from api.seed import seed_dataset
+from api.serializers import ProjectSerializer, TaskSerializer
+
+
+class Command(BaseCommand):
+    help = ("Compares the DRF serializers with their compiled fast path on a seeded dataset "
+            "that is rolled back afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=200)
+        parser.add_argument('--tasks', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def best_of(self, repeat, function):
+        timings = []
+        for _ in range(repeat):
+            start = time.time()
+            result = function()
+            timings.append(time.time() - start)
+        return min(timings), result
+
+    def compare(self, label, serializer_class, queryset, repeat):
+        compiled = get_compiled(serializer_class)
+        renderer = JSONRenderer()
+
+        instances = list(serializer_class.setup_eager_loading(queryset))
+        rows = list(compiled.values(queryset))
+        slow, slow_data = self.best_of(repeat, lambda: serializer_class(
+            instances, many=True, context={'nested_cache': {}}
+        ).data)
+        fast, fast_data = self.best_of(repeat, lambda: compiled.serialize(rows))
+        if renderer.render(slow_data) != renderer.render(fast_data):
+            raise CommandError("{}: compiled output differs from {}".format(label, serializer_class.__name__))
+
+        slow_total, _ = self.best_of(repeat, lambda: renderer.render(serializer_class(
+            serializer_class.setup_eager_loading(queryset), many=True, context={'nested_cache': {}}
+        ).data))
+        fast_total, _ = self.best_of(repeat, lambda: renderer.render(compiled.serialize(compiled.values(queryset))))
+
+        self.stdout.write("{} ({} rows)".format(label, len(rows)))
+        self.stdout.write("  serialize only     DRF {:8.1f} ms  compiled {:8.1f} ms  {:5.1f}x".format(
+            slow * 1000, fast * 1000, slow / fast))
+        self.stdout.write("  query + render     DRF {:8.1f} ms  compiled {:8.1f} ms  {:5.1f}x".format(
+            slow_total * 1000, fast_total * 1000, slow_total / fast_total))
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = seed_dataset(users=1, projects=1, tasks=options['tasks'], prefix='bench_serializers_')[0]
+            seed_dataset(users=1, projects=options['projects'], tasks=0, prefix='bench_serializers_projects_')
+            project = Project.objects.get(user=user)
+            self.compare('Project list', ProjectSerializer,
+                         Project.objects.exclude(user=user).order_by('-viewed', '-created'), options['repeat'])
+            self.compare('Task list', TaskSerializer,
+                         Task.objects.filter(project=project).order_by('-created'), options['repeat'])
+            transaction.set_rollback(True)
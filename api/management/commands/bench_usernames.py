@@ -0,0 +1,62 @@
+from __future__ import division
+
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from api.utils import create_username
+
+
+def probe_username(name):
+    """
+    The previous `create_username`: probe name, name1, name2, ... until free.
+    """
+    name = ''.join(e for e in name if e.isalnum())[:29]
+    base_name = name
+    ctr = 1
+    while User.objects.filter(username=name).exists() or User.objects.filter(username=name).exists():
+        name = base_name + str(ctr)
+        ctr += 1
+    return name
+
+
+class Command(BaseCommand):
+    help = ("Compares probing usernames one by one with the counter based allocator on a table of "
+            "colliding names that is rolled back afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--existing', type=int, default=5000, help="Users already named after the base.")
+        parser.add_argument('--signups', type=int, default=20)
+        parser.add_argument('--name', default='John Smith')
+
+    def measure(self, label, allocate, name, signups):
+        usernames = []
+        queries = 0
+        elapsed = 0
+        for _ in range(signups):
+            # The query log is bounded, so it is emptied before every signup
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as captured:
+                start = time.time()
+                username = allocate(name)
+                elapsed += time.time() - start
+            queries += len(captured)
+            User.objects.create(username=username)
+            usernames.append(username)
+        self.stdout.write("{:10} {:8.1f} ms/signup {:10.1f} queries/signup   last {}".format(
+            label, elapsed * 1000 / signups, queries / signups, usernames[-1]
+        ))
+
+    def handle(self, *args, **options):
+        base = ''.join(e for e in options['name'].title() if e.isalnum())[:29]
+        with transaction.atomic():
+            User.objects.bulk_create([
+                User(username=base + (str(number) if number else '')) for number in range(options['existing'])
+            ])
+            self.stdout.write("{} users named {}, {} signups each".format(options['existing'], base, options['signups']))
+            self.measure('probe', probe_username, options['name'].title(), options['signups'])
+            self.measure('counter', create_username, options['name'].title(), options['signups'])
+            transaction.set_rollback(True)
@@ -0,0 +1,249 @@
+from __future__ import division
+
+import itertools
+import json
+import platform
+import threading
+from collections import OrderedDict
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api import urls as api_urls
+from api.loadtest import run_clients, summarize
+from api.models import Project, Task
+from api.seed import check_confirmed, delete_dataset, seed_dataset
+
+
+class BenchmarkClient(Client):
+    """
+    Test client of one benchmark thread; closing it closes the thread's
+    database connection.
+    """
+
+    def close(self):
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = ("Seeds users x projects x tasks, drives every route of api/urls.py with concurrent clients "
+            "(in process through the test client, or against --base-url) and reports the latency "
+            "percentiles, throughput and query counts of each route. Results can be saved with --output "
+            "and compared with an earlier run with --compare. The dataset is committed to the configured "
+            "database, so the command requires --yes.")
+    prefix = 'benchmark_api_'
+
+    # (label, view, method, path and data of request `number` for a fixture);
+    # DELETE is left out, it would remove the rows the other scenarios read.
+    scenarios = [
+        ('POST /api/signup/', 'SignUpViewSet', 'post', lambda fixture, number: ('/api/signup/', {
+            'full_name': 'Benchmark User', 'email': '{}signup_{}@example.com'.format(Command.prefix, next(Command.signups)),
+            'password': 'password'
+        })),
+        ('POST /api/auth/', 'AuthenticateUserViewSet', 'post', lambda fixture, number: ('/api/auth/', {
+            'email': fixture['email'], 'password': 'password'
+        })),
+        ('GET /api/projects/', 'ProjectListViewSet', 'get', lambda fixture, number: ('/api/projects/', None)),
+        ('GET /api/projects/?q=', 'ProjectListViewSet', 'get', lambda fixture, number: ('/api/projects/?q=alpha', None)),
+        ('POST /api/projects/', 'ProjectListViewSet', 'post', lambda fixture, number: ('/api/projects/', {
+            'name': 'Benchmark project {}'.format(number), 'description': 'created by benchmark_api'
+        })),
+        ('GET /api/projects/summary/', 'ProjectSummaryViewSet', 'get', lambda fixture, number: ('/api/projects/summary/', None)),
+        ('GET /api/projects/<pk>/', 'ProjectDetailViewSet', 'get', lambda fixture, number: (
+            '/api/projects/{}/'.format(Command.pick(fixture['projects'], number)), None
+        )),
+        ('GET /api/projects/<pk>/?q=', 'ProjectDetailViewSet', 'get', lambda fixture, number: (
+            '/api/projects/{}/?q=bravo'.format(Command.pick(fixture['projects'], number)), None
+        )),
+        ('PUT /api/projects/<pk>/', 'ProjectDetailViewSet', 'put', lambda fixture, number: (
+            '/api/projects/{}/'.format(Command.pick(fixture['projects'], number)),
+            {'name': 'Renamed project {}'.format(number), 'description': 'updated by benchmark_api'}
+        )),
+        ('GET /api/projects/<pk>/calendar/', 'ProjectCalendarViewSet', 'get', lambda fixture, number: (
+            '/api/projects/{}/calendar/?interval=week'.format(Command.pick(fixture['projects'], number)), None
+        )),
+        ('POST /api/tasks/', 'TaskCreateViewSet', 'post', lambda fixture, number: ('/api/tasks/', {
+            'name': 'Benchmark task {}'.format(number), 'description': 'created by benchmark_api',
+            'project': Command.pick(fixture['projects'], number)
+        })),
+        ('GET /api/tasks/<pk>/', 'TaskDetailViewSet', 'get', lambda fixture, number: (
+            '/api/tasks/{}/'.format(Command.pick(fixture['tasks'], number)), None
+        )),
+        ('PUT /api/tasks/<pk>/', 'TaskDetailViewSet', 'put', lambda fixture, number: (
+            '/api/tasks/{}/'.format(Command.pick(fixture['tasks'], number)),
+            {'name': 'Renamed task {}'.format(number), 'description': 'updated by benchmark_api', 'status': number % 3}
+        )),
+        ('POST /api/tasks/bulk/', 'TaskBulkViewSet', 'post', lambda fixture, number: ('/api/tasks/bulk/', {
+            'create': [
+                {'name': 'Bulk task {}'.format(item), 'description': 'created by benchmark_api',
+                 'project': Command.pick(fixture['projects'], number)}
+                for item in range(10)
+            ],
+            'update': [
+                {'id': Command.pick(fixture['tasks'], number + item), 'name': 'Bulk renamed {}'.format(item),
+                 'description': 'updated by benchmark_api'}
+                for item in range(10)
+            ]
+        })),
+        ('GET /api/sync/', 'SyncViewSet', 'get', lambda fixture, number: ('/api/sync/?limit=100', None)),
+    ]
+    # Long-lived responses without a latency to measure, and the metrics,
+    # which the seeded users may not read
+    skipped_views = ('EventStreamViewSet', 'MetricsViewSet')
+    signups = itertools.count()
+
+    @staticmethod
+    def pick(values, number):
+        return values[number % len(values)]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=4)
+        parser.add_argument('--projects', type=int, default=10, help="Projects per user.")
+        parser.add_argument('--tasks', type=int, default=100, help="Tasks per project.")
+        parser.add_argument('--clients', type=int, default=4, help="Concurrent clients per route.")
+        parser.add_argument('--requests', type=int, default=25, help="Requests per client and route.")
+        parser.add_argument('--base-url', help="Drive a running server instead of the in-process test client.")
+        parser.add_argument('--only', help="Comma separated view names to run.")
+        parser.add_argument('--output', help="Write the results to this JSON file.")
+        parser.add_argument('--compare', help="Compare with the results of an earlier --output file.")
+        parser.add_argument('--max-regression', type=float, default=0.25,
+                            help="Fail when a route's p95 grows by more than this fraction over --compare.")
+        parser.add_argument('--yes', action='store_true', help="Confirm seeding the configured database.")
+
+    def get_fixtures(self, users):
+        fixtures = []
+        for user in users:
+            projects = list(Project.objects.filter(user=user).order_by('pk').values_list('pk', flat=True))
+            tasks = list(Task.objects.filter(project__user=user, delete=False).order_by('pk').values_list('pk', flat=True))
+            fixtures.append({
+                'token': user.auth_token.key,
+                'email': user.email,
+                'projects': projects,
+                'tasks': tasks,
+            })
+        return fixtures
+
+    def check_coverage(self, scenarios):
+        views = set(scenario[1] for scenario in scenarios)
+        for pattern in api_urls.urlpatterns:
+            name = pattern.callback.view_class.__name__
+            if name not in views and name not in self.skipped_views:
+                self.stderr.write("No benchmark scenario for {} ({})".format(pattern.regex.pattern, name))
+
+    def get_session_factory(self, fixtures, base_url):
+        if base_url:
+            return None
+
+        def session_factory(client):
+            return BenchmarkClient(HTTP_AUTHORIZATION='Token {}'.format(fixtures[client % len(fixtures)]['token']))
+        return session_factory
+
+    def run_scenario(self, method, build, fixtures, options):
+        lock = threading.Lock()
+        queries = []
+        base_url = (options['base_url'] or '').rstrip('/')
+
+        def request(session, client, number):
+            fixture = fixtures[client % len(fixtures)]
+            path, data = build(fixture, number)
+            if base_url:
+                response = session.request(
+                    method, base_url + path, json=data, timeout=60,
+                    headers={'Authorization': 'Token {}'.format(fixture['token'])}
+                )
+                code, body = response.status_code, response.content
+            else:
+                kwargs = {} if data is None else {'data': json.dumps(data), 'content_type': 'application/json'}
+                with CaptureQueriesContext(connection) as captured:
+                    response = getattr(session, method)(path, **kwargs)
+                with lock:
+                    queries.append(len(captured))
+                code, body = response.status_code, response.content
+            if code != 200:
+                return False
+            return not body.startswith(b'{') or json.loads(body.decode('utf-8'))['status']['isSuccess']
+
+        latencies, errors, elapsed = run_clients(
+            request, options['clients'], options['requests'], self.get_session_factory(fixtures, base_url)
+        )
+        stats = summarize(latencies, errors, elapsed)
+        stats['queries'] = round(sum(queries) / len(queries), 1) if queries else None
+        stats['max_queries'] = max(queries) if queries else None
+        return stats
+
+    def compare(self, results, baseline, max_regression):
+        regressions = []
+        self.stdout.write("\nCompared with {}".format(baseline['meta'].get('started')))
+        for label, stats in results['routes'].items():
+            before = baseline['routes'].get(label)
+            if not before or not before.get('p95') or not stats.get('p95'):
+                continue
+            change = stats['p95'] / before['p95'] - 1
+            flag = ''
+            if change > max_regression:
+                flag = '  REGRESSION'
+                regressions.append(label)
+            self.stdout.write("  {:36} p95 {:9.2f} -> {:9.2f} ms ({:+6.1%})  queries {} -> {}{}".format(
+                label, before['p95'], stats['p95'], change, before.get('queries'), stats.get('queries'), flag
+            ))
+        return regressions
+
+    def handle(self, *args, **options):
+        check_confirmed(options, self.prefix)
+        scenarios = self.scenarios
+        if options['only']:
+            names = options['only'].split(',')
+            scenarios = [scenario for scenario in scenarios if scenario[1] in names]
+        else:
+            self.check_coverage(scenarios)
+
+        delete_dataset(self.prefix)
+        users = seed_dataset(
+            users=options['users'], projects=options['projects'], tasks=options['tasks'], prefix=self.prefix, index=True
+        )
+        results = OrderedDict([
+            ('meta', OrderedDict([
+                ('started', timezone.now().isoformat()),
+                ('target', options['base_url'] or 'test client'),
+                ('database', connection.vendor),
+                ('python', platform.python_version()),
+                ('django', django.get_version()),
+                ('dataset', OrderedDict([(name, options[name]) for name in ('users', 'projects', 'tasks')])),
+                ('clients', options['clients']),
+                ('requests', options['requests']),
+            ])),
+            ('routes', OrderedDict()),
+        ])
+        try:
+            fixtures = self.get_fixtures(users)
+            self.stdout.write("{:36} {:>7} {:>6} {:>9} {:>9} {:>9} {:>9} {:>8}".format(
+                'route', 'req', 'errors', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms', 'queries'
+            ))
+            for label, view, method, build in scenarios:
+                stats = self.run_scenario(method, build, fixtures, options)
+                results['routes'][label] = stats
+                self.stdout.write("{:36} {:>7} {:>6} {:>9} {:>9} {:>9} {:>9} {:>8}".format(
+                    label, stats['requests'], stats['errors'], stats['throughput'],
+                    stats['p50'], stats['p95'], stats['p99'], stats['queries']
+                ))
+        finally:
+            delete_dataset(self.prefix)
+            User.objects.filter(email__startswith='{}signup_'.format(self.prefix), email__endswith='@example.com').delete()
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+            self.stdout.write("Results written to {}".format(options['output']))
+
+        if options['compare']:
+            with open(options['compare']) as baseline:
+                regressions = self.compare(results, json.load(baseline), options['max_regression'])
+            if regressions:
+                raise CommandError("p95 regressed by more than {:.0%} on: {}".format(
+                    options['max_regression'], ', '.join(regressions)
+                ))
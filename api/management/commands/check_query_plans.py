@@ -0,0 +1,113 @@
+import json
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from api.models import Project, Task
+from api.seed import seed_dataset
+
+
+# Plan lines that read a whole hot table
+SEQUENTIAL_SCANS = {
+    'postgresql': re.compile(r'Seq Scan on (api_project|api_task)\b'),
+    'sqlite': re.compile(r'^SCAN (TABLE )?(api_project|api_task)\b(?!.*\bUSING (COVERING )?INDEX\b)'),
+}
+
+
+class Command(BaseCommand):
+    help = ("Seeds a large dataset, requests every read endpoint, runs EXPLAIN on the queries "
+            "they issue and fails if any of them scans api_project or api_task sequentially. "
+            "The dataset is rolled back afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--projects', type=int, default=50)
+        parser.add_argument('--tasks', type=int, default=200)
+
+    def get_urls(self, project, task):
+        return [
+            '/api/projects/',
+            '/api/projects/?q=alpha',
+            '/api/projects/?search=alpha',
+            '/api/projects/?page_size=10',
+            '/api/projects/summary/',
+            '/api/projects/{}/'.format(project.pk),
+            '/api/projects/{}/?page_size=10'.format(project.pk),
+            '/api/projects/{}/?status=1'.format(project.pk),
+            '/api/projects/{}/?q=bravo'.format(project.pk),
+            '/api/projects/{}/?search=bravo'.format(project.pk),
+            '/api/projects/{}/?from={:%Y-%m-%d}'.format(project.pk, task.created),
+            '/api/projects/{}/?from={:%Y-%m-%d}&to={:%Y-%m-%d}'.format(project.pk, task.created, task.created),
+            '/api/projects/{}/?from={:%Y-%m-%d}&tz=Asia/Kolkata'.format(project.pk, task.created),
+            '/api/projects/{}/calendar/'.format(project.pk),
+            '/api/projects/{}/calendar/?from={:%Y-%m-%d}&interval=month'.format(project.pk, task.created),
+            '/api/tasks/{}/'.format(task.pk),
+            '/api/sync/?limit=100',
+        ]
+
+    def explain(self, sql):
+        vendor = connection.vendor
+        with connection.cursor() as cursor:
+            if vendor == 'sqlite':
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                return [row[-1] for row in cursor.fetchall()]
+            cursor.execute('EXPLAIN ' + sql)
+            return [row[0] for row in cursor.fetchall()]
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            for table in ('auth_user', 'api_project', 'api_task'):
+                cursor.execute('ANALYZE {}'.format(table))
+
+    def handle(self, *args, **options):
+        pattern = SEQUENTIAL_SCANS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError("Query plans can only be checked on PostgreSQL and SQLite.")
+
+        failures = []
+        with transaction.atomic():
+            users = seed_dataset(
+                users=options['users'], projects=options['projects'], tasks=options['tasks'],
+                prefix='check_query_plans_', index=True
+            )
+            self.analyze()
+
+            user = users[0]
+            project = Project.objects.filter(user=user).first()
+            task = Task.objects.filter(project=project, delete=False).first()
+            client = Client(HTTP_AUTHORIZATION='Token {}'.format(user.auth_token.key))
+            urls = self.get_urls(project, task)
+
+            for url in urls:
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(url)
+                if response.status_code != 200:
+                    raise CommandError("{} answered {}".format(url, response.status_code))
+                # Follow the first `next` link to check the keyset filter too
+                next_url = json.loads(response.content.decode('utf-8')).get('next')
+                if next_url and 'cursor=' not in url:
+                    urls.append(next_url)
+
+                self.stdout.write(url)
+                for query in queries.captured_queries:
+                    sql = query['sql']
+                    if not sql.startswith('SELECT'):
+                        continue
+                    plan = self.explain(sql)
+                    scans = [line for line in plan if pattern.search(line.strip())]
+                    self.stdout.write("  {} {}".format('SEQ SCAN' if scans else 'ok      ', sql[:100]))
+                    for line in plan:
+                        self.stdout.write("      {}".format(line))
+                    if scans:
+                        failures.append((url, sql))
+
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError("{} queries scan a hot table sequentially:\n{}".format(
+                len(failures), '\n'.join('{}: {}'.format(url, sql) for url, sql in failures)
+            ))
+        self.stdout.write("No sequential scans of api_project or api_task.")
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from api.counters import view_counter
+
+
+class Command(BaseCommand):
+    help = "Writes the buffered project and task view counts of this process to the database."
+
+    def handle(self, *args, **options):
+        self.stdout.write("Flushed view counters of {} objects.".format(view_counter.flush()))
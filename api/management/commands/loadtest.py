@@ -0,0 +1,78 @@
+from __future__ import division
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.loadtest import Server, run_clients, summarize
+from api.models import Project, Task
+from api.seed import check_confirmed, delete_dataset, seed_dataset
+
+
+class Command(BaseCommand):
+    help = ("Runs concurrent clients against the read endpoints of a gunicorn server started in each "
+            "worker mode (or of --base-url) and prints the throughput and latency of every mode. "
+            "The dataset is committed to the configured database, so the command requires --yes.")
+    prefix = 'loadtest_'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', help="Load a running server instead of starting gunicorn.")
+        parser.add_argument('--modes', default='sync,gthread', help="Comma separated gunicorn worker classes.")
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--clients', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=20, help="Requests per client.")
+        parser.add_argument('--projects', type=int, default=20)
+        parser.add_argument('--tasks', type=int, default=100)
+        parser.add_argument('--yes', action='store_true', help="Confirm seeding the configured database.")
+
+    def get_paths(self, user):
+        project = Project.objects.filter(user=user).order_by('pk').first()
+        task = Task.objects.filter(project=project).order_by('pk').first()
+        return [
+            '/api/projects/',
+            '/api/projects/{}/'.format(project.pk),
+            '/api/tasks/{}/'.format(task.pk),
+        ]
+
+    def run(self, label, base_url, paths, headers, options):
+        def request(session, client, number):
+            response = session.get(base_url + paths[number % len(paths)], headers=headers, timeout=60)
+            return response.status_code == 200 and json.loads(response.text)['status']['isSuccess']
+
+        latencies, errors, elapsed = run_clients(request, options['clients'], options['requests'])
+        stats = summarize(latencies, errors, elapsed)
+        self.stdout.write("{:10} {:>8} {:>7} {:>10.1f} {:>9} {:>9} {:>9}".format(
+            label, stats['requests'], stats['errors'], stats['throughput'] or 0, stats['p50'], stats['p95'], stats['p99']
+        ))
+        return stats
+
+    def handle(self, *args, **options):
+        check_confirmed(options, self.prefix)
+        delete_dataset(self.prefix)
+        user = seed_dataset(users=1, projects=options['projects'], tasks=options['tasks'], prefix=self.prefix)[0]
+        try:
+            paths = self.get_paths(user)
+            headers = {'Authorization': 'Token {}'.format(user.auth_token.key)}
+            self.stdout.write("{} clients x {} requests over {}".format(options['clients'], options['requests'], ', '.join(paths)))
+            self.stdout.write("{:10} {:>8} {:>7} {:>10} {:>9} {:>9} {:>9}".format(
+                'mode', 'requests', 'errors', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms'
+            ))
+            if options['base_url']:
+                self.run('server', options['base_url'].rstrip('/'), paths, headers, options)
+                return
+
+            for mode in options['modes'].split(','):
+                environ = {
+                    'GUNICORN_WORKER_CLASS': mode,
+                    'WEB_CONCURRENCY': options['workers'],
+                    'GUNICORN_THREADS': options['threads'],
+                }
+                try:
+                    with Server(options['port'], **environ) as server:
+                        self.run(mode, server.base_url, paths, headers, options)
+                except RuntimeError as error:
+                    raise CommandError("{}: {}".format(mode, error))
+        finally:
+            delete_dataset(self.prefix)
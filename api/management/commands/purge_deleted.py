@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import services
+
+
+class Command(BaseCommand):
+    help = ("Soft deletes the tasks of deleted projects, then moves the projects and tasks deleted more than "
+            "--retention-days ago to the archive tables, one transaction per batch. Meant to run periodically, "
+            "e.g. from the Heroku scheduler.")
+
+    def add_arguments(self, parser):
+        options = services.get_purge_options()
+        parser.add_argument('--retention-days', type=int, default=options['RETENTION_DAYS'])
+        parser.add_argument('--batch-size', type=int, default=options['BATCH_SIZE'])
+        parser.add_argument('--max-batches', type=int, help="Stop after this many batches of each step.")
+
+    def batches(self, max_batches):
+        number = 0
+        while max_batches is None or number < max_batches:
+            yield number
+            number += 1
+
+    def handle(self, *args, **options):
+        cascaded = 0
+        for number in self.batches(options['max_batches']):
+            count = services.cascade_project_deletes(options['batch_size'])
+            cascaded += count
+            if count < options['batch_size']:
+                break
+
+        cutoff = timezone.now() - timedelta(days=options['retention_days'])
+        tasks = projects = 0
+        for number in self.batches(options['max_batches']):
+            task_count, project_count = services.archive_deleted(cutoff, options['batch_size'])
+            tasks += task_count
+            projects += project_count
+            if task_count + project_count < options['batch_size']:
+                break
+
+        self.stdout.write("Cascaded {} task deletes; archived {} tasks and {} projects deleted before {}.".format(
+            cascaded, tasks, projects, cutoff.isoformat()
+        ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from api import search
+from api.models import Project, Task
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search documents of every project and task."
+
+    def handle(self, *args, **options):
+        search.get_backend().rebuild(Project.objects.all(), Task.objects.all())
+        self.stdout.write("Indexed {} projects and {} tasks.".format(Project.objects.count(), Task.objects.count()))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api.models import Project, TaskDayBucket, TaskStatusRollup
+
+
+class Command(BaseCommand):
+    help = "Recounts the daily task buckets and the task status rollups of every project."
+
+    def handle(self, *args, **options):
+        project_ids = list(Project.objects.values_list('pk', flat=True))
+        TaskDayBucket.objects.rebuild(*project_ids)
+        TaskStatusRollup.objects.rebuild(*project_ids)
+        self.stdout.write("Recounted the tasks of {} projects.".format(len(project_ids)))
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+Per-request instrumentation. `MetricsMiddleware` times every request and
+files its database, serializer and render time, query count and response
+size under the view that handled it (`ProjectDetailViewSet.get`, ...).
+The histograms live in process and are exposed in the Prometheus text
+format by `MetricsViewSet`; with gunicorn every worker keeps its own.
+
+Database time is measured by the cursors of the `ticapi.db.backends`
+engines (`TimedDatabaseWrapperMixin`), serializer time by
+`timer('serialize')` blocks and render time by `JSONRenderer`. Outside of a
+request every timer is a no-op.
+"""
+from __future__ import unicode_literals
+
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from rest_framework import renderers
+
+from django.conf import settings
+from django.db.backends import utils
+
+
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# name, help, buckets, request attribute
+HISTOGRAMS = (
+    ('ticapi_request_duration_seconds', "Time spent handling the request.", TIME_BUCKETS, 'duration'),
+    ('ticapi_db_query_duration_seconds', "Time spent in database queries.", TIME_BUCKETS, 'db_time'),
+    ('ticapi_db_queries', "Number of database queries.", COUNT_BUCKETS, 'queries'),
+    ('ticapi_serialize_duration_seconds', "Time spent serializing payloads.", TIME_BUCKETS, 'serialize'),
+    ('ticapi_render_duration_seconds', "Time spent rendering JSON.", TIME_BUCKETS, 'render'),
+    ('ticapi_response_size_bytes', "Size of the response body.", SIZE_BUCKETS, 'size'),
+)
+
+
+class Histogram(object):
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestStats(object):
+    __slots__ = ('queries', 'db_time', 'serialize', 'render', 'duration', 'size', 'timing')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0
+        self.serialize = 0
+        self.render = 0
+        self.duration = 0
+        self.size = 0
+        self.timing = set()
+
+
+class Metrics(object):
+    """
+    Histograms and response counts per view, plus the gauges of the
+    registered collectors.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.histograms = OrderedDict()
+        self.responses = OrderedDict()
+        self.collectors = []
+
+    @property
+    def options(self):
+        options = {'ENABLED': True, 'SERVER_TIMING': False, 'TOKEN': None}
+        options.update(getattr(settings, 'METRICS', {}))
+        return options
+
+    @property
+    def current(self):
+        return getattr(self.local, 'stats', None)
+
+    def start(self):
+        self.local.stats = RequestStats()
+        return self.local.stats
+
+    def finish(self):
+        stats, self.local.stats = self.local.stats, None
+        return stats
+
+    def add_query(self, duration):
+        stats = self.current
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += duration
+
+    @contextmanager
+    def timer(self, name):
+        """
+        Add the time spent in the block to `name` of the current request.
+        Nested timers of the same name are only counted once.
+        """
+        stats = self.current
+        if stats is None or name in stats.timing:
+            yield
+            return
+        stats.timing.add(name)
+        start = time.time()
+        try:
+            yield
+        finally:
+            setattr(stats, name, getattr(stats, name) + time.time() - start)
+            stats.timing.discard(name)
+
+    def record(self, view, status_code, stats):
+        with self.lock:
+            for name, help_text, buckets, attribute in HISTOGRAMS:
+                key = (name, view)
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = Histogram(buckets)
+                histogram.observe(getattr(stats, attribute))
+            key = (view, status_code)
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def register_collector(self, collector):
+        """
+        Register a function returning `(name, help, {labels: value})` gauges
+        read on every scrape.
+        """
+        self.collectors.append(collector)
+        return collector
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.responses.clear()
+
+    def render_prometheus(self):
+        lines = []
+        with self.lock:
+            histograms = [(key, (histogram.counts[:], histogram.sum, histogram.count))
+                          for key, histogram in self.histograms.items()]
+            responses = list(self.responses.items())
+
+        for name, help_text, buckets, attribute in HISTOGRAMS:
+            lines += ['# HELP {} {}'.format(name, help_text), '# TYPE {} histogram'.format(name)]
+            for (histogram_name, view), (counts, total, count) in histograms:
+                if histogram_name != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(buckets + ('+Inf',), counts):
+                    cumulative += bucket_count
+                    lines.append('{}_bucket{{view="{}",le="{}"}} {}'.format(name, view, bound, cumulative))
+                lines.append('{}_sum{{view="{}"}} {}'.format(name, view, repr(float(total))))
+                lines.append('{}_count{{view="{}"}} {}'.format(name, view, count))
+
+        lines += ['# HELP ticapi_responses_total Responses by view and status code.', '# TYPE ticapi_responses_total counter']
+        for (view, status_code), count in responses:
+            lines.append('ticapi_responses_total{{view="{}",status="{}"}} {}'.format(view, status_code, count))
+
+        for collector in self.collectors:
+            for name, help_text, values in collector():
+                lines += ['# HELP {} {}'.format(name, help_text), '# TYPE {} gauge'.format(name)]
+                for labels, value in values.items():
+                    label_text = ','.join('{}="{}"'.format(key, label) for key, label in labels)
+                    lines.append('{}{} {}'.format(name, '{' + label_text + '}' if label_text else '', value))
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+class TimedCursorMixin(object):
+
+    def execute(self, sql, params=None):
+        start = time.time()
+        try:
+            return super(TimedCursorMixin, self).execute(sql, params)
+        finally:
+            metrics.add_query(time.time() - start)
+
+    def executemany(self, sql, param_list):
+        start = time.time()
+        try:
+            return super(TimedCursorMixin, self).executemany(sql, param_list)
+        finally:
+            metrics.add_query(time.time() - start)
+
+
+class TimedCursorWrapper(TimedCursorMixin, utils.CursorWrapper):
+    pass
+
+
+class TimedCursorDebugWrapper(TimedCursorMixin, utils.CursorDebugWrapper):
+    pass
+
+
+class TimedDatabaseWrapperMixin(object):
+    """
+    Mixin of a backend's `DatabaseWrapper` whose cursors add the time of
+    their queries to the current request.
+    """
+
+    def make_cursor(self, cursor):
+        return TimedCursorWrapper(cursor, self)
+
+    def make_debug_cursor(self, cursor):
+        return TimedCursorDebugWrapper(cursor, self)
+
+
+class JSONRenderer(renderers.JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with metrics.timer('render'):
+            return super(JSONRenderer, self).render(data, accepted_media_type, renderer_context)
+
+
+def get_view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    view = getattr(match.func, 'view_class', match.func)
+    return '{}.{}'.format(getattr(view, '__name__', match.url_name or 'view'), request.method.lower())
+
+
+class MetricsMiddleware(object):
+    """
+    Record the metrics of every request; add a `Server-Timing` header when
+    `METRICS['SERVER_TIMING']` is set.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        options = metrics.options
+        if not options['ENABLED']:
+            return self.get_response(request)
+
+        stats = metrics.start()
+        start = time.time()
+        try:
+            response = self.get_response(request)
+        finally:
+            stats.duration = time.time() - start
+            metrics.finish()
+
+        stats.size = 0 if response.streaming else len(response.content)
+        metrics.record(get_view_name(request), response.status_code, stats)
+        if options['SERVER_TIMING']:
+            response['Server-Timing'] = ', '.join([
+                'db;dur={:.2f};desc="{} queries"'.format(stats.db_time * 1000, stats.queries),
+                'serialize;dur={:.2f}'.format(stats.serialize * 1000),
+                'render;dur={:.2f}'.format(stats.render * 1000),
+                'total;dur={:.2f}'.format(stats.duration * 1000),
+            ])
+        return response
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+TABLE = 'api_search_document'
+
+# Table of the search documents of api.search and the statements filling it
+# from the existing projects and tasks, by database.
+CREATE_TABLE = {
+    'postgresql': [
+        'CREATE TABLE {table} ('
+        'kind varchar(16) NOT NULL, '
+        'object_id integer NOT NULL, '
+        'user_id integer NOT NULL, '
+        'project_id integer NOT NULL, '
+        'document tsvector NOT NULL, '
+        'PRIMARY KEY (kind, object_id))',
+        'CREATE INDEX {table}_document ON {table} USING gin (document)',
+        "INSERT INTO {table} (kind, object_id, user_id, project_id, document) "
+        "SELECT 'project', id, user_id, id, "
+        "setweight(to_tsvector('simple', name), 'A') || setweight(to_tsvector('simple', description), 'B') "
+        "FROM api_project",
+        "INSERT INTO {table} (kind, object_id, user_id, project_id, document) "
+        "SELECT 'task', id, user_id, project_id, "
+        "setweight(to_tsvector('simple', seq || ' ' || name), 'A') || setweight(to_tsvector('simple', description), 'B') "
+        "FROM api_task",
+    ],
+    'sqlite': [
+        'CREATE VIRTUAL TABLE {table} USING fts5('
+        'user_id UNINDEXED, project_id UNINDEXED, title, body, '
+        "tokenize = 'unicode61')",
+        # rowid is object_id * 2 for projects and object_id * 2 + 1 for tasks
+        'INSERT INTO {table} (rowid, user_id, project_id, title, body) '
+        'SELECT id * 2, user_id, id, name, description FROM api_project',
+        'INSERT INTO {table} (rowid, user_id, project_id, title, body) '
+        "SELECT id * 2 + 1, user_id, project_id, seq || ' ' || name, description FROM api_task",
+    ],
+}
+
+
+def create_search_document(apps, schema_editor):
+    for sql in CREATE_TABLE.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql.format(table=TABLE))
+
+
+def drop_search_document(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE_TABLE:
+        schema_editor.execute('DROP TABLE IF EXISTS {}'.format(TABLE))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_auto_20170410_1001'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_document, drop_search_document),
+    ]
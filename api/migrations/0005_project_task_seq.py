@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 14:51
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def backfill_task_seq(apps, schema_editor):
+    Project = apps.get_model('api', 'Project')
+    Task = apps.get_model('api', 'Task')
+    for project in Project.objects.all().iterator():
+        last = 0
+        for seq in Task.objects.filter(project=project).values_list('seq', flat=True).iterator():
+            number = seq.rsplit('-', 1)[-1].strip()
+            if number.isdigit():
+                last = max(last, int(number))
+        last = max(last, Task.objects.filter(project=project).count())
+        Project.objects.filter(pk=project.pk).update(task_seq=last)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_search_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='task_seq',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_task_seq, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+# (name, table, columns) of the indexes behind the list and detail queries,
+# all of which only read live rows and order by their keyset columns.
+INDEXES = (
+    ('api_project_user_viewed', 'api_project', ('user_id', 'viewed DESC', 'created DESC', 'id DESC')),
+    ('api_project_user_created', 'api_project', ('user_id', 'created DESC', 'id DESC')),
+    ('api_task_project_created', 'api_task', ('project_id', 'created DESC', 'id DESC')),
+    ('api_task_project_viewed', 'api_task', ('project_id', 'viewed DESC', 'created DESC', 'id DESC')),
+    ('api_task_project_status', 'api_task', ('project_id', 'status', 'created DESC', 'id DESC')),
+)
+
+
+def create_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in ('postgresql', 'sqlite'):
+        return
+    for name, table, columns in INDEXES:
+        if vendor == 'postgresql':
+            # Partial indexes only hold live rows
+            sql = 'CREATE INDEX {} ON {} ({}) WHERE NOT "delete"'.format(name, table, ', '.join(columns))
+        else:
+            # SQLite cannot match a partial index against a bound `delete = ?`
+            # parameter, so the flag leads the sort columns instead.
+            columns = (columns[0], '"delete"') + columns[1:]
+            sql = 'CREATE INDEX {} ON {} ({})'.format(name, table, ', '.join(columns))
+        schema_editor.execute(sql)
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor not in ('postgresql', 'sqlite'):
+        return
+    for name, table, columns in INDEXES:
+        schema_editor.execute('DROP INDEX IF EXISTS {}'.format(name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_project_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
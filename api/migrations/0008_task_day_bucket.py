@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 15:01
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def backfill_task_day_buckets(apps, schema_editor):
+    Task = apps.get_model('api', 'Task')
+    TaskDayBucket = apps.get_model('api', 'TaskDayBucket')
+    # Days in the default time zone, as counted by api.dates.local_day
+    tz = timezone.get_default_timezone()
+    counts = {}
+    for project_id, created in Task.objects.filter(delete=False).values_list('project_id', 'created').iterator():
+        key = (project_id, timezone.localtime(created, tz).date())
+        counts[key] = counts.get(key, 0) + 1
+    TaskDayBucket.objects.bulk_create([
+        TaskDayBucket(project_id=project_id, day=day, count=count)
+        for (project_id, day), count in counts.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskDayBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.Project')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='taskdaybucket',
+            unique_together=set([('project', 'day')]),
+        ),
+        migrations.RunPython(backfill_task_day_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 15:04
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_task_status_rollups(apps, schema_editor):
+    Task = apps.get_model('api', 'Task')
+    TaskStatusRollup = apps.get_model('api', 'TaskStatusRollup')
+    counts = {}
+    rows = Task.objects.order_by().values('project_id', 'status', 'delete').annotate(count=models.Count('id'))
+    for row in rows:
+        rollup = counts.setdefault(
+            (row['project_id'], row['status']),
+            TaskStatusRollup(project_id=row['project_id'], status=row['status'])
+        )
+        if row['delete']:
+            rollup.deleted += row['count']
+        else:
+            rollup.live += row['count']
+    TaskStatusRollup.objects.bulk_create(counts.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_task_day_bucket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskStatusRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.IntegerField(choices=[(0, 'Pending'), (1, 'Progress'), (2, 'Done')])),
+                ('live', models.IntegerField(default=0)),
+                ('deleted', models.IntegerField(default=0)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.Project')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='taskstatusrollup',
+            unique_together=set([('project', 'status')]),
+        ),
+        migrations.RunPython(backfill_task_status_rollups, migrations.RunPython.noop),
+    ]
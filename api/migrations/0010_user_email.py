@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 15:07
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_user_emails(apps, schema_editor):
+    # The oldest account keeps an email shared by several users; the others
+    # can still log in only once their email is changed.
+    User = apps.get_model('auth', 'User')
+    UserEmail = apps.get_model('api', 'UserEmail')
+    emails = {}
+    for pk, email in User.objects.order_by('pk').values_list('pk', 'email').iterator():
+        email = (email or '').strip().lower()
+        if email and email not in emails:
+            emails[email] = pk
+    UserEmail.objects.bulk_create([UserEmail(user_id=pk, email=email) for email, pk in emails.items()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0008_alter_user_username_max_length'),
+        ('api', '0009_task_status_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserEmail',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('email', models.CharField(max_length=254, unique=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_user_emails, migrations.RunPython.noop),
+    ]
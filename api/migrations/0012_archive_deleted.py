@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 15:17
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def backfill_deleted_at(apps, schema_editor):
+    now = timezone.now()
+    for name in ('Project', 'Task'):
+        model = apps.get_model('api', name)
+        model.objects.filter(delete=True, deleted_at__isnull=True).update(deleted_at=Coalesce('modified', models.Value(now)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_username_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedProject',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('user_id', models.IntegerField(db_index=True)),
+                ('name', models.CharField(max_length=255)),
+                ('project_initial', models.CharField(max_length=255)),
+                ('description', models.TextField()),
+                ('viewed', models.IntegerField(default=0)),
+                ('task_seq', models.IntegerField(default=0)),
+                ('created', models.DateTimeField()),
+                ('modified', models.DateTimeField(blank=True, null=True)),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedTask',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('user_id', models.IntegerField()),
+                ('project_id', models.IntegerField(db_index=True)),
+                ('seq', models.CharField(max_length=255)),
+                ('name', models.CharField(max_length=255)),
+                ('status', models.IntegerField(choices=[(0, 'Pending'), (1, 'Progress'), (2, 'Done')], default=0)),
+                ('description', models.TextField()),
+                ('viewed', models.IntegerField(default=0)),
+                ('created', models.DateTimeField()),
+                ('modified', models.DateTimeField(blank=True, null=True)),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(backfill_deleted_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+from django.db.models import F
+
+
+# (name, table, columns) of the indexes behind the change feed of /api/sync/,
+# which reads deleted rows too, so unlike 0007 they are not partial.
+INDEXES = (
+    ('api_project_user_modified', 'api_project', ('user_id', 'modified', 'id')),
+    ('api_task_user_modified', 'api_task', ('user_id', 'modified', 'id')),
+)
+
+
+def backfill_modified(apps, schema_editor):
+    for name in ('Project', 'Task'):
+        apps.get_model('api', name).objects.filter(modified__isnull=True).update(modified=F('created'))
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor not in ('postgresql', 'sqlite'):
+        return
+    for name, table, columns in INDEXES:
+        schema_editor.execute('CREATE INDEX {} ON {} ({})'.format(name, table, ', '.join(columns)))
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor not in ('postgresql', 'sqlite'):
+        return
+    for name, table, columns in INDEXES:
+        schema_editor.execute('DROP INDEX IF EXISTS {}'.format(name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_archive_deleted'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_modified, migrations.RunPython.noop),
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
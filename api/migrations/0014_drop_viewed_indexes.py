@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+# Indexes of 0007 for the lists ordered by `viewed`; the lists are now cut
+# into pages on `created` only, and every flush of the view counters had to
+# update them.
+INDEXES = (
+    ('api_project_user_viewed', 'api_project', ('user_id', 'viewed DESC', 'created DESC', 'id DESC')),
+    ('api_task_project_viewed', 'api_task', ('project_id', 'viewed DESC', 'created DESC', 'id DESC')),
+)
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor not in ('postgresql', 'sqlite'):
+        return
+    for name, table, columns in INDEXES:
+        schema_editor.execute('DROP INDEX IF EXISTS {}'.format(name))
+
+
+def create_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in ('postgresql', 'sqlite'):
+        return
+    for name, table, columns in INDEXES:
+        if vendor == 'postgresql':
+            sql = 'CREATE INDEX {} ON {} ({}) WHERE NOT "delete"'.format(name, table, ', '.join(columns))
+        else:
+            columns = (columns[0], '"delete"') + columns[1:]
+            sql = 'CREATE INDEX {} ON {} ({})'.format(name, table, ', '.join(columns))
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_sync_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_indexes, create_indexes),
+    ]
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+# The AddField operations of 0012 rebuild api_project and api_task on SQLite,
+# which drops the indexes 0007 created with raw SQL. Same columns as 0007.
+INDEXES = (
+    ('api_project_user_created', 'api_project', ('user_id', '"delete"', 'created DESC', 'id DESC')),
+    ('api_task_project_created', 'api_task', ('project_id', '"delete"', 'created DESC', 'id DESC')),
+    ('api_task_project_status', 'api_task', ('project_id', '"delete"', 'status', 'created DESC', 'id DESC')),
+)
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name, table, columns in INDEXES:
+        schema_editor.execute('CREATE INDEX IF NOT EXISTS {} ON {} ({})'.format(name, table, ', '.join(columns)))
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name, table, columns in INDEXES:
+        schema_editor.execute('DROP INDEX IF EXISTS {}'.format(name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_drop_viewed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
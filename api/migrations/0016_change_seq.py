@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# (name, table, columns) of the indexes behind the change feed of /api/sync/,
+# replacing the `(user_id, modified, id)` ones of 0013.
+INDEXES = (
+    ('api_project_user_change', 'api_project', ('user_id', 'change_seq', 'id')),
+    ('api_task_user_change', 'api_task', ('user_id', 'change_seq', 'id')),
+)
+
+MODIFIED_INDEXES = (
+    ('api_project_user_modified', 'api_project', ('user_id', 'modified', 'id')),
+    ('api_task_user_modified', 'api_task', ('user_id', 'modified', 'id')),
+)
+
+# Dropped on SQLite by the table rebuilds of AddField and RemoveField
+SQLITE_INDEXES = (
+    ('api_project_user_created', 'api_project', ('user_id', '"delete"', 'created DESC', 'id DESC')),
+    ('api_task_project_created', 'api_task', ('project_id', '"delete"', 'created DESC', 'id DESC')),
+    ('api_task_project_status', 'api_task', ('project_id', '"delete"', 'status', 'created DESC', 'id DESC')),
+)
+
+
+def create_indexes(schema_editor, indexes):
+    for name, table, columns in indexes:
+        schema_editor.execute('CREATE INDEX IF NOT EXISTS {} ON {} ({})'.format(name, table, ', '.join(columns)))
+
+
+def drop_indexes(schema_editor, indexes):
+    for name, table, columns in indexes:
+        schema_editor.execute('DROP INDEX IF EXISTS {}'.format(name))
+
+
+def swap_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in ('postgresql', 'sqlite'):
+        return
+    drop_indexes(schema_editor, MODIFIED_INDEXES)
+    create_indexes(schema_editor, INDEXES)
+    if vendor == 'sqlite':
+        create_indexes(schema_editor, SQLITE_INDEXES)
+
+
+def unswap_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor not in ('postgresql', 'sqlite'):
+        return
+    drop_indexes(schema_editor, INDEXES)
+
+
+def restore_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in ('postgresql', 'sqlite'):
+        return
+    create_indexes(schema_editor, MODIFIED_INDEXES)
+    if vendor == 'sqlite':
+        create_indexes(schema_editor, SQLITE_INDEXES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0015_restore_sqlite_indexes'),
+    ]
+
+    operations = [
+        # Runs last when unapplied, after the rebuilds of RemoveField
+        migrations.RunPython(migrations.RunPython.noop, restore_indexes),
+        migrations.CreateModel(
+            name='ChangeCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('last', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='change_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='change_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(swap_indexes, unswap_indexes),
+    ]
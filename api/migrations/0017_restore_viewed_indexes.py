@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+# The indexes of 0007 for the lists ordered by `viewed`, dropped by 0014 while
+# the lists were cut into pages on `created` only. Same columns as 0007.
+INDEXES = (
+    ('api_project_user_viewed', 'api_project', ('user_id', 'viewed DESC', 'created DESC', 'id DESC')),
+    ('api_task_project_viewed', 'api_task', ('project_id', 'viewed DESC', 'created DESC', 'id DESC')),
+)
+
+
+def create_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in ('postgresql', 'sqlite'):
+        return
+    for name, table, columns in INDEXES:
+        if vendor == 'postgresql':
+            sql = 'CREATE INDEX IF NOT EXISTS {} ON {} ({}) WHERE NOT "delete"'.format(name, table, ', '.join(columns))
+        else:
+            columns = (columns[0], '"delete"') + columns[1:]
+            sql = 'CREATE INDEX IF NOT EXISTS {} ON {} ({})'.format(name, table, ', '.join(columns))
+        schema_editor.execute(sql)
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor not in ('postgresql', 'sqlite'):
+        return
+    for name, table, columns in INDEXES:
+        schema_editor.execute('DROP INDEX IF EXISTS {}'.format(name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_change_seq'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
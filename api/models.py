@@ -1,19 +1,75 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
-from django.db import models
+from collections import OrderedDict
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from api.dates import local_day
+
+
+class ProjectManager(models.Manager):
+
+    def allocate_task_seq(self, project_id, count=1):
+        """
+        Reserve `count` task sequence numbers of a project and return the
+        first one. The counter row stays locked only until the surrounding
+        transaction commits, so concurrent creates never share a number.
+        """
+        with transaction.atomic():
+            self.filter(pk=project_id).update(task_seq=F('task_seq') + count)
+            last = self.filter(pk=project_id).values_list('task_seq', flat=True).get()
+        return last - count + 1
+
+    def bump_version(self, *project_ids):
+        """
+        Invalidate the ETags of the given projects after a project or task
+        write, and move them to the head of the change feed, as their task
+        counts may have changed.
+        """
+        with transaction.atomic():
+            user_ids = sorted(set(self.filter(pk__in=project_ids).values_list('user_id', flat=True)))
+            for user_id in user_ids:
+                self.filter(pk__in=project_ids, user_id=user_id).update(
+                    version=F('version') + 1, modified=timezone.now(), change_seq=ChangeCounter.objects.allocate(user_id)
+                )
+
+
+class ChangeSeqMixin(object):
+    """
+    Stamps saved rows with the next change number of their user, the
+    position of the row in the change feed of `/api/sync/`.
+    """
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            self.change_seq = ChangeCounter.objects.allocate(self.user_id)
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'change_seq'}
+            super(ChangeSeqMixin, self).save(*args, **kwargs)
 
 
-class Project(models.Model):
+class Project(ChangeSeqMixin, models.Model):
     name = models.CharField(max_length=255)
     project_initial = models.CharField(max_length=255)
     description = models.TextField()
     viewed = models.IntegerField(default=0)
     user = models.ForeignKey(User)
     delete = models.BooleanField(default=False)
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
     created = models.DateTimeField(auto_now_add=True)
     modified = models.DateTimeField(auto_now=True, null=True, blank=True)
+    task_seq = models.IntegerField(default=0)
+    version = models.IntegerField(default=0)
+    change_seq = models.BigIntegerField(default=0)
+
+    objects = ProjectManager()
+
+    def format_task_seq(self, number):
+        return "{}-{}".format(self.project_initial, number)
 
 
 STATUS_CHOICES = (
@@ -22,9 +78,10 @@ STATUS_CHOICES = (
     (2, 'Done'),
 )
 
-class Task(models.Model):
+class Task(ChangeSeqMixin, models.Model):
     seq = models.CharField(max_length=255)
     delete = models.BooleanField(default=False)
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
     name = models.CharField(max_length=255)
     status = models.IntegerField(choices=STATUS_CHOICES, default=0)
     description = models.TextField()
@@ -33,3 +90,273 @@ class Task(models.Model):
     project = models.ForeignKey(Project)
     created = models.DateTimeField(auto_now_add=True)
     modified = models.DateTimeField(auto_now=True, null=True, blank=True)
+    change_seq = models.BigIntegerField(default=0)
+
+
+class RollupManager(models.Manager):
+    """
+    Manager of a table of counters keyed by `key_fields`, kept up to date by
+    the task writes in `api.services` and `api.signals`. Subclasses define
+    `count_tasks(tasks)`, returning the `{key: {field: count}}` counters of
+    a task queryset, which `rebuild` recounts from.
+    """
+    key_fields = ()
+
+    def add(self, changes):
+        """
+        Add `{key: {field: delta}}` to the counters, creating the missing rows
+        when a delta is positive. Must run inside the transaction of the task
+        write. The rows are updated in key order, so concurrent writes lock
+        them in the same order and cannot deadlock.
+        """
+        for key in sorted(changes):
+            deltas = dict((name, delta) for name, delta in changes[key].items() if delta)
+            if not deltas:
+                continue
+            lookup = dict(zip(self.key_fields, key))
+            values = dict((name, F(name) + delta) for name, delta in deltas.items())
+            if self.filter(**lookup).update(**values) or all(delta < 0 for delta in deltas.values()):
+                continue
+            try:
+                with transaction.atomic():
+                    self.create(**dict(lookup, **dict((name, max(delta, 0)) for name, delta in deltas.items())))
+            except IntegrityError:
+                # Created by a concurrent write since the update above
+                self.filter(**lookup).update(**values)
+
+    def rebuild(self, *project_ids):
+        """
+        Recount the counters of the given projects from their tasks.
+        """
+        with transaction.atomic():
+            for start in range(0, len(project_ids), 500):
+                batch = project_ids[start:start + 500]
+                self.filter(project_id__in=batch).delete()
+                counts = self.count_tasks(Task.objects.filter(project_id__in=batch))
+                self.bulk_create([
+                    self.model(**dict(zip(self.key_fields, key), **values)) for key, values in counts.items()
+                ])
+
+
+class TaskDayBucketManager(RollupManager):
+    key_fields = ('project_id', 'day')
+
+    def count_tasks(self, tasks):
+        counts = {}
+        for project_id, created in tasks.filter(delete=False).values_list('project_id', 'created').iterator():
+            values = counts.setdefault((project_id, local_day(created)), {'count': 0})
+            values['count'] += 1
+        return counts
+
+
+class TaskDayBucket(models.Model):
+    """
+    Number of live tasks of a project created on each day, in the default
+    time zone.
+    """
+    project = models.ForeignKey(Project)
+    day = models.DateField()
+    count = models.IntegerField(default=0)
+
+    objects = TaskDayBucketManager()
+
+    class Meta:
+        unique_together = ('project', 'day')
+
+
+class TaskStatusRollupManager(RollupManager):
+    key_fields = ('project_id', 'status')
+
+    def count_tasks(self, tasks):
+        counts = {}
+        rows = tasks.order_by().values('project_id', 'status', 'delete').annotate(count=models.Count('id'))
+        for row in rows:
+            values = counts.setdefault((row['project_id'], row['status']), {'live': 0, 'deleted': 0})
+            values['deleted' if row['delete'] else 'live'] += row['count']
+        return counts
+
+    def get_empty_counts(self):
+        return OrderedDict([(label.lower(), 0) for value, label in STATUS_CHOICES] + [('total', 0), ('deleted', 0)])
+
+    def get_counts(self, *project_ids):
+        """
+        Return `{project_id: counts}` where the counts map the name of every
+        status to its number of live tasks, plus the `total` of live tasks
+        and the number of `deleted` ones.
+        """
+        names = dict((value, label.lower()) for value, label in STATUS_CHOICES)
+        counts = dict((project_id, self.get_empty_counts()) for project_id in project_ids)
+        rollups = []
+        for start in range(0, len(project_ids), 500):
+            rollups += self.filter(project_id__in=project_ids[start:start + 500])
+        for rollup in rollups:
+            project_counts = counts[rollup.project_id]
+            if rollup.status in names:
+                project_counts[names[rollup.status]] += rollup.live
+            project_counts['total'] += rollup.live
+            project_counts['deleted'] += rollup.deleted
+        return counts
+
+
+class TaskStatusRollup(models.Model):
+    """
+    Number of live and soft deleted tasks of a project in each status.
+    """
+    project = models.ForeignKey(Project)
+    status = models.IntegerField(choices=STATUS_CHOICES)
+    live = models.IntegerField(default=0)
+    deleted = models.IntegerField(default=0)
+
+    objects = TaskStatusRollupManager()
+
+    class Meta:
+        unique_together = ('project', 'status')
+
+
+class UserEmailManager(models.Manager):
+
+    def normalize(self, email):
+        return (email or '').strip().lower()
+
+    def get_username(self, email):
+        """
+        Return the username of the user owning `email`, compared
+        case-insensitively, or None.
+        """
+        return self.filter(email=self.normalize(email)).values_list('user__username', flat=True).first()
+
+    def sync(self, user):
+        """
+        Store the normalized email of `user`. Raises `IntegrityError` when
+        another user already owns it, after forgetting the previous email of
+        `user`, which no longer is its own.
+        """
+        email = self.normalize(user.email)
+        if not email:
+            self.filter(user=user).delete()
+        elif not self.filter(user=user, email=email).exists():
+            try:
+                with transaction.atomic():
+                    self.update_or_create(user=user, defaults={'email': email})
+            except IntegrityError:
+                self.filter(user=user).delete()
+                raise
+
+
+class UserEmail(models.Model):
+    """
+    Lowercased email of every user, so logins and signups look emails up
+    through a unique index instead of comparing `UPPER(email)` row by row.
+    Kept in sync by `api.signals`.
+    """
+    user = models.OneToOneField(User, primary_key=True)
+    email = models.CharField(max_length=254, unique=True)
+
+    objects = UserEmailManager()
+
+
+class UsernameCounterManager(models.Manager):
+
+    def allocate(self, base):
+        """
+        Return the next candidate username for `base`: `base` itself for the
+        first user, then `base1`, `base2`, ... The counter is seeded from the
+        existing usernames with one query the first time a base is seen, and
+        stays locked until the surrounding transaction commits.
+        """
+        with transaction.atomic():
+            if not self.filter(base=base).update(last=F('last') + 1):
+                last = -1
+                for username in User.objects.filter(username__startswith=base).values_list('username', flat=True).iterator():
+                    suffix = username[len(base):]
+                    if suffix == '':
+                        last = max(last, 0)
+                    elif suffix.isdigit() and not suffix.startswith('0'):
+                        last = max(last, int(suffix))
+                try:
+                    with transaction.atomic():
+                        self.create(base=base, last=last + 1)
+                except IntegrityError:
+                    # Seeded by a concurrent signup since the update above
+                    self.filter(base=base).update(last=F('last') + 1)
+            last = self.filter(base=base).values_list('last', flat=True).get()
+        return base + str(last) if last else base
+
+
+class UsernameCounter(models.Model):
+    """
+    Last suffix handed out for each username base by `create_username`.
+    """
+    base = models.CharField(max_length=150, primary_key=True)
+    last = models.IntegerField(default=0)
+
+    objects = UsernameCounterManager()
+
+
+class ChangeCounterManager(models.Manager):
+
+    def allocate(self, user_id):
+        """
+        Return the next change number of a user. Must run inside the
+        transaction of the write it stamps: the counter row stays locked
+        until that transaction commits, so the writes of a user become
+        visible in the order of their numbers.
+        """
+        with transaction.atomic():
+            if not self.filter(user_id=user_id).update(last=F('last') + 1):
+                try:
+                    with transaction.atomic():
+                        self.create(user_id=user_id, last=1)
+                except IntegrityError:
+                    # Created by a concurrent write since the update above
+                    self.filter(user_id=user_id).update(last=F('last') + 1)
+            return self.filter(user_id=user_id).values_list('last', flat=True).get()
+
+
+class ChangeCounter(models.Model):
+    """
+    Last change number handed out to the project and task writes of each
+    user. Unlike timestamps, the numbers are ordered by commit, so the
+    cursor of `/api/sync/` never passes a row whose write is still open.
+    """
+    user = models.OneToOneField(User, primary_key=True)
+    last = models.BigIntegerField(default=0)
+
+    objects = ChangeCounterManager()
+
+
+class ArchivedProject(models.Model):
+    """
+    Copy of a soft deleted project purged from `Project` by `purge_deleted`.
+    Keeps the original primary key; the user is a plain id so the archive
+    outlives the user.
+    """
+    id = models.IntegerField(primary_key=True)
+    user_id = models.IntegerField(db_index=True)
+    name = models.CharField(max_length=255)
+    project_initial = models.CharField(max_length=255)
+    description = models.TextField()
+    viewed = models.IntegerField(default=0)
+    task_seq = models.IntegerField(default=0)
+    created = models.DateTimeField()
+    modified = models.DateTimeField(null=True, blank=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+
+class ArchivedTask(models.Model):
+    """
+    Copy of a soft deleted task purged from `Task` by `purge_deleted`.
+    """
+    id = models.IntegerField(primary_key=True)
+    user_id = models.IntegerField()
+    project_id = models.IntegerField(db_index=True)
+    seq = models.CharField(max_length=255)
+    name = models.CharField(max_length=255)
+    status = models.IntegerField(choices=STATUS_CHOICES, default=0)
+    description = models.TextField()
+    viewed = models.IntegerField(default=0)
+    created = models.DateTimeField()
+    modified = models.DateTimeField(null=True, blank=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
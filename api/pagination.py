@@ -0,0 +1,141 @@
+import base64
+import json
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from django.core import exceptions
+from django.db import models
+from django.db.models import Q
+from django.utils import six
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(values):
+    """
+    Encode a list of JSON-serializable values (datetimes are sent as ISO
+    strings) into an opaque, url safe cursor.
+    """
+    data = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value for value in values])
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+
+
+def invalid_cursor():
+    return ValidationError({'cursor': ['Invalid cursor.']})
+
+
+def decode_cursor(cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(str(cursor)).decode('utf-8'))
+    except (TypeError, ValueError):
+        raise invalid_cursor()
+    if not isinstance(values, list):
+        raise invalid_cursor()
+    return values
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination that follows the ordering already applied to the
+    queryset, tie-broken on `pk`. The cursor holds the ordering values of
+    the last row of a page and the next page is fetched with a keyset
+    filter, so deep pages cost the same as the first one (no OFFSET).
+
+    Only the `cursor_fields` of the ordering are kept. `viewed` changes when
+    the view counters are flushed (`api.counters`): the cursor holds the
+    stored count of the last row, so a row whose count grows past the cursor
+    between two pages is skipped, or returned twice if it was behind it; the
+    other rows keep their place.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_fields = ('viewed', 'created', 'pk', 'id')
+
+    def __init__(self, page_size=None):
+        self.page_size = page_size or api_settings.PAGE_SIZE
+        self.next_cursor = None
+        self.request = None
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.GET[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, queryset):
+        ordering = [
+            field for field in queryset.query.order_by
+            if isinstance(field, six.string_types) and field.lstrip('-') in self.cursor_fields
+        ]
+        if not any(field.lstrip('-') in ('pk', queryset.model._meta.pk.name) for field in ordering):
+            descending = ordering[-1].startswith('-') if ordering else False
+            ordering.append('-pk' if descending else 'pk')
+        return ordering
+
+    def get_position(self, row, field_name, model):
+        if isinstance(row, dict):
+            if field_name == 'pk':
+                field_name = model._meta.pk.attname
+            return row[field_name]
+        return getattr(row, field_name)
+
+    def get_keyset_filter(self, queryset, ordering, values):
+        if len(values) != len(ordering):
+            raise invalid_cursor()
+
+        names = [field.lstrip('-') for field in ordering]
+        for index, name in enumerate(names):
+            field = queryset.model._meta.pk if name == 'pk' else queryset.model._meta.get_field(name)
+            if values[index] is None:
+                continue
+            if isinstance(field, models.DateTimeField):
+                values[index] = parse_datetime(values[index]) if isinstance(values[index], six.string_types) else None
+                if values[index] is None:
+                    raise invalid_cursor()
+            else:
+                try:
+                    values[index] = field.to_python(values[index])
+                except exceptions.ValidationError:
+                    raise invalid_cursor()
+
+        keyset = Q()
+        for index, field in enumerate(ordering):
+            lookup = '%s__%s' % (names[index], 'lt' if field.startswith('-') else 'gt')
+            condition = Q(**{lookup: values[index]})
+            for previous in range(index):
+                condition &= Q(**{names[previous]: values[previous]})
+            keyset |= condition
+        return keyset
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        ordering = self.get_ordering(queryset)
+        queryset = queryset.order_by(*ordering)
+
+        cursor = request.GET.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self.get_keyset_filter(queryset, ordering, decode_cursor(cursor)))
+
+        rows = list(queryset[:page_size + 1])
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            self.next_cursor = encode_cursor([
+                self.get_position(last, field.lstrip('-'), queryset.model) for field in ordering
+            ])
+        else:
+            self.next_cursor = None
+        return rows
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+On-demand profiling of single requests for staff users.
+
+A request sent with `X-Profile: sample` (or `?profile=sample`) runs under
+a sampling profiler that records the stack of the request thread every
+`INTERVAL` seconds and produces collapsed stacks, the input format of
+flamegraph.pl and speedscope. `cprofile` runs it under `cProfile` instead.
+
+`X-Profile-Filter` / `?profile_filter=` keeps only the frames of the
+given comma separated module prefixes (`api.views`, `drf`, `orm`, ...),
+and `X-Profile-Output` / `?profile_output=` picks `inline`, which returns
+the profile instead of the response, or `store`, which writes it to
+`PROFILER['DIRECTORY']` and names the file in the `X-Profile-File`
+header. Requests without the trigger only pay for two dictionary lookups.
+"""
+from __future__ import unicode_literals
+
+import cProfile
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+
+from rest_framework import exceptions
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils import six, timezone
+
+from api.authentication import CachedTokenAuthentication
+
+
+MODES = ('sample', 'cprofile')
+
+MODULE_ALIASES = {
+    'drf': 'rest_framework',
+    'orm': 'django.db',
+}
+
+
+def get_options():
+    options = {'ENABLED': True, 'DIRECTORY': None, 'INTERVAL': 0.002}
+    options.update(getattr(settings, 'PROFILER', {}))
+    return options
+
+
+def get_filters(value):
+    return tuple(MODULE_ALIASES.get(name, name) for name in (value or '').replace(' ', '').split(',') if name)
+
+
+class Sampler(object):
+    """
+    Collect the stacks of the thread `thread_id` from a background thread.
+    """
+
+    def __init__(self, thread_id, interval, filters=()):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.filters = filters
+        self.stacks = defaultdict(int)
+        self.samples = 0
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, name='api.profiling.Sampler')
+        self.thread.daemon = True
+
+    def keep(self, module):
+        return not self.filters or any(module == name or module.startswith(name + '.') for name in self.filters)
+
+    def sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None:
+            module = frame.f_globals.get('__name__', '?')
+            if self.keep(module):
+                stack.append('{}:{}'.format(module, frame.f_code.co_name))
+            frame = frame.f_back
+        self.samples += 1
+        if stack:
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def run(self):
+        while not self.stopped:
+            self.sample()
+            time.sleep(self.interval)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped = True
+        self.thread.join()
+
+    def collapsed(self):
+        return ''.join('{} {}\n'.format(stack, count) for stack, count in sorted(self.stacks.items()))
+
+
+class ProfilerMiddleware(object):
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def get_param(self, request, name):
+        value = request.META.get('HTTP_X_{}'.format(name.upper()))
+        if value is None and 'profile' in request.META.get('QUERY_STRING', ''):
+            value = request.GET.get(name)
+        return value
+
+    def is_staff(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            return True
+        try:
+            credentials = CachedTokenAuthentication().authenticate(request)
+        except exceptions.AuthenticationFailed:
+            return False
+        return bool(credentials and credentials[0].is_staff)
+
+    def __call__(self, request):
+        if 'HTTP_X_PROFILE' not in request.META and 'profile=' not in request.META.get('QUERY_STRING', ''):
+            return self.get_response(request)
+
+        mode = self.get_param(request, 'profile')
+        options = get_options()
+        if mode not in MODES or not options['ENABLED'] or not self.is_staff(request):
+            return self.get_response(request)
+
+        filters = get_filters(self.get_param(request, 'profile_filter'))
+        output = self.get_param(request, 'profile_output') or ('store' if options['DIRECTORY'] else 'inline')
+
+        start = time.time()
+        if mode == 'sample':
+            profiler = Sampler(threading.current_thread().ident, options['INTERVAL'], filters)
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            response = self.get_response(request)
+            if response.streaming:
+                # Streamed bodies are produced after the view returns
+                response.streaming_content = [b''.join(response.streaming_content)]
+        finally:
+            if mode == 'sample':
+                profiler.stop()
+            else:
+                profiler.disable()
+        elapsed = time.time() - start
+
+        if mode == 'sample':
+            content = profiler.collapsed()
+            summary = '{} samples in {:.1f} ms'.format(profiler.samples, elapsed * 1000)
+        else:
+            stream = six.StringIO()
+            stats = pstats.Stats(profiler, stream=stream).sort_stats('cumulative')
+            if filters:
+                stats.print_stats('|'.join(re.escape(name).replace('\\.', r'[/\\]') for name in filters))
+            else:
+                stats.print_stats()
+            content = stream.getvalue()
+            summary = '{} calls in {:.1f} ms'.format(stats.total_calls, elapsed * 1000)
+
+        if output == 'store' and options['DIRECTORY']:
+            name = '{:%Y%m%dT%H%M%S%f}-{}-{}.{}'.format(
+                timezone.now(), re.sub(r'[^A-Za-z0-9]+', '_', request.path).strip('_') or 'root', mode,
+                'collapsed' if mode == 'sample' else 'prof'
+            )
+            path = os.path.join(options['DIRECTORY'], name)
+            if mode == 'sample':
+                with open(path, 'w') as profile_file:
+                    profile_file.write(content)
+            else:
+                profiler.dump_stats(path)
+            response['X-Profile-File'] = name
+            response['X-Profile-Summary'] = summary
+            return response
+
+        profile_response = HttpResponse(content, content_type='text/plain; charset=utf-8')
+        profile_response['X-Profile-Summary'] = summary
+        profile_response['X-Profile-Status'] = response.status_code
+        return profile_response
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+Full-text search over projects and tasks.
+
+Every Project and Task has one document in the `api_search_document` table,
+kept up to date by the signal handlers in `api.signals` and created by
+migration 0004. The table layout depends on the database: PostgreSQL stores
+a weighted `tsvector` behind a GIN index, SQLite uses an FTS5 virtual table.
+Both match every term of a query as a word prefix ("log" finds "login",
+"ogin" does not). Other databases fall back to the `icontains` substring
+filters the views used before.
+
+`filter()` backs the `q` parameter of the list views, which keep their
+keyset pagination; `search()` backs the `search` parameter, which returns
+the best matches ranked by relevance instead.
+"""
+from __future__ import unicode_literals
+
+import re
+
+from django.core.exceptions import EmptyResultSet
+from django.db import connection as default_connection
+from django.db.models import Q
+
+
+PROJECT = 'project'
+TASK = 'task'
+
+TABLE = 'api_search_document'
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def get_terms(query):
+    """
+    Split a raw `q` parameter into lower cased search terms.
+    """
+    return [term.lower() for term in TERM_RE.findall(query)]
+
+
+def get_document(kind, obj):
+    """
+    Return `(user_id, project_id, title, body)` for a Project or Task.
+    """
+    if kind == PROJECT:
+        return obj.user_id, obj.pk, obj.name, obj.description
+    return obj.user_id, obj.project_id, "{} {}".format(obj.seq, obj.name), obj.description
+
+
+class BaseSearchBackend(object):
+    """
+    Unindexed backend matching every term of a query as a substring of the
+    fields of the objects, for databases without a full-text backend. The
+    indexed backends override `index`, `index_many`, `remove`, `search` and
+    `filter`.
+    """
+    fields = {
+        PROJECT: ('name', 'description'),
+        TASK: ('seq', 'name', 'description'),
+    }
+
+    batch_size = 500
+
+    def index(self, kind, obj):
+        pass
+
+    def index_many(self, kind, objs):
+        """
+        Index the objects of a bulk write, with a few statements per batch.
+        """
+        for obj in objs:
+            self.index(kind, obj)
+
+    def remove(self, kind, object_id):
+        pass
+
+    def search(self, kind, query, user_id=None, project_id=None, limit=50, queryset=None):
+        """
+        Return the ids of matching objects, best match first, among the rows
+        of `queryset` when given.
+        """
+        from api.models import Project, Task
+
+        if queryset is None:
+            queryset = (Project if kind == PROJECT else Task).objects.all()
+        if user_id is not None:
+            queryset = queryset.filter(user_id=user_id)
+        if project_id is not None:
+            queryset = queryset.filter(**{'pk' if kind == PROJECT else 'project_id': project_id})
+        return list(self.filter(queryset, kind, query).order_by('-pk').values_list('pk', flat=True)[:limit])
+
+    def filter(self, queryset, kind, query):
+        """
+        Restrict `queryset` to the objects matching every term of `query`.
+        """
+        terms = query.split()
+        if not terms:
+            return queryset.none()
+        for term in terms:
+            condition = Q()
+            for field in self.fields[kind]:
+                condition |= Q(**{'{}__icontains'.format(field): term})
+            queryset = queryset.filter(condition)
+        return queryset.distinct()
+
+    def rank(self, queryset, kind, query, limit, user_id=None, project_id=None):
+        """
+        Return the `limit` rows of `queryset` best matching `query`, best
+        match first. The rows are ranked within `queryset`, so its filters
+        (deleted rows, status, dates) never leave a page short.
+        """
+        ids = self.search(kind, query, user_id=user_id, project_id=project_id, limit=limit, queryset=queryset)
+        positions = dict((pk, position) for position, pk in enumerate(ids))
+        rows = list(queryset.filter(pk__in=ids))
+        return sorted(rows, key=lambda row: positions[row['id'] if isinstance(row, dict) else row.pk])
+
+    def rebuild(self, projects, tasks):
+        for kind, queryset in ((PROJECT, projects), (TASK, tasks)):
+            batch = []
+            for obj in queryset.iterator():
+                batch.append(obj)
+                if len(batch) == self.batch_size:
+                    self.index_many(kind, batch)
+                    batch = []
+            self.index_many(kind, batch)
+
+    def get_scope(self, user_id, project_id, queryset=None, id_column='object_id'):
+        """
+        Return the conditions and params restricting documents to a user,
+        a project and the rows of `queryset`. Raises `EmptyResultSet` when
+        `queryset` cannot match anything.
+        """
+        where, params = [], []
+        if user_id is not None:
+            where.append('user_id = %s')
+            params.append(user_id)
+        if project_id is not None:
+            where.append('project_id = %s')
+            params.append(project_id)
+        if queryset is not None:
+            sql, queryset_params = queryset.order_by().values_list('pk').query.sql_with_params()
+            where.append('{} IN ({})'.format(id_column, sql))
+            params.extend(queryset_params)
+        return where, params
+
+    def filter_by_subquery(self, queryset, subquery, params):
+        qn = default_connection.ops.quote_name
+        column = '{}.{}'.format(qn(queryset.model._meta.db_table), qn(queryset.model._meta.pk.column))
+        return queryset.extra(where=['{} IN ({})'.format(column, subquery)], params=params)
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Documents are weighted `tsvector`s (title 'A', body 'B') built with the
+    'simple' configuration, so project initials and sequence numbers are
+    indexed as they are typed.
+    """
+
+    def get_tsquery(self, query):
+        return ' & '.join('{}:*'.format(term) for term in get_terms(query))
+
+    def index(self, kind, obj):
+        self.index_many(kind, [obj])
+
+    def index_many(self, kind, objs):
+        # One row per object: ON CONFLICT cannot update a row twice
+        objs = list(dict((obj.pk, obj) for obj in objs).values())
+        for start in range(0, len(objs), self.batch_size):
+            batch = objs[start:start + self.batch_size]
+            params = []
+            for obj in batch:
+                user_id, project_id, title, body = get_document(kind, obj)
+                params += [kind, obj.pk, user_id, project_id, title, body]
+            values = ', '.join(
+                ["(%s, %s, %s, %s, setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'B'))"] * len(batch)
+            )
+            with default_connection.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO {table} (kind, object_id, user_id, project_id, document) VALUES {values} "
+                    "ON CONFLICT (kind, object_id) DO UPDATE SET "
+                    "user_id = EXCLUDED.user_id, project_id = EXCLUDED.project_id, document = EXCLUDED.document".format(
+                        table=TABLE, values=values
+                    ),
+                    params
+                )
+
+    def remove(self, kind, object_id):
+        with default_connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {} WHERE kind = %s AND object_id = %s'.format(TABLE), [kind, object_id])
+
+    def search(self, kind, query, user_id=None, project_id=None, limit=50, queryset=None):
+        tsquery = self.get_tsquery(query)
+        if not tsquery:
+            return []
+        try:
+            where, params = self.get_scope(user_id, project_id, queryset)
+        except EmptyResultSet:
+            return []
+        sql = (
+            "SELECT object_id FROM {table}, to_tsquery('simple', %s) tsquery "
+            "WHERE kind = %s AND document @@ tsquery {scope}"
+            "ORDER BY ts_rank(document, tsquery) DESC, object_id DESC LIMIT %s"
+        ).format(table=TABLE, scope=''.join('AND {} '.format(clause) for clause in where))
+        with default_connection.cursor() as cursor:
+            cursor.execute(sql, [tsquery, kind] + params + [limit])
+            return [row[0] for row in cursor.fetchall()]
+
+    def filter(self, queryset, kind, query):
+        tsquery = self.get_tsquery(query)
+        if not tsquery:
+            return queryset.none()
+        subquery = "SELECT object_id FROM {} WHERE kind = %s AND document @@ to_tsquery('simple', %s)".format(TABLE)
+        return self.filter_by_subquery(queryset, subquery, [kind, tsquery])
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """
+    Documents live in an FTS5 table keyed by rowid, `object_id * 2` for
+    projects and `object_id * 2 + 1` for tasks, so updates and deletes are
+    rowid lookups instead of scans.
+    """
+    kinds = (PROJECT, TASK)
+
+    def get_rowid(self, kind, object_id):
+        return object_id * 2 + self.kinds.index(kind)
+
+    def get_match(self, query):
+        return ' '.join('"{}"*'.format(term) for term in get_terms(query))
+
+    def index(self, kind, obj):
+        self.index_many(kind, [obj])
+
+    def index_many(self, kind, objs):
+        # FTS5 tables have no upsert; the last copy of an object wins
+        rows = {}
+        for obj in objs:
+            rows[self.get_rowid(kind, obj.pk)] = get_document(kind, obj)
+        if not rows:
+            return
+        with default_connection.cursor() as cursor:
+            cursor.executemany('DELETE FROM {} WHERE rowid = %s'.format(TABLE), [[rowid] for rowid in rows])
+            cursor.executemany(
+                'INSERT INTO {} (rowid, user_id, project_id, title, body) VALUES (%s, %s, %s, %s, %s)'.format(TABLE),
+                [[rowid] + list(document) for rowid, document in rows.items()]
+            )
+
+    def remove(self, kind, object_id):
+        with default_connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {} WHERE rowid = %s'.format(TABLE), [self.get_rowid(kind, object_id)])
+
+    def search(self, kind, query, user_id=None, project_id=None, limit=50, queryset=None):
+        match = self.get_match(query)
+        if not match:
+            return []
+        try:
+            where, params = self.get_scope(user_id, project_id, queryset, id_column='rowid / 2')
+        except EmptyResultSet:
+            return []
+        sql = (
+            'SELECT rowid / 2 FROM {table} WHERE {table} MATCH %s AND rowid %% 2 = %s {scope}'
+            'ORDER BY bm25({table}, 0, 0, 4.0, 1.0) LIMIT %s'
+        ).format(table=TABLE, scope=''.join('AND {} '.format(clause) for clause in where))
+        with default_connection.cursor() as cursor:
+            cursor.execute(sql, [match, self.kinds.index(kind)] + params + [limit])
+            return [row[0] for row in cursor.fetchall()]
+
+    def filter(self, queryset, kind, query):
+        match = self.get_match(query)
+        if not match:
+            return queryset.none()
+        subquery = 'SELECT rowid / 2 FROM {table} WHERE {table} MATCH %s AND rowid %% 2 = %s'.format(table=TABLE)
+        return self.filter_by_subquery(queryset, subquery, [match, self.kinds.index(kind)])
+
+
+BACKENDS = {
+    'postgresql': PostgresSearchBackend(),
+    'sqlite': SQLiteSearchBackend(),
+}
+
+FALLBACK_BACKEND = BaseSearchBackend()
+
+
+def get_backend(connection=None):
+    return BACKENDS.get((connection or default_connection).vendor, FALLBACK_BACKEND)
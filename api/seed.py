@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic datasets for the benchmark and query plan commands.
+"""
+from __future__ import unicode_literals
+
+import re
+
+from rest_framework.authtoken.models import Token
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from django.db import connection
+from django.utils import timezone
+
+from api import search
+from api.models import Project, Task, TaskDayBucket, TaskStatusRollup, UserEmail, STATUS_CHOICES
+
+
+WORDS = (
+    'alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel',
+    'india', 'juliet', 'kilo', 'lima', 'mike', 'november', 'oscar', 'papa',
+)
+
+
+def get_words(index, count=4):
+    return ' '.join(WORDS[(index * 7 + offset * 3) % len(WORDS)] for offset in range(count))
+
+
+def seed_dataset(users=1, projects=1, tasks=100, prefix='seed_', password='password', index=False):
+    """
+    Create `users` users with `projects` projects of `tasks` tasks each, in
+    bulk, and return the users with their `auth_token`. Search documents
+    are only written when `index` is set.
+    """
+    hashed_password = make_password(password)
+    User.objects.bulk_create([
+        User(
+            username='{}{}'.format(prefix, number),
+            email='{}{}@example.com'.format(prefix, number),
+            first_name=prefix.title(),
+            last_name='User {}'.format(number),
+            password=hashed_password
+        )
+        for number in range(users)
+    ])
+    seeded_users = list(User.objects.filter(username__in=['{}{}'.format(prefix, number) for number in range(users)]))
+    Token.objects.bulk_create([Token(key=Token().generate_key(), user=user) for user in seeded_users])
+    UserEmail.objects.bulk_create([UserEmail(user=user, email=UserEmail.objects.normalize(user.email)) for user in seeded_users])
+
+    Project.objects.bulk_create([
+        Project(
+            name='{} project {}'.format(get_words(number, 2).title(), number),
+            project_initial='P{}'.format(number),
+            description=get_words(number, 8),
+            user=user,
+            task_seq=tasks,
+            viewed=number % 17
+        )
+        for user in seeded_users for number in range(projects)
+    ])
+
+    backend = search.get_backend()
+    now = timezone.now()
+    project_ids = []
+    for project in Project.objects.filter(user__in=seeded_users).iterator():
+        project_ids.append(project.pk)
+        Task.objects.bulk_create([
+            Task(
+                seq=project.format_task_seq(number + 1),
+                name='{} {}'.format(get_words(number, 3).title(), number),
+                description=get_words(number, 12),
+                status=STATUS_CHOICES[number % len(STATUS_CHOICES)][0],
+                viewed=number % 11,
+                delete=number % 20 == 19,
+                deleted_at=now if number % 20 == 19 else None,
+                user_id=project.user_id,
+                project=project
+            )
+            for number in range(tasks)
+        ])
+        if index:
+            backend.index(search.PROJECT, project)
+            backend.index_many(search.TASK, Task.objects.filter(project=project))
+    TaskDayBucket.objects.rebuild(*project_ids)
+    TaskStatusRollup.objects.rebuild(*project_ids)
+
+    return list(User.objects.filter(pk__in=[user.pk for user in seeded_users]).select_related('auth_token'))
+
+
+def check_confirmed(options, prefix):
+    """
+    Refuse to go on unless the command was run with `--yes`: the commands
+    that commit a dataset write it next to the real rows of the configured
+    database and delete it afterwards.
+    """
+    if not options.get('yes'):
+        raise CommandError(
+            "This seeds and then deletes '{}*' users, projects and tasks in the database {!r}. "
+            "Point DATABASE_URL at a scratch database and run again with --yes.".format(
+                prefix, connection.settings_dict['NAME']
+            )
+        )
+
+
+def delete_dataset(prefix='seed_'):
+    """
+    Delete the users created by `seed_dataset` and everything they own.
+    """
+    users = User.objects.filter(username__regex=r'^{}[0-9]+$'.format(re.escape(prefix)), email__endswith='@example.com')
+    Task.objects.filter(project__user__in=users).delete()
+    TaskDayBucket.objects.filter(project__user__in=users).delete()
+    TaskStatusRollup.objects.filter(project__user__in=users).delete()
+    Project.objects.filter(user__in=users).delete()
+    return users.delete()
@@ -1,8 +1,13 @@
+import pytz
+
 from rest_framework import serializers, exceptions
 
 from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
 
-from api.models import Project, Task
+from api import dates
+from api.metrics import metrics
+from api.models import STATUS_CHOICES, Project, Task, TaskStatusRollup, UserEmail
 from api.utils import create_username, pretty_date
 
 
@@ -13,6 +18,45 @@ class CreatedDateSerializer(serializers.Serializer):
         return obj.created.strftime("%b %d, %Y at %H:%M")
 
 
+class NestedSerializerMixin(object):
+    """
+    Serializes related objects through the serializers declared in
+    `nested_serializers` and memoizes their payloads in the serializer
+    context, so a list serializes every user or project only once.
+    """
+    nested_serializers = {}
+
+    @classmethod
+    def get_related_paths(cls, prefix=''):
+        paths = []
+        for field_name, serializer_class in cls.nested_serializers.items():
+            path = prefix + field_name
+            paths.append(path)
+            if issubclass(serializer_class, NestedSerializerMixin):
+                paths.extend(serializer_class.get_related_paths(path + '__'))
+        return paths
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        return queryset.select_related(*cls.get_related_paths())
+
+    @property
+    def data(self):
+        with metrics.timer('serialize'):
+            return super(NestedSerializerMixin, self).data
+
+    def get_nested(self, obj, field_name):
+        serializer_class = self.nested_serializers[field_name]
+        cache = self.context.get('nested_cache')
+        if cache is None:
+            return serializer_class(getattr(obj, field_name), context=self.context).data
+
+        key = (serializer_class, getattr(obj, obj._meta.get_field(field_name).attname))
+        if key not in cache:
+            cache[key] = serializer_class(getattr(obj, field_name), context=self.context).data
+        return cache[key]
+
+
 class AuthCustomTokenSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField()
@@ -33,16 +77,28 @@ class SignupSerializer(serializers.Serializer):
             raise exceptions.ValidationError("All fields are required.")
 
         # User already exists
-        if User.objects.filter(email__iexact=email).exists():
+        if UserEmail.objects.filter(email=UserEmail.objects.normalize(email)).exists():
             raise exceptions.ValidationError("Account already exist using this email, Please login!")
 
-        user = User.objects.create_user(create_username(full_name.strip().title()), email, password)
         full_name_list = full_name.split()
-        user.first_name = full_name_list[0].strip().title()
-        if len(full_name_list) > 1:
-            last_data = " ".join(full_name_list[1:])
-            user.last_name = last_data.strip().title()
-        user.save()
+        for attempt in range(3):
+            try:
+                # The unique normalized email rolls back a concurrent signup of the same
+                # email, and the unique username one that was given the same name
+                with transaction.atomic():
+                    user = User(username=create_username(full_name.strip().title()), email=User.objects.normalize_email(email))
+                    user.set_password(password)
+                    user.first_name = full_name_list[0].strip().title()
+                    if len(full_name_list) > 1:
+                        last_data = " ".join(full_name_list[1:])
+                        user.last_name = last_data.strip().title()
+                    user.save()
+                break
+            except IntegrityError:
+                if UserEmail.objects.filter(email=UserEmail.objects.normalize(email)).exists():
+                    raise exceptions.ValidationError("Account already exist using this email, Please login!")
+                if attempt == 2:
+                    raise
         attrs['user'] = user
         return attrs
 
@@ -59,47 +115,129 @@ class ProjectCreateSerializer(serializers.ModelSerializer):
         fields = ('name', 'description',)
 
 
-class ProjectSerializer(serializers.ModelSerializer, CreatedDateSerializer):
+class ProjectSerializer(NestedSerializerMixin, serializers.ModelSerializer, CreatedDateSerializer):
     user = serializers.SerializerMethodField()
     modified = serializers.SerializerMethodField()
+    task_counts = serializers.SerializerMethodField()
+
+    nested_serializers = {'user': UserSerializer}
 
     class Meta:
         model = Project
-        exclude = ()
+        exclude = ('change_seq', 'task_seq', 'version', 'deleted_at')
+
+    @classmethod
+    def prefetch_task_counts(cls, rows):
+        """
+        Attach the task counts of a page of `.values()` rows with one query.
+        """
+        counts = TaskStatusRollup.objects.get_counts(*[row['id'] for row in rows])
+        for row in rows:
+            row['task_counts'] = counts[row['id']]
+        return rows
 
     def get_user(self, obj):
-        return UserSerializer(obj.user).data
+        return self.get_nested(obj, 'user')
+
+    def get_task_counts(self, obj):
+        counts = getattr(obj, 'task_counts', None)
+        if counts is None:
+            counts = TaskStatusRollup.objects.get_counts(obj.pk)[obj.pk]
+        return counts
 
     def get_modified(self, obj):
         return pretty_date(obj.modified)
 
 
+class TaskProjectSerializer(ProjectSerializer):
+    """
+    Project nested in a task payload. The task counts are left out: they
+    would cost a query per project in every task list.
+    """
+
+    def get_fields(self):
+        fields = super(TaskProjectSerializer, self).get_fields()
+        del fields['task_counts']
+        return fields
+
+
 class TaskCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Task
         fields = ('name', 'description', 'project')
 
+    def get_fields(self):
+        fields = super(TaskCreateSerializer, self).get_fields()
+        # Tasks can only be added to the live projects of the requesting user
+        request = self.context.get('request')
+        if request is None:
+            fields['project'].queryset = Project.objects.none()
+        else:
+            fields['project'].queryset = Project.objects.filter(user=request.user, delete=False)
+        return fields
+
+
+class TaskBulkDeleteSerializer(serializers.Serializer):
+    delete = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+
+class DateRangeSerializer(serializers.Serializer):
+    """
+    Query parameters of the task date filters. `from` and `to` are keywords,
+    so their fields are declared as `from_date` and `to_date`.
+    """
+    from_date = serializers.DateField(required=False)
+    to_date = serializers.DateField(required=False)
+    tz = serializers.CharField(required=False)
+
+    def get_fields(self):
+        fields = super(DateRangeSerializer, self).get_fields()
+        fields['from'] = fields.pop('from_date')
+        fields['to'] = fields.pop('to_date')
+        return fields
+
+    def validate_tz(self, value):
+        try:
+            return dates.get_timezone(value)
+        except pytz.UnknownTimeZoneError:
+            raise exceptions.ValidationError("Unknown time zone.")
+
+    def validate(self, data):
+        if 'from' in data and 'to' in data and data['to'] < data['from']:
+            raise exceptions.ValidationError({'to': ["Must not be before from."]})
+        return data
+
+
+class TaskFilterSerializer(DateRangeSerializer):
+    status = serializers.ChoiceField(choices=STATUS_CHOICES, required=False)
+
+
+class CalendarSerializer(DateRangeSerializer):
+    interval = serializers.ChoiceField(choices=('day', 'week', 'month'), required=False)
+
 
 class TaskEditSerializer(serializers.ModelSerializer):
     class Meta:
         model = Task
-        fields = ('name', 'description',)
+        fields = ('name', 'description', 'status',)
 
 
-class TaskSerializer(serializers.ModelSerializer, CreatedDateSerializer):
+class TaskSerializer(NestedSerializerMixin, serializers.ModelSerializer, CreatedDateSerializer):
     user = serializers.SerializerMethodField()
     project = serializers.SerializerMethodField()
     modified = serializers.SerializerMethodField()
 
+    nested_serializers = {'user': UserSerializer, 'project': TaskProjectSerializer}
+
     class Meta:
         model = Task
-        exclude = ()
+        exclude = ('change_seq', 'deleted_at')
 
     def get_user(self, obj):
-        return UserSerializer(obj.user).data
+        return self.get_nested(obj, 'user')
 
     def get_project(self, obj):
-        return ProjectSerializer(obj.project).data
+        return self.get_nested(obj, 'project')
 
     def get_modified(self, obj):
         return pretty_date(obj.modified)
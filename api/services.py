@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Task write paths shared by the single task endpoints and the bulk endpoint.
+Every function runs in one transaction and takes data already validated by
+the task serializers.
+
+Deletes only flag rows; `cascade_project_deletes` and `archive_deleted`,
+run by the `purge_deleted` command, later move them out of the hot tables.
+"""
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, Exists, F, OuterRef, Value, When
+from django.utils import timezone
+
+from api import events, search
+from api.dates import local_day
+from api.models import (
+    ArchivedProject, ArchivedTask, ChangeCounter, Project, Task, TaskDayBucket, TaskStatusRollup
+)
+
+
+BATCH_SIZE = 200
+
+# Editable task fields and the type of their CASE expression
+UPDATE_FIELDS = OrderedDict([
+    ('name', models.TextField),
+    ('description', models.TextField),
+    ('status', models.IntegerField),
+])
+
+
+def count_tasks(rows):
+    """
+    Apply `(project_id, created, status, deleted, sign)` task rows to the
+    rollup tables, adding the rows with a `sign` of 1 and removing the rows
+    with a `sign` of -1.
+    """
+    days = {}
+    statuses = {}
+    for project_id, created, status, deleted, sign in rows:
+        if not deleted:
+            values = days.setdefault((project_id, local_day(created)), {'count': 0})
+            values['count'] += sign
+        values = statuses.setdefault((project_id, status), {'live': 0, 'deleted': 0})
+        values['deleted' if deleted else 'live'] += sign
+    TaskDayBucket.objects.add(days)
+    TaskStatusRollup.objects.add(statuses)
+
+
+def create_tasks(user, items):
+    """
+    Create one task per validated `TaskCreateSerializer` data dict. Sequence
+    numbers are reserved as one block per project and the rows are written
+    with `bulk_create`. Returns the tasks in the order of `items`.
+    """
+    groups = OrderedDict()
+    for index, data in enumerate(items):
+        groups.setdefault(data['project'].pk, []).append((index, data))
+
+    tasks = [None] * len(items)
+    with transaction.atomic():
+        # Taken first, the change counter of the user orders concurrent writes
+        change_seq = ChangeCounter.objects.allocate(user.pk)
+        for project_id, group in groups.items():
+            project = group[0][1]['project']
+            first = Project.objects.allocate_task_seq(project_id, len(group))
+            project.task_seq = first + len(group) - 1
+            project.version += 1
+            for offset, (index, data) in enumerate(group):
+                tasks[index] = Task(
+                    seq=project.format_task_seq(first + offset),
+                    name=data['name'],
+                    project=data['project'],
+                    description=data['description'],
+                    user=user,
+                    change_seq=change_seq
+                )
+
+        Task.objects.bulk_create(tasks)
+        if any(task.pk is None for task in tasks):
+            # Only PostgreSQL returns the primary keys of bulk inserted rows;
+            # sequence numbers are unique per project, so look them up by seq.
+            for project_id, group in groups.items():
+                created = [tasks[index] for index, data in group]
+                pks = dict(Task.objects.filter(
+                    project_id=project_id, seq__in=[task.seq for task in created]
+                ).values_list('seq', 'pk'))
+                for task in created:
+                    task.pk = pks[task.seq]
+
+        count_tasks((task.project_id, task.created, task.status, False, 1) for task in tasks)
+        Project.objects.bump_version(*groups.keys())
+        search.get_backend().index_many(search.TASK, tasks)
+        events.publish('task.created', [(task.pk, task.user_id, task.project_id) for task in tasks])
+    return tasks
+
+
+def update_tasks(user, items):
+    """
+    Apply `(task, validated TaskEditSerializer data)` pairs of tasks of `user`
+    with one `UPDATE ... SET field = CASE ...` statement per batch.
+    """
+    fields = [field for field in UPDATE_FIELDS if any(field in data for task, data in items)]
+    now = timezone.now()
+    with transaction.atomic():
+        change_seq = ChangeCounter.objects.allocate(user.pk)
+        for start in range(0, len(items), BATCH_SIZE):
+            batch = items[start:start + BATCH_SIZE]
+            tasks = Task.objects.filter(pk__in=[task.pk for task, data in batch])
+            if 'status' in fields:
+                # Read the stored statuses under a lock, the instances may be stale
+                rows = tasks.select_for_update().values_list('pk', 'project_id', 'created', 'status', 'delete')
+                current = dict((row[0], row[1:]) for row in rows)
+                changes = []
+                for task, data in batch:
+                    if task.pk in current and data.get('status', current[task.pk][2]) != current[task.pk][2]:
+                        project_id, created, task_status, deleted = current[task.pk]
+                        changes += [(project_id, created, task_status, deleted, -1), (project_id, created, data['status'], deleted, 1)]
+                count_tasks(changes)
+
+            changes = {'modified': now, 'change_seq': change_seq}
+            for field in fields:
+                whens = [When(pk=task.pk, then=Value(data[field])) for task, data in batch if field in data]
+                if whens:
+                    changes[field] = Case(*whens, default=F(field), output_field=UPDATE_FIELDS[field]())
+            tasks.update(**changes)
+
+        for task, data in items:
+            for field in fields:
+                if field in data:
+                    setattr(task, field, data[field])
+            task.modified = now
+            task.change_seq = change_seq
+
+        Project.objects.bump_version(*set(task.project_id for task, data in items))
+        search.get_backend().index_many(search.TASK, [task for task, data in items])
+        events.publish('task.updated', [(task.pk, task.user_id, task.project_id) for task, data in items])
+
+
+def delete_tasks(user, task_ids):
+    """
+    Soft delete the given tasks of `user` and return the ids found.
+    """
+    with transaction.atomic():
+        change_seq = ChangeCounter.objects.allocate(user.pk)
+        tasks = Task.objects.filter(pk__in=task_ids, user=user)
+        rows = list(tasks.select_for_update().values_list('pk', 'project_id', 'created', 'status', 'delete'))
+        now = timezone.now()
+        tasks.filter(delete=False).update(delete=True, deleted_at=now, modified=now, change_seq=change_seq)
+        changes = []
+        for pk, project_id, created, task_status, deleted in rows:
+            if not deleted:
+                changes += [(project_id, created, task_status, False, -1), (project_id, created, task_status, True, 1)]
+        count_tasks(changes)
+        Project.objects.bump_version(*set(row[1] for row in rows))
+        events.publish('task.deleted', [(row[0], user.pk, row[1]) for row in rows if not row[4]])
+    return [row[0] for row in rows]
+
+
+def get_purge_options():
+    options = {'RETENTION_DAYS': 30, 'BATCH_SIZE': 500}
+    options.update(getattr(settings, 'PURGE', {}))
+    return options
+
+
+def delete_project(user, project_id):
+    """
+    Soft delete a project of `user`; its tasks are flagged later, in batches,
+    by `cascade_project_deletes`. Returns whether the project was found.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        deleted = Project.objects.filter(pk=project_id, user=user, delete=False).update(
+            delete=True, deleted_at=now, modified=now, version=F('version') + 1,
+            change_seq=ChangeCounter.objects.allocate(user.pk)
+        )
+        if deleted:
+            events.publish('project.deleted', [(int(project_id), user.pk, int(project_id))])
+    return bool(deleted)
+
+
+def cascade_project_deletes(batch_size=BATCH_SIZE):
+    """
+    Soft delete up to `batch_size` live tasks of soft deleted projects, with
+    the deletion time of their project. Returns the number of tasks flagged.
+    """
+    now = timezone.now()
+    tasks = Task.objects.filter(delete=False, project__delete=True).order_by('pk')
+    with transaction.atomic():
+        # Like the user writes, take the change counters before the task rows
+        user_ids = sorted(set(tasks.values_list('user_id', flat=True)[:batch_size]))
+        change_seqs = dict((user_id, ChangeCounter.objects.allocate(user_id)) for user_id in user_ids)
+        rows = list(tasks.filter(user_id__in=user_ids).select_for_update().values_list(
+            'pk', 'user_id', 'project_id', 'created', 'status', 'project__deleted_at'
+        )[:batch_size])
+        groups = {}
+        changes = []
+        for pk, user_id, project_id, created, task_status, project_deleted_at in rows:
+            groups.setdefault((user_id, project_deleted_at or now), []).append(pk)
+            changes += [(project_id, created, task_status, False, -1), (project_id, created, task_status, True, 1)]
+        for (user_id, value), pks in groups.items():
+            Task.objects.filter(pk__in=pks).update(
+                delete=True, deleted_at=value, modified=now, change_seq=change_seqs[user_id]
+            )
+        count_tasks(changes)
+    return len(rows)
+
+
+def archive_deleted(cutoff, batch_size=BATCH_SIZE):
+    """
+    Copy up to `batch_size` tasks, then projects without tasks, soft deleted
+    before `cutoff` to the archive tables and delete them. The delete signals
+    keep the rollups and the search index in step. Returns the number of
+    `(tasks, projects)` archived.
+    """
+    with transaction.atomic():
+        tasks = list(Task.objects.filter(delete=True, deleted_at__lt=cutoff).order_by('pk').select_for_update()[:batch_size])
+        ArchivedTask.objects.bulk_create([
+            ArchivedTask(
+                id=task.pk, user_id=task.user_id, project_id=task.project_id, seq=task.seq, name=task.name,
+                status=task.status, description=task.description, viewed=task.viewed, created=task.created,
+                modified=task.modified, deleted_at=task.deleted_at
+            )
+            for task in tasks
+        ])
+        Task.objects.filter(pk__in=[task.pk for task in tasks]).delete()
+        # Their deleted counts went down
+        Project.objects.bump_version(*set(task.project_id for task in tasks))
+
+        projects = []
+        if len(tasks) < batch_size:
+            projects = list(Project.objects.annotate(
+                has_tasks=Exists(Task.objects.filter(project=OuterRef('pk')))
+            ).filter(
+                delete=True, deleted_at__lt=cutoff, has_tasks=False
+            ).order_by('pk').select_for_update()[:batch_size - len(tasks)])
+            ArchivedProject.objects.bulk_create([
+                ArchivedProject(
+                    id=project.pk, user_id=project.user_id, name=project.name,
+                    project_initial=project.project_initial, description=project.description,
+                    viewed=project.viewed, task_seq=project.task_seq, created=project.created,
+                    modified=project.modified, deleted_at=project.deleted_at
+                )
+                for project in projects
+            ])
+            Project.objects.filter(pk__in=[project.pk for project in projects]).delete()
+    return len(tasks), len(projects)
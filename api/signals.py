@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import logging
+
+from rest_framework.authtoken.models import Token
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api import events, search, services
+from api.authentication import token_cache
+from api.models import Project, Task, UserEmail
+
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Project)
+def index_project(sender, instance, **kwargs):
+    search.get_backend().index(search.PROJECT, instance)
+
+
+@receiver(post_save, sender=Task)
+def index_task(sender, instance, **kwargs):
+    search.get_backend().index(search.TASK, instance)
+
+
+@receiver(post_save, sender=Project)
+def publish_project(sender, instance, created, **kwargs):
+    events.publish('project.created' if created else 'project.updated', [(instance.pk, instance.user_id, instance.pk)])
+
+
+@receiver(post_save, sender=Task)
+def publish_task(sender, instance, created, **kwargs):
+    # Tasks written by `api.services` are bulk inserted or updated and published there
+    events.publish('task.created' if created else 'task.updated', [(instance.pk, instance.user_id, instance.project_id)])
+
+
+@receiver(post_save, sender=Task)
+def count_created_task(sender, instance, created, **kwargs):
+    # Tasks written by `api.services` are bulk inserted and counted there
+    if created:
+        services.count_tasks([(instance.project_id, instance.created, instance.status, instance.delete, 1)])
+        Project.objects.bump_version(instance.project_id)
+
+
+@receiver(post_delete, sender=Task)
+def uncount_deleted_task(sender, instance, **kwargs):
+    services.count_tasks([(instance.project_id, instance.created, instance.status, instance.delete, -1)])
+
+
+@receiver(post_delete, sender=Project)
+def unindex_project(sender, instance, **kwargs):
+    search.get_backend().remove(search.PROJECT, instance.pk)
+
+
+@receiver(post_delete, sender=Task)
+def unindex_task(sender, instance, **kwargs):
+    search.get_backend().remove(search.TASK, instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def uncache_token(sender, instance, **kwargs):
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=User)
+def uncache_saved_user(sender, instance, **kwargs):
+    # Deactivated users lose access, others have their profile reread
+    token_cache.invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def uncache_deleted_user(sender, instance, **kwargs):
+    token_cache.invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def sync_user_email(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is None or 'email' in update_fields:
+        try:
+            UserEmail.objects.sync(instance)
+        except IntegrityError:
+            # New accounts must own their email, signup relies on the error.
+            # Older accounts sharing one with another user still save.
+            if created:
+                raise
+            logger.warning("User %s shares the email %r with another user", instance.pk, instance.email)
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming JSON responses for lists too large to build in memory. The
+envelope is rendered up front and the list is written one chunk at a time
+while the queryset is read with a server-side cursor.
+"""
+from __future__ import unicode_literals
+
+from itertools import islice
+
+from rest_framework.renderers import JSONRenderer
+
+from django.http import StreamingHttpResponse
+
+
+def serialize_in_chunks(queryset, serialize, chunk_size=500):
+    """
+    Iterate `queryset` without caching it and yield `serialize(rows)` for
+    every `chunk_size` rows.
+    """
+    rows = queryset.iterator()
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield serialize(chunk)
+
+
+def iter_json(content, key, chunks):
+    """
+    Yield `content` as JSON bytes, with `content[key]` written as an array
+    of the items in `chunks`.
+    """
+    renderer = JSONRenderer()
+    yield b'{'
+    for name, value in content.items():
+        if name != key:
+            yield renderer.render({name: value})[1:-1] + b','
+    yield renderer.render(key) + b':['
+    first = True
+    for chunk in chunks:
+        if not chunk:
+            continue
+        data = b','.join(renderer.render(item) for item in chunk)
+        yield data if first else b',' + data
+        first = False
+    yield b']}'
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+
+    def __init__(self, content, key, chunks, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super(StreamingJSONResponse, self).__init__(iter_json(content, key, chunks), **kwargs)
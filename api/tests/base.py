@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from api import search
+from api.authentication import token_cache
+from api.counters import view_counter
+from api.models import Project, Task
+
+
+class APITestMixin(object):
+    """
+    Signed in `user`, authenticated `client` and helpers to create projects
+    and tasks.
+    """
+
+    def setUp(self):
+        super(APITestMixin, self).setUp()
+        # Process-wide caches outlive the rolled back test transactions
+        token_cache.clear()
+        view_counter.pending.clear()
+        self.user = self.create_user('john', 'john@example.com')
+        self.client = self.get_client(self.user)
+
+    def create_user(self, username, email, password='password'):
+        user = User.objects.create_user(username, email, password)
+        Token.objects.create(user=user)
+        return user
+
+    def get_client(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token {}'.format(user.auth_token.key))
+        return client
+
+    def create_project(self, name='My project', user=None, **kwargs):
+        return Project.objects.create(
+            name=name,
+            project_initial="".join(item[:1].title() for item in name.split()),
+            description=kwargs.pop('description', 'description'),
+            user=user or self.user,
+            **kwargs
+        )
+
+    def create_tasks(self, project, count, **kwargs):
+        tasks = []
+        for number in range(count):
+            project.task_seq += 1
+            tasks.append(Task.objects.create(
+                seq=project.format_task_seq(project.task_seq),
+                name=kwargs.get('name', 'Task {}'.format(project.task_seq)),
+                description=kwargs.get('description', 'description'),
+                status=kwargs.get('status', 0),
+                project=project,
+                user=project.user
+            ))
+        Project.objects.filter(pk=project.pk).update(task_seq=project.task_seq)
+        return tasks
+
+    def get_json(self, response):
+        if response.streaming:
+            return json.loads(b''.join(response.streaming_content).decode('utf-8'))
+        return json.loads(response.content.decode('utf-8'))
+
+    def get(self, path, data=None, client=None, **extra):
+        return self.get_json((client or self.client).get(path, data, **extra))
+
+    def post(self, path, data, client=None):
+        return self.get_json((client or self.client).post(path, data, format='json'))
+
+    def put(self, path, data, client=None):
+        return self.get_json((client or self.client).put(path, data, format='json'))
+
+    def delete(self, path, client=None):
+        return self.get_json((client or self.client).delete(path))
+
+
+# View counters are only flushed by the tests that mean to
+@override_settings(VIEW_COUNTERS={'FLUSH_INTERVAL': 3600, 'MAX_PENDING': 100000})
+class APITestCase(APITestMixin, TestCase):
+    pass
+
+
+@override_settings(VIEW_COUNTERS={'FLUSH_INTERVAL': 3600, 'MAX_PENDING': 100000})
+class APITransactionTestCase(APITestMixin, TransactionTestCase):
+    """
+    For tests of `transaction.on_commit` callbacks, which never run inside
+    the transaction of a `TestCase`.
+    """
+
+    def tearDown(self):
+        super(APITransactionTestCase, self).tearDown()
+        # Not a model table, so the flush between tests leaves it alone
+        if search.get_backend() is not search.FALLBACK_BACKEND:
+            with connection.cursor() as cursor:
+                cursor.execute('DELETE FROM {}'.format(search.TABLE))
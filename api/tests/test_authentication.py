@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from rest_framework.authtoken.models import Token
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from api.authentication import CachedTokenAuthentication, TokenCache, token_cache
+from api.tests.base import APITestCase
+
+
+class TokenCacheTests(APITestCase):
+
+    def authenticate(self):
+        return CachedTokenAuthentication().authenticate_credentials(self.user.auth_token.key)
+
+    def test_hits_skip_the_database(self):
+        self.authenticate()
+        with CaptureQueriesContext(connection) as context:
+            user, token = self.authenticate()
+        self.assertEqual(len(context.captured_queries), 0)
+        self.assertEqual((user.pk, user.username, user.email), (self.user.pk, 'john', 'john@example.com'))
+        self.assertEqual(token.key, self.user.auth_token.key)
+        self.assertIs(token.user, user)
+        self.assertFalse(user._state.adding)
+
+    def test_hits_return_new_instances(self):
+        user, token = self.authenticate()
+        user.first_name = 'Changed by a view'
+        user.some_attribute = True
+        again, token = self.authenticate()
+        self.assertIsNot(again, user)
+        self.assertEqual(again.first_name, '')
+        self.assertFalse(hasattr(again, 'some_attribute'))
+
+    def test_deleted_token_is_rejected(self):
+        self.assertEqual(self.client.get('/api/projects/').status_code, 200)
+        Token.objects.filter(user=self.user).delete()
+        self.assertEqual(self.client.get('/api/projects/').status_code, 401)
+
+    def test_inactive_user_is_rejected(self):
+        self.assertEqual(self.client.get('/api/projects/').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/projects/').status_code, 401)
+        self.user.is_active = True
+        self.user.save()
+        self.assertEqual(self.client.get('/api/projects/').status_code, 200)
+
+    def test_entries_expire(self):
+        cache = TokenCache()
+        with override_settings(TOKEN_CACHE={'MAXSIZE': 10, 'TTL': -1}):
+            cache.set('key', (self.user, self.user.auth_token))
+        self.assertIsNone(cache.get('key'))
+
+    def test_lru_eviction(self):
+        cache = TokenCache()
+        other = self.create_user('jane', 'jane@example.com')
+        with override_settings(TOKEN_CACHE={'MAXSIZE': 1, 'TTL': 60}):
+            cache.set('john', (self.user, self.user.auth_token))
+            cache.set('jane', (other, other.auth_token))
+        self.assertIsNone(cache.get('john'))
+        self.assertEqual(cache.get('jane')[0].pk, other.pk)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_invalidate_user(self):
+        self.authenticate()
+        token_cache.invalidate_user(self.user.pk)
+        self.assertIsNone(token_cache.get(self.user.auth_token.key))
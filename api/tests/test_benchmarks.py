@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase
+from django.utils.six import StringIO
+
+from api.loadtest import percentile, run_clients, summarize
+from api.models import Project
+from api.tests.base import APITransactionTestCase
+
+
+class SeedConfirmationTests(APITransactionTestCase):
+
+    def test_commands_refuse_to_seed_without_yes(self):
+        for name in ('loadtest', 'benchmark_api'):
+            with self.assertRaises(CommandError) as context:
+                call_command(name, stdout=StringIO(), stderr=StringIO())
+            self.assertIn('--yes', str(context.exception))
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_benchmark_cleans_up(self):
+        if connection.vendor == 'sqlite' and connection.creation.is_in_memory_db(connection.settings_dict['NAME']):
+            if not connection.features.can_share_in_memory_db:
+                self.skipTest("The client threads cannot see this in-memory SQLite database")
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        output = os.path.join(directory, 'results.json')
+        out = StringIO()
+        call_command(
+            'benchmark_api', yes=True, only='ProjectListViewSet,ProjectDetailViewSet', users=1, projects=2, tasks=3,
+            clients=1, requests=2, output=output, stdout=out
+        )
+        with open(output) as results:
+            routes = json.load(results)['routes']
+        self.assertEqual(routes['GET /api/projects/']['errors'], 0)
+        self.assertEqual(routes['GET /api/projects/<pk>/']['requests'], 2)
+        self.assertEqual(User.objects.count(), 1)
+        self.assertFalse(Project.objects.exists())
+
+        # A baseline twice as fast as this run is a regression
+        for stats in routes.values():
+            stats['p95'] /= 4
+        with open(output, 'w') as results:
+            json.dump({'meta': {}, 'routes': routes}, results)
+        with self.assertRaises(CommandError):
+            call_command(
+                'benchmark_api', yes=True, only='ProjectListViewSet', users=1, projects=1, tasks=1,
+                clients=1, requests=20, compare=output, max_regression=0.0, stdout=StringIO()
+            )
+
+
+class LoadStatisticsTests(SimpleTestCase):
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile([7], 0.95), 7)
+        self.assertIsNone(percentile([], 0.5))
+
+    def test_summarize(self):
+        stats = summarize([0.003, 0.001, 0.002], 1, 2.0)
+        self.assertEqual((stats['requests'], stats['errors'], stats['throughput']), (4, 1, 1.5))
+        self.assertEqual((stats['p50'], stats['max']), (2.0, 3.0))
+
+    def test_run_clients(self):
+        calls = []
+
+        def request(session, client, number):
+            calls.append((session, client, number))
+            return number != 1
+
+        latencies, errors, elapsed = run_clients(request, 3, 2, session_factory=lambda client: 'session {}'.format(client))
+        self.assertEqual((len(latencies), errors), (3, 3))
+        self.assertEqual(sorted(calls), [('session {}'.format(client), client, number) for client in range(3) for number in range(2)])
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from api import events, search
+from api.models import Project, Task, TaskStatusRollup
+from api.tests.base import APITestCase, APITransactionTestCase
+
+
+class TaskBulkTests(APITestCase):
+
+    def setUp(self):
+        super(TaskBulkTests, self).setUp()
+        self.project = self.create_project('My project')
+        self.tasks = self.create_tasks(self.project, 3)
+
+    def test_create_update_delete(self):
+        data = self.post('/api/tasks/bulk/', {
+            'create': [{'name': 'New', 'description': 'd', 'project': self.project.pk}, {'name': 'Invalid'}],
+            'update': [{'id': self.tasks[0].pk, 'name': 'Renamed', 'description': 'd', 'status': 2}, {'id': 424242, 'name': 'x'}],
+            'delete': [self.tasks[1].pk, 424242],
+        })
+        self.assertEqual([result['status']['isSuccess'] for result in data['create']], [True, False])
+        self.assertEqual(data['create'][0]['task']['seq'], 'MP-4')
+        self.assertIn('project', data['create'][1]['errors'])
+        self.assertEqual([result['status']['isSuccess'] for result in data['update']], [True, False])
+        self.assertEqual(Task.objects.get(pk=self.tasks[0].pk).name, 'Renamed')
+        self.assertEqual([result['status']['isSuccess'] for result in data['delete']], [True, False])
+        self.assertTrue(Task.objects.get(pk=self.tasks[1].pk).delete)
+
+    def test_malformed_delete_ids_are_rejected(self):
+        for ids in ([{'id': 1}], [[1]], ['one'], [None]):
+            response = self.client.post('/api/tasks/bulk/', {'delete': ids}, format='json')
+            self.assertEqual(response.status_code, 400, ids)
+            self.assertIn('delete', self.get_json(response))
+        self.assertFalse(Task.objects.filter(delete=True).exists())
+
+    def test_malformed_update_ids_are_not_found(self):
+        data = self.post('/api/tasks/bulk/', {'update': [{'id': [1], 'name': 'x'}, {'id': {'a': 1}}, 'text']})
+        self.assertEqual([result['status']['message'] for result in data['update']], ['Not Found'] * 3)
+
+    def test_boolean_update_ids_are_not_found(self):
+        # JSON true and false are not the ids 1 and 0
+        Task.objects.filter(pk=1).exclude(pk=self.tasks[0].pk).update(id=10 ** 6)
+        Task.objects.filter(pk=self.tasks[0].pk).update(id=1)
+        data = self.post('/api/tasks/bulk/', {'update': [{'id': True, 'name': 'x', 'description': 'd', 'status': 0}]})
+        self.assertEqual(data['update'][0]['status']['message'], 'Not Found')
+        self.assertEqual(Task.objects.get(pk=1).name, self.tasks[0].name)
+
+    def test_too_many_items(self):
+        response = self.client.post('/api/tasks/bulk/', {'delete': list(range(501))}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_tasks_only_go_to_own_live_projects(self):
+        other = self.create_user('jane', 'jane@example.com')
+        foreign = self.create_project('Foreign project', user=other)
+        deleted = self.create_project('Deleted project', delete=True)
+        data = self.post('/api/tasks/bulk/', {'create': [
+            {'name': 'Task', 'description': 'd', 'project': project.pk} for project in (foreign, deleted, self.project)
+        ]})
+        self.assertEqual([result['status']['isSuccess'] for result in data['create']], [False, False, True])
+        self.assertIn('project', data['create'][0]['errors'])
+        response = self.client.post('/api/tasks/', {'name': 'Task', 'description': 'd', 'project': foreign.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Task.objects.filter(project=foreign).exists())
+
+    def test_put_updates_index_rollups_and_version(self):
+        task = self.tasks[0]
+        version = Project.objects.get(pk=self.project.pk).version
+        data = self.put('/api/tasks/{}/'.format(task.pk), {'name': 'Shipped', 'description': 'd', 'status': 2})
+        self.assertEqual(data['task']['name'], 'Shipped')
+        self.assertEqual(search.get_backend().search(search.TASK, 'shipped', project_id=self.project.pk), [task.pk])
+        counts = TaskStatusRollup.objects.get_counts(self.project.pk)[self.project.pk]
+        self.assertEqual((counts['pending'], counts['done']), (2, 1))
+        self.assertEqual(Project.objects.get(pk=self.project.pk).version, version + 1)
+
+
+class TaskUpdateEventTests(APITransactionTestCase):
+
+    def test_put_publishes_an_event(self):
+        project = self.create_project('My project')
+        task = self.create_tasks(project, 1)[0]
+        subscription = events.hub.subscribe([events.project_channel(project.pk)], 10)
+        try:
+            self.put('/api/tasks/{}/'.format(task.pk), {'name': 'Renamed', 'description': 'd', 'status': 1})
+            self.assertEqual(subscription.get(1), {'type': 'task.updated', 'id': task.pk, 'project': project.pk})
+        finally:
+            events.hub.unsubscribe(subscription)
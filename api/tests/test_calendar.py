@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+from datetime import date, datetime
+
+import pytz
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.models import Task, TaskDayBucket
+from api.tests.base import APITestCase
+
+
+class CalendarTests(APITestCase):
+
+    def setUp(self):
+        super(CalendarTests, self).setUp()
+        self.project = self.create_project()
+        self.path = '/api/projects/{}/'.format(self.project.pk)
+        # UTC creation times: two on Monday 2017-05-01, one late on Sunday
+        # 2017-05-07 (already Monday in Kolkata) and one in June
+        created = [
+            datetime(2017, 5, 1, 9), datetime(2017, 5, 1, 23), datetime(2017, 5, 7, 20), datetime(2017, 6, 2, 12)
+        ]
+        self.tasks = self.create_tasks(self.project, len(created))
+        for task, value in zip(self.tasks, created):
+            Task.objects.filter(pk=task.pk).update(created=pytz.utc.localize(value))
+        TaskDayBucket.objects.rebuild(self.project.pk)
+
+    def get_days(self, **params):
+        data = self.get(self.path + 'calendar/', params)
+        return [(item['day'], item['count']) for item in data['days']], data['total']
+
+    def get_task_ids(self, **params):
+        return sorted(task['id'] for task in self.get(self.path, params)['tasks'])
+
+    def test_days(self):
+        self.assertEqual(self.get_days(), ([('2017-05-01', 2), ('2017-05-07', 1), ('2017-06-02', 1)], 4))
+        self.assertEqual(self.get_days(**{'from': '2017-05-02', 'to': '2017-05-31'}), ([('2017-05-07', 1)], 1))
+
+    def test_intervals(self):
+        self.assertEqual(self.get_days(interval='week'), ([('2017-05-01', 3), ('2017-05-29', 1)], 4))
+        self.assertEqual(self.get_days(interval='month'), ([('2017-05-01', 3), ('2017-06-01', 1)], 4))
+
+    def test_other_time_zone(self):
+        self.assertEqual(
+            self.get_days(tz='Asia/Kolkata'),
+            ([('2017-05-01', 1), ('2017-05-02', 1), ('2017-05-08', 1), ('2017-06-02', 1)], 4)
+        )
+
+    def test_task_date_filter(self):
+        first, second, third, fourth = [task.pk for task in self.tasks]
+        self.assertEqual(self.get_task_ids(**{'from': '2017-05-01'}), [first, second])
+        self.assertEqual(self.get_task_ids(**{'from': '2017-05-01', 'to': '2017-05-07'}), [first, second, third])
+        self.assertEqual(self.get_task_ids(**{'from': '2017-05-08', 'tz': 'Asia/Kolkata'}), [third])
+        self.assertEqual(self.get_task_ids(**{'from': '2017-05-01', 'status': '0'}), [first, second])
+        self.assertEqual(self.get_task_ids(**{'from': '2017-05-01', 'status': '2'}), [])
+
+    def test_invalid_parameters(self):
+        for path in (self.path, self.path + 'calendar/'):
+            for name, value in (('tz', 'Mars/Olympus'), ('from', '2017-13-01'), ('to', 'tomorrow')):
+                response = self.client.get(path, {name: value})
+                self.assertEqual(response.status_code, 400, (path, name))
+                self.assertIn(name, self.get_json(response))
+            response = self.client.get(path, {'from': '2017-05-02', 'to': '2017-05-01'})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('to', self.get_json(response))
+        self.assertEqual(self.client.get(self.path, {'status': '7'}).status_code, 400)
+        self.assertEqual(self.client.get(self.path + 'calendar/', {'interval': 'year'}).status_code, 400)
+
+
+class RollupTests(APITestCase):
+
+    def test_add_updates_in_key_order(self):
+        project = self.create_project()
+        days = [date(2017, 5, day) for day in (3, 1, 2)]
+        TaskDayBucket.objects.bulk_create([TaskDayBucket(project=project, day=day, count=1) for day in days])
+        changes = OrderedDict(((project.pk, day), {'count': 1}) for day in days)
+        with CaptureQueriesContext(connection) as context:
+            TaskDayBucket.objects.add(changes)
+        updated = [day for query in context.captured_queries for day in sorted(days) if str(day) in query['sql']]
+        self.assertEqual(updated, sorted(days))
+        self.assertEqual(set(TaskDayBucket.objects.values_list('count', flat=True)), {2})
+
+    def test_add_creates_missing_rows(self):
+        project = self.create_project()
+        TaskDayBucket.objects.add({(project.pk, date(2017, 5, 1)): {'count': 2}, (project.pk, date(2017, 5, 2)): {'count': -1}})
+        self.assertEqual(list(TaskDayBucket.objects.values_list('day', 'count')), [(date(2017, 5, 1), 2)])
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from api.tests.base import APITestCase
+
+
+class ConditionalGetTests(APITestCase):
+
+    def setUp(self):
+        super(ConditionalGetTests, self).setUp()
+        self.project = self.create_project()
+        self.create_tasks(self.project, 2)
+        self.path = '/api/projects/{}/'.format(self.project.pk)
+
+    def get_etag(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def get_status(self, path, etag):
+        return self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code
+
+    def test_etags_are_weak(self):
+        for path in ('/api/projects/', '/api/projects/summary/', self.path, self.path + 'calendar/'):
+            etag = self.get_etag(path)
+            self.assertTrue(etag.startswith('W/"'), etag)
+            self.assertEqual(self.get_status(path, etag), 304)
+            # If-None-Match compares weakly
+            self.assertEqual(self.get_status(path, etag[2:]), 304)
+            self.assertEqual(self.get_status(path, '"other", ' + etag), 304)
+
+    def test_writes_change_the_etag(self):
+        etag = self.get_etag(self.path)
+        self.post('/api/tasks/', {'name': 'Task', 'description': 'd', 'project': self.project.pk})
+        self.assertEqual(self.get_status(self.path, etag), 200)
+        etag = self.get_etag(self.path)
+        self.put(self.path, {'name': 'Renamed', 'description': 'd'})
+        self.assertEqual(self.get_status(self.path, etag), 200)
+
+    def test_query_string_changes_the_etag(self):
+        etag = self.get_etag('/api/projects/')
+        self.assertEqual(self.get_status('/api/projects/?q=my', etag), 200)
+
+    def test_user_changes_change_the_etag(self):
+        etags = dict((path, self.get_etag(path)) for path in ('/api/projects/', self.path))
+        self.user.first_name = 'Johnny'
+        self.user.save()
+        for path, etag in etags.items():
+            self.assertEqual(self.get_status(path, etag), 200, path)
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from api.counters import ViewCounter, view_counter
+from api.models import Project, Task
+from api.tests.base import APITestCase, APITransactionTestCase
+
+
+class BrokenManager(object):
+
+    def filter(self, **kwargs):
+        raise RuntimeError("database is down")
+
+
+class BrokenModel(object):
+    __name__ = 'BrokenModel'
+    _default_manager = BrokenManager()
+
+
+class ViewCounterTests(APITestCase):
+
+    def test_views_are_written_behind(self):
+        project = self.create_project()
+        path = '/api/projects/{}/'.format(project.pk)
+        modified = Project.objects.get(pk=project.pk).modified
+        self.assertEqual(self.get(path)['project']['viewed'], 1)
+        self.assertEqual(self.get(path)['project']['viewed'], 2)
+        self.assertEqual(Project.objects.get(pk=project.pk).viewed, 0)
+
+        self.assertEqual(view_counter.flush(), 1)
+        project = Project.objects.get(pk=project.pk)
+        self.assertEqual(project.viewed, 2)
+        self.assertEqual(project.modified, modified)
+        self.assertEqual(self.get(path)['project']['viewed'], 3)
+
+    def test_flush_batches_equal_counts(self):
+        counter = ViewCounter()
+        project = self.create_project()
+        tasks = self.create_tasks(project, 4)
+        for task in tasks:
+            counter.add(Task, task.pk)
+        counter.add(Task, tasks[0].pk)
+        counter.add(Project, project.pk)
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(counter.flush(), 5)
+        # One UPDATE per (model, count): tasks +1, tasks +2 and the project
+        self.assertEqual(len(context.captured_queries), 3)
+        self.assertEqual(dict(Task.objects.values_list('pk', 'viewed')), dict(
+            [(tasks[0].pk, 2)] + [(task.pk, 1) for task in tasks[1:]]
+        ))
+        self.assertEqual(counter.flush(), 0)
+
+    def test_failed_flush_keeps_the_views(self):
+        counter = ViewCounter()
+        counter.add(BrokenModel, 1)
+        counter.add(BrokenModel, 1)
+        self.assertEqual(counter.flush(), 0)
+        self.assertEqual(dict(counter.pending), {(BrokenModel, 1): 2})
+
+    def test_is_due(self):
+        counter = ViewCounter()
+        self.assertFalse(counter.is_due())
+        counter.add(Project, 1)
+        with override_settings(VIEW_COUNTERS={'FLUSH_INTERVAL': 3600, 'MAX_PENDING': 2}):
+            self.assertFalse(counter.is_due())
+            counter.add(Project, 2)
+            self.assertTrue(counter.is_due())
+        with override_settings(VIEW_COUNTERS={'FLUSH_INTERVAL': 0, 'MAX_PENDING': 1000}):
+            self.assertTrue(counter.is_due())
+
+
+class ViewCounterConnectionTests(APITransactionTestCase):
+
+    def flush(self):
+        counter = ViewCounter()
+        counter.add(Project, self.create_project().pk)
+        closed = []
+        connection.close = lambda: closed.append(True)
+        try:
+            self.assertEqual(counter.flush(), 1)
+        finally:
+            del connection.close
+        return closed
+
+    @override_settings(DATABASE_POOL={'ENABLED': True})
+    def test_flush_hands_its_pooled_connection_back(self):
+        # Flushed once Django closed the connection of the request
+        self.assertEqual(self.flush(), [True])
+
+    @override_settings(DATABASE_POOL={'ENABLED': False})
+    def test_flush_keeps_its_persistent_connection(self):
+        self.assertEqual(self.flush(), [])
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+
+from rest_framework.test import APIClient
+
+from api import events
+from api.tests.base import APITestCase, APITransactionTestCase
+
+
+class EventStreamTests(APITestCase):
+
+    def tearDown(self):
+        super(EventStreamTests, self).tearDown()
+        self.assertEqual(events.hub.count, 0)
+
+    def test_abandoned_streams_are_released(self):
+        # Closed by the server without the body ever being read
+        for number in range(events.get_options()['MAX_STREAMS'] * 2):
+            response = self.client.get('/api/events/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            response.close()
+        self.assertEqual(events.hub.count, 0)
+        self.assertEqual(events.hub.channels, {})
+
+    def test_too_many_streams(self):
+        responses = [self.client.get('/api/events/') for number in range(events.get_options()['MAX_STREAMS'])]
+        try:
+            response = self.client.get('/api/events/')
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response['Retry-After'], '30')
+        finally:
+            for response in responses:
+                response.close()
+                response.close()
+
+    def test_foreign_project_is_not_found(self):
+        other = self.create_user('jane', 'jane@example.com')
+        project = self.create_project('Foreign project', user=other)
+        data = self.get('/api/events/', {'project': project.pk})
+        self.assertEqual(data['status']['message'], "Not Found")
+
+    def test_query_token(self):
+        client = APIClient()
+        self.assertEqual(client.get('/api/events/').status_code, 401)
+        response = client.get('/api/events/', {'token': self.user.auth_token.key})
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+
+class EventDeliveryTests(APITransactionTestCase):
+
+    def test_stream_receives_committed_writes(self):
+        project = self.create_project('My project')
+        task = self.create_tasks(project, 1)[0]
+        response = self.client.get('/api/events/', {'project': project.pk})
+        try:
+            content = iter(response.streaming_content)
+            self.assertTrue(next(content).startswith(b'retry: '))
+            self.put('/api/tasks/{}/'.format(task.pk), {'name': 'Renamed', 'description': 'd', 'status': 1})
+            chunk = next(content).decode('utf-8')
+            self.assertTrue(chunk.startswith('event: task.updated\n'))
+            self.assertEqual(json.loads(chunk.split('data: ', 1)[1]), {'type': 'task.updated', 'id': task.pk, 'project': project.pk})
+        finally:
+            response.close()
+        self.assertEqual(events.hub.count, 0)
+
+    def test_local_broker_dispatches_to_the_hub(self):
+        subscription = events.hub.subscribe(['user:1'], 10)
+        try:
+            events.LocalBroker(events.hub).publish([{'channels': ['user:1', 'project:2'], 'event': {'type': 'x'}}])
+            self.assertEqual(subscription.get(0), {'type': 'x'})
+            self.assertIsNone(subscription.get(0))
+        finally:
+            events.hub.unsubscribe(subscription)
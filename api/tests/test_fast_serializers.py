@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from rest_framework.renderers import JSONRenderer
+
+from api.fast_serializers import get_compiled
+from api.models import Project, Task
+from api.serializers import ProjectSerializer, TaskSerializer
+from api.tests.base import APITestCase
+
+
+class CompiledSerializerTests(APITestCase):
+
+    def setUp(self):
+        super(CompiledSerializerTests, self).setUp()
+        self.project = self.create_project('My project', description='é and more')
+        self.tasks = self.create_tasks(self.project, 3)
+        Task.objects.filter(pk=self.tasks[0].pk).update(delete=True, status=2)
+
+    def assertSameJSON(self, serializer_class, queryset):
+        compiled = get_compiled(serializer_class)
+        expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+        rows = compiled.values(queryset)
+        if serializer_class is ProjectSerializer:
+            rows = ProjectSerializer.prefetch_task_counts(list(rows))
+        self.assertEqual(JSONRenderer().render(compiled.serialize(rows)), expected)
+
+    def test_tasks_render_identically(self):
+        self.assertSameJSON(TaskSerializer, Task.objects.order_by('pk'))
+
+    def test_projects_render_identically(self):
+        self.create_project('Other project')
+        self.assertSameJSON(ProjectSerializer, Project.objects.order_by('pk'))
+
+    def test_compiled_once(self):
+        self.assertIs(get_compiled(TaskSerializer), get_compiled(TaskSerializer))
+
+    def test_values_read_one_query(self):
+        compiled = get_compiled(TaskSerializer)
+        with self.assertNumQueries(1):
+            rows = list(compiled.values(Task.objects.all()))
+        self.assertEqual(len(compiled.serialize(rows)), 3)
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.utils.six import StringIO
+
+from api.models import Project, Task
+
+
+class QueryPlanTests(TestCase):
+
+    def test_read_endpoints_use_indexes(self):
+        out = StringIO()
+        call_command('check_query_plans', users=2, projects=3, tasks=30, stdout=out)
+        self.assertIn("No sequential scans of api_project or api_task.", out.getvalue())
+        self.assertIn('/api/sync/?limit=100', out.getvalue())
+        # The seeded dataset is rolled back
+        self.assertFalse(Project.objects.exists())
+        self.assertFalse(Task.objects.exists())
+
+    def test_indexes_exist(self):
+        with connection.cursor() as cursor:
+            indexes = set()
+            for table in ('api_project', 'api_task'):
+                indexes.update(connection.introspection.get_constraints(cursor, table))
+        for name in ('api_project_user_created', 'api_project_user_viewed', 'api_task_project_created',
+                     'api_task_project_viewed', 'api_task_project_status'):
+            self.assertIn(name, indexes)
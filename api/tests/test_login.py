@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from rest_framework.test import APIClient
+
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_login_failed
+from django.db import IntegrityError
+from django.test import override_settings
+
+from api.checks import check_shared_emails
+from api.models import UserEmail
+from api.tests.base import APITestCase
+
+
+class DenyAllBackend(object):
+
+    def authenticate(self, request, username=None, password=None):
+        return None
+
+
+class LoginTests(APITestCase):
+
+    def setUp(self):
+        super(LoginTests, self).setUp()
+        self.failures = []
+        handler = lambda sender, credentials, **kwargs: self.failures.append(credentials.get('username'))
+        user_login_failed.connect(handler, weak=False, dispatch_uid='test_login')
+        self.addCleanup(user_login_failed.disconnect, dispatch_uid='test_login')
+
+    def login(self, email, password='password'):
+        return self.get_json(APIClient().post('/api/auth/', {'email': email, 'password': password}, format='json'))
+
+    def test_email_is_case_insensitive(self):
+        data = self.login(' John@Example.COM ')
+        self.assertTrue(data['status']['isSuccess'])
+        self.assertEqual(data['token'], self.user.auth_token.key)
+        self.assertEqual(data['user']['username'], 'john')
+
+    def test_invalid_credentials(self):
+        self.assertEqual(self.login('john@example.com', 'wrong')['status']['message'], "Invalid Credentials")
+        self.assertEqual(self.login('nobody@example.com')['status']['message'], "Invalid Credentials")
+        self.assertEqual(self.failures, ['john', None])
+
+    def test_inactive_user(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertFalse(self.login('john@example.com')['status']['isSuccess'])
+
+    @override_settings(AUTHENTICATION_BACKENDS=['api.tests.test_login.DenyAllBackend'])
+    def test_authentication_backends_decide(self):
+        self.assertFalse(self.login('john@example.com')['status']['isSuccess'])
+
+    def test_signup_rejects_taken_emails(self):
+        response = self.client.post('/api/signup/', {
+            'full_name': 'Other John', 'email': 'JOHN@example.com', 'password': 'password'
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(User.objects.filter(first_name='Other').count(), 0)
+
+    def test_signup_then_login(self):
+        data = self.post('/api/signup/', {'full_name': 'jane doe', 'email': 'Jane@Example.com', 'password': 'secret'})
+        self.assertTrue(data['status']['isSuccess'])
+        self.assertEqual(UserEmail.objects.get(user__username=data['user']['username']).email, 'jane@example.com')
+        self.assertEqual(self.login('jane@example.com', 'secret')['token'], data['token'])
+
+
+class UserEmailTests(APITestCase):
+
+    def test_email_changes_follow_the_user(self):
+        self.user.email = 'Johnny@Example.com'
+        self.user.save()
+        self.assertEqual(UserEmail.objects.get_username('johnny@example.com'), 'john')
+        self.assertIsNone(UserEmail.objects.get_username('john@example.com'))
+        self.user.email = ''
+        self.user.save()
+        self.assertFalse(UserEmail.objects.filter(user=self.user).exists())
+
+    def test_new_users_must_own_their_email(self):
+        with self.assertRaises(IntegrityError):
+            User.objects.create_user('other', 'JOHN@example.com', 'password')
+
+    def test_users_sharing_an_email_still_save(self):
+        other = self.create_user('other', 'other@example.com')
+        self.assertEqual(check_shared_emails(None), [])
+
+        # A legacy account that shares the email of john
+        User.objects.filter(pk=other.pk).update(email='john@example.com')
+        UserEmail.objects.filter(user=other).delete()
+        other = User.objects.get(pk=other.pk)
+        other.first_name = 'Other'
+        other.save()
+        self.assertEqual(UserEmail.objects.get_username('john@example.com'), 'john')
+        self.assertFalse(UserEmail.objects.filter(user=other).exists())
+
+        warnings = check_shared_emails(None)
+        self.assertEqual([warning.id for warning in warnings], ['api.W001'])
+        self.assertIn('other', warnings[0].msg)
+
+    def test_taking_an_email_forgets_the_previous_one(self):
+        other = self.create_user('other', 'other@example.com')
+        other.email = 'john@example.com'
+        other.save()
+        self.assertIsNone(UserEmail.objects.get_username('other@example.com'))
+        self.assertEqual(UserEmail.objects.get_username('john@example.com'), 'john')
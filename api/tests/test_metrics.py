@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import re
+
+from rest_framework.test import APIClient
+
+from django.db import connection
+from django.test import override_settings
+
+from api.metrics import TimedCursorDebugWrapper, TimedCursorWrapper, metrics
+from api.tests.base import APITestCase
+
+
+class MetricsTests(APITestCase):
+
+    def setUp(self):
+        super(MetricsTests, self).setUp()
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def get_sample(self, text, name, view):
+        match = re.search(r'^{}\{{view="{}"\}} (\S+)$'.format(name, re.escape(view)), text, re.M)
+        return float(match.group(1)) if match else None
+
+    def test_metrics_need_staff_without_a_token(self):
+        self.assertEqual(APIClient().get('/api/metrics/').status_code, 403)
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+
+    @override_settings(METRICS={'ENABLED': True, 'SERVER_TIMING': False, 'TOKEN': 'secret'})
+    def test_metrics_need_the_token_when_set(self):
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+        self.assertEqual(APIClient().get('/api/metrics/', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(APIClient().get('/api/metrics/', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+    def test_cursors_are_timed(self):
+        with connection.cursor() as cursor:
+            self.assertIsInstance(cursor, (TimedCursorWrapper, TimedCursorDebugWrapper))
+
+    def test_requests_are_recorded(self):
+        project = self.create_project()
+        self.create_tasks(project, 2)
+        for number in range(2):
+            self.client.get('/api/projects/{}/'.format(project.pk))
+        text = metrics.render_prometheus()
+        view = 'ProjectDetailViewSet.get'
+        self.assertEqual(self.get_sample(text, 'ticapi_request_duration_seconds_count', view), 2)
+        self.assertGreaterEqual(self.get_sample(text, 'ticapi_db_queries_sum', view), 4)
+        self.assertGreater(self.get_sample(text, 'ticapi_db_query_duration_seconds_sum', view), 0)
+        self.assertGreater(self.get_sample(text, 'ticapi_response_size_bytes_sum', view), 0)
+        self.assertIn('ticapi_responses_total{{view="{}",status="200"}} 2'.format(view), text)
+
+    @override_settings(METRICS={'ENABLED': True, 'SERVER_TIMING': True, 'TOKEN': None})
+    def test_server_timing(self):
+        timing = self.client.get('/api/projects/')['Server-Timing']
+        self.assertRegexpMatches(timing, r'^db;dur=[0-9.]+;desc="[1-9][0-9]* queries", serialize;dur=[0-9.]+, render;dur=[0-9.]+, total;dur=[0-9.]+$')
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from api.models import Project, Task
+from api.pagination import KeysetPagination, encode_cursor
+from api.tests.base import APITestCase
+
+
+class KeysetPaginationTests(APITestCase):
+
+    def collect(self, path, key):
+        ids = []
+        pages = 0
+        while path:
+            data = self.get(path)
+            ids += [row['id'] for row in data[key]]
+            path = data['next']
+            pages += 1
+        return ids, pages
+
+    def test_task_pages(self):
+        project = self.create_project()
+        tasks = self.create_tasks(project, 25)
+        ids, pages = self.collect('/api/projects/{}/?page_size=7'.format(project.pk), 'tasks')
+        self.assertEqual(pages, 4)
+        self.assertEqual(ids, [task.pk for task in reversed(tasks)])
+
+    def test_project_pages_most_viewed_first(self):
+        projects = [self.create_project('Project {}'.format(number)) for number in range(5)]
+        for views, project in zip((3, 0, 5, 0, 1), projects):
+            Project.objects.filter(pk=project.pk).update(viewed=views)
+        ids, pages = self.collect('/api/projects/?page_size=2', 'projects')
+        self.assertEqual(pages, 3)
+        self.assertEqual(ids, [projects[index].pk for index in (2, 0, 4, 3, 1)])
+
+    def test_project_pages_after_view_changes(self):
+        projects = [self.create_project('Project {}'.format(number)) for number in range(5)]
+        data = self.get('/api/projects/?page_size=2')
+        ids = [row['id'] for row in data['projects']]
+        # Flushed views move the projects already returned ahead of the cursor
+        Project.objects.filter(pk__in=ids).update(viewed=100)
+        more, pages = self.collect(data['next'], 'projects')
+        self.assertEqual(ids + more, [project.pk for project in reversed(projects)])
+
+    def test_searched_tasks_most_viewed_first(self):
+        project = self.create_project()
+        tasks = self.create_tasks(project, 3, name='Alpha')
+        Task.objects.filter(pk=tasks[0].pk).update(viewed=2)
+        ids, pages = self.collect('/api/projects/{}/?q=alpha&page_size=2'.format(project.pk), 'tasks')
+        self.assertEqual(ids, [tasks[0].pk, tasks[2].pk, tasks[1].pk])
+
+    def test_ordering_keeps_cursor_fields(self):
+        paginator = KeysetPagination()
+        self.assertEqual(paginator.get_ordering(Project.objects.order_by('-viewed', '-created')), ['-viewed', '-created', '-pk'])
+        self.assertEqual(paginator.get_ordering(Task.objects.order_by('name')), ['pk'])
+
+    def test_malformed_cursor(self):
+        project = self.create_project()
+        for path in ('/api/projects/', '/api/projects/{}/'.format(project.pk)):
+            for cursor in ('garbage', encode_cursor(['2017-01-01T00:00:00Z']), encode_cursor(['yesterday', 1]),
+                           encode_cursor(['2017-01-01T00:00:00Z', 'one'])):
+                response = self.client.get(path, {'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(self.get_json(response), {'cursor': ['Invalid cursor.']})
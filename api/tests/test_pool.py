@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import os
+import tempfile
+import threading
+import time
+
+from django.db import connections
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from api import events
+from ticapi.db import pool
+from ticapi.db.backends.sqlite3.base import DatabaseWrapper
+
+
+class FakeError(Exception):
+    pass
+
+
+class FakeConnection(object):
+
+    def __init__(self, number):
+        self.number = number
+        self.alive = True
+        self.closed = False
+
+
+class FakeDriver(object):
+
+    def __init__(self):
+        self.opened = []
+        self.fail = False
+
+    def connect(self):
+        if self.fail:
+            raise FakeError('refused')
+        self.opened.append(FakeConnection(len(self.opened)))
+        return self.opened[-1]
+
+    def ping(self, connection):
+        return connection.alive
+
+    def close(self, connection):
+        connection.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    def get_pool(self, **kwargs):
+        self.driver = FakeDriver()
+        return pool.ConnectionPool('fake', self.driver.ping, self.driver.close, FakeError, **kwargs)
+
+    def test_idle_connections_are_reused_last_in_first_out(self):
+        connection_pool = self.get_pool(max_size=2)
+        first = connection_pool.checkout(self.driver.connect)
+        second = connection_pool.checkout(self.driver.connect)
+        connection_pool.checkin(first)
+        connection_pool.checkin(second)
+        self.assertIs(connection_pool.checkout(self.driver.connect), second)
+        stats = connection_pool.stats()
+        self.assertEqual((stats['connects'], stats['checkouts'], stats['idle'], stats['in_use']), (2, 3, 1, 1))
+
+    def test_checkout_times_out_when_full(self):
+        connection_pool = self.get_pool(max_size=2, timeout=0.05)
+        connection_pool.checkout(self.driver.connect)
+        connection_pool.checkout(self.driver.connect)
+        with self.assertRaises(FakeError):
+            connection_pool.checkout(self.driver.connect)
+        stats = connection_pool.stats()
+        self.assertEqual((stats['timeouts'], stats['in_use'], stats['waiting']), (1, 2, 0))
+        self.assertEqual(len(self.driver.opened), 2)
+
+    def test_waiting_thread_gets_the_returned_connection(self):
+        connection_pool = self.get_pool(max_size=1, timeout=5)
+        connection = connection_pool.checkout(self.driver.connect)
+        received = []
+        thread = threading.Thread(target=lambda: received.append(connection_pool.checkout(self.driver.connect)))
+        thread.start()
+        while not connection_pool.stats()['waiting']:
+            time.sleep(0.001)
+        connection_pool.checkin(connection)
+        thread.join(5)
+        self.assertEqual(received, [connection])
+        self.assertEqual(connection_pool.stats()['connects'], 1)
+
+    def test_dead_idle_connections_are_replaced(self):
+        connection_pool = self.get_pool(max_size=1)
+        connection = connection_pool.checkout(self.driver.connect)
+        connection_pool.checkin(connection)
+        connection.alive = False
+        replacement = connection_pool.checkout(self.driver.connect)
+        self.assertIsNot(replacement, connection)
+        self.assertTrue(connection.closed)
+        stats = connection_pool.stats()
+        self.assertEqual((stats['ping_failures'], stats['in_use'], stats['idle']), (1, 1, 0))
+
+    def test_old_connections_are_replaced(self):
+        connection_pool = self.get_pool(max_size=1, max_age=10)
+        connection = connection_pool.checkout(self.driver.connect)
+        connection_pool.checkin(connection)
+        connection_pool.opened[id(connection)] -= 60
+        self.assertIsNot(connection_pool.checkout(self.driver.connect), connection)
+        self.assertTrue(connection.closed)
+
+    def test_broken_connections_are_not_reused(self):
+        connection_pool = self.get_pool(max_size=1)
+        connection = connection_pool.checkout(self.driver.connect)
+        connection_pool.checkin(connection, reusable=False)
+        self.assertTrue(connection.closed)
+        self.assertEqual(connection_pool.stats()['in_use'], 0)
+        self.assertIsNot(connection_pool.checkout(self.driver.connect), connection)
+
+    def test_failed_connect_frees_its_slot(self):
+        connection_pool = self.get_pool(max_size=1, timeout=0.05)
+        self.driver.fail = True
+        with self.assertRaises(FakeError):
+            connection_pool.checkout(self.driver.connect)
+        self.assertEqual(connection_pool.stats()['in_use'], 0)
+        self.driver.fail = False
+        self.assertIsNotNone(connection_pool.checkout(self.driver.connect))
+
+    def test_close_idle(self):
+        connection_pool = self.get_pool(max_size=2)
+        connections = [connection_pool.checkout(self.driver.connect) for number in range(2)]
+        connection_pool.checkin(connections[0])
+        self.assertEqual(connection_pool.close_idle(), 1)
+        self.assertEqual([connection.closed for connection in connections], [True, False])
+        self.assertEqual((connection_pool.stats()['idle'], connection_pool.stats()['in_use']), (0, 1))
+
+    def test_forked_process_starts_empty(self):
+        connection_pool = self.get_pool(max_size=1, timeout=0.05)
+        connection = connection_pool.checkout(self.driver.connect)
+        connection_pool.pid = -1
+        self.assertIsNot(connection_pool.checkout(self.driver.connect), connection)
+        # The parent's connection is left open, and its return is refused
+        self.assertFalse(connection.closed)
+        self.assertEqual(connection_pool.stats()['checkouts'], 1)
+
+
+class Stop(BaseException):
+    pass
+
+
+class BreakingBroker(events.PostgresBroker):
+    """
+    Broker whose listener never gets going: SQLite has no LISTEN.
+    """
+    poll_interval = 0
+    attempts = 5
+
+    def listen(self):
+        if not self.attempts:
+            raise Stop
+        self.attempts -= 1
+        return super(BreakingBroker, self).listen()
+
+
+@override_settings(DATABASE_POOL={'ENABLED': True, 'MAX_SIZE': 2, 'TIMEOUT': 0.05, 'MAX_AGE': 600, 'PRE_PING': True})
+class FileDatabaseTestCase(TestCase):
+    """
+    Pooled SQLite wrapper of a file database; the test database lives in
+    memory, which is never pooled.
+    """
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        self.wrapper = DatabaseWrapper(dict(connections['default'].settings_dict, NAME=self.path), alias='pool_test')
+
+    def tearDown(self):
+        if 'pool_test' in pool.pools:
+            pool.pools.pop('pool_test').close_idle()
+        os.remove(self.path)
+
+
+class PooledBackendTests(FileDatabaseTestCase):
+
+    def test_ping_and_reset(self):
+        raw = self.wrapper.get_unpooled_connection(self.wrapper.get_connection_params())
+        raw.execute('CREATE TABLE t (id integer)')
+        raw.execute('INSERT INTO t VALUES (1)')
+        self.assertTrue(self.wrapper.reset_connection(raw))
+        # The open transaction was rolled back
+        self.assertEqual(raw.execute('SELECT COUNT(*) FROM t').fetchone(), (0,))
+        self.assertTrue(self.wrapper.ping_connection(raw))
+        raw.close()
+        self.assertFalse(self.wrapper.ping_connection(raw))
+        self.assertFalse(self.wrapper.reset_connection(raw))
+
+    def test_queries_return_connections_to_the_pool(self):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        self.wrapper.close()
+        stats = pool.get_pool(self.wrapper).stats()
+        self.assertEqual((stats['idle'], stats['in_use'], stats['connects']), (1, 0, 1))
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        self.wrapper.close()
+        self.assertEqual(pool.get_pool(self.wrapper).stats()['connects'], 1)
+
+
+class ListenerTests(FileDatabaseTestCase):
+
+    def setUp(self):
+        super(ListenerTests, self).setUp()
+        self.connection = events.connection
+        events.connection = self.wrapper
+
+    def tearDown(self):
+        events.connection = self.connection
+        super(ListenerTests, self).tearDown()
+
+    def test_broken_listeners_do_not_hold_pooled_connections(self):
+        # Regular connections of the wrapper come from the pool
+        connection_pool = pool.get_pool(self.wrapper)
+        connection_pool.checkin(self.wrapper.get_new_connection(self.wrapper.get_connection_params()))
+        self.assertEqual((connection_pool.stats()['idle'], connection_pool.stats()['in_use']), (1, 0))
+
+        with self.assertRaises(Stop):
+            BreakingBroker(events.hub).run()
+        stats = connection_pool.stats()
+        self.assertEqual((stats['in_use'], stats['connects']), (0, 1))
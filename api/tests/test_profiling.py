@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from django.test import override_settings
+
+from api.profiling import Sampler, get_filters
+from api.tests.base import APITestCase
+
+
+def busy_wait(seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        pass
+
+
+class SamplerTests(APITestCase):
+
+    def test_filters(self):
+        self.assertEqual(get_filters(' api.views, drf,orm '), ('api.views', 'rest_framework', 'django.db'))
+        self.assertEqual(get_filters(None), ())
+
+    def test_collapsed_stacks(self):
+        sampler = Sampler(threading.current_thread().ident, 0.001, filters=(__name__,))
+        sampler.start()
+        busy_wait(0.05)
+        sampler.stop()
+        self.assertGreater(sampler.samples, 0)
+        lines = sampler.collapsed().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            stack, count = line.rsplit(' ', 1)
+            self.assertTrue(int(count) > 0)
+            self.assertTrue(all(frame.startswith(__name__ + ':') for frame in stack.split(';')), stack)
+        self.assertIn('{}:busy_wait'.format(__name__), sampler.collapsed())
+
+
+class ProfilerMiddlewareTests(APITestCase):
+
+    def setUp(self):
+        super(ProfilerMiddlewareTests, self).setUp()
+        self.project = self.create_project()
+        self.path = '/api/projects/{}/'.format(self.project.pk)
+
+    def make_staff(self):
+        self.user.is_staff = True
+        self.user.save()
+
+    def test_needs_staff(self):
+        response = self.client.get(self.path, HTTP_X_PROFILE='sample')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertNotIn('X-Profile-Summary', response)
+
+    def test_sample_inline(self):
+        self.make_staff()
+        response = self.client.get(self.path, {'profile': 'sample', 'profile_filter': 'api'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertEqual(response['X-Profile-Status'], '200')
+        self.assertRegexpMatches(response['X-Profile-Summary'], r'^\d+ samples in [0-9.]+ ms$')
+        for line in response.content.decode('utf-8').splitlines():
+            self.assertTrue(line.startswith('api'), line)
+
+    def test_cprofile_inline(self):
+        self.make_staff()
+        response = self.client.get(self.path, HTTP_X_PROFILE='cprofile', HTTP_X_PROFILE_FILTER='api.views')
+        self.assertRegexpMatches(response['X-Profile-Summary'], r'^\d+ calls in [0-9.]+ ms$')
+        self.assertIn('views.py', response.content.decode('utf-8'))
+
+    def test_unknown_mode_is_ignored(self):
+        self.make_staff()
+        response = self.client.get(self.path, HTTP_X_PROFILE='yes')
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    def test_store(self):
+        self.make_staff()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with override_settings(PROFILER={'ENABLED': True, 'DIRECTORY': directory, 'INTERVAL': 0.001}):
+            for mode, extension in (('sample', '.collapsed'), ('cprofile', '.prof')):
+                response = self.client.get(self.path, HTTP_X_PROFILE=mode)
+                self.assertEqual(response['Content-Type'], 'application/json')
+                self.assertTrue(self.get_json(response)['status']['isSuccess'])
+                name = response['X-Profile-File']
+                self.assertTrue(name.endswith('-api_projects_{}-{}{}'.format(self.project.pk, mode, extension)), name)
+                self.assertTrue(os.path.exists(os.path.join(directory, name)))
+
+    def test_disabled(self):
+        self.make_staff()
+        with override_settings(PROFILER={'ENABLED': False, 'DIRECTORY': None, 'INTERVAL': 0.001}):
+            response = self.client.get(self.path, HTTP_X_PROFILE='sample')
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    def test_streamed_responses_are_profiled(self):
+        self.make_staff()
+        self.create_tasks(self.project, 3)
+        response = self.client.get(self.path, {'stream': 1, 'profile': 'sample', 'profile_output': 'inline'})
+        self.assertEqual(response['X-Profile-Status'], '200')
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.utils import timezone
+from django.utils.six import StringIO
+
+from api import services
+from api.models import ArchivedProject, ArchivedTask, Project, Task, TaskDayBucket, TaskStatusRollup
+from api.tests.base import APITestCase
+
+
+class PurgeTests(APITestCase):
+
+    def setUp(self):
+        super(PurgeTests, self).setUp()
+        self.project = self.create_project()
+        self.tasks = self.create_tasks(self.project, 3)
+        self.other = self.create_project('Other project')
+        self.other_tasks = self.create_tasks(self.other, 2)
+
+    def age(self, days):
+        deleted_at = timezone.now() - timedelta(days=days)
+        Project.objects.filter(delete=True).update(deleted_at=deleted_at)
+        Task.objects.filter(delete=True).update(deleted_at=deleted_at)
+
+    def purge(self, **options):
+        out = StringIO()
+        call_command('purge_deleted', stdout=out, **options)
+        return out.getvalue()
+
+    def test_cascade_flags_the_tasks_of_deleted_projects(self):
+        self.delete('/api/projects/{}/'.format(self.project.pk))
+        self.assertEqual(Task.objects.filter(delete=True).count(), 0)
+        self.assertEqual(services.cascade_project_deletes(2), 2)
+        self.assertEqual(services.cascade_project_deletes(2), 1)
+        deleted_at = Project.objects.get(pk=self.project.pk).deleted_at
+        self.assertEqual(set(Task.objects.filter(project=self.project).values_list('delete', 'deleted_at')), {(True, deleted_at)})
+        counts = TaskStatusRollup.objects.get_counts(self.project.pk)[self.project.pk]
+        self.assertEqual((counts['total'], counts['deleted']), (0, 3))
+        self.assertFalse(TaskDayBucket.objects.filter(project=self.project, count__gt=0).exists())
+
+    def test_archive_after_the_retention(self):
+        self.delete('/api/projects/{}/'.format(self.project.pk))
+        self.delete('/api/tasks/{}/'.format(self.other_tasks[0].pk))
+        self.assertIn('archived 0 tasks and 0 projects', self.purge(retention_days=30))
+        self.assertEqual(Task.objects.filter(delete=True).count(), 4)
+
+        self.age(31)
+        self.assertIn('archived 4 tasks and 1 projects', self.purge(retention_days=30))
+        self.assertFalse(Project.objects.filter(pk=self.project.pk).exists())
+        self.assertEqual(Task.objects.count(), 1)
+        self.assertEqual(
+            sorted(ArchivedTask.objects.values_list('pk', flat=True)),
+            sorted([task.pk for task in self.tasks] + [self.other_tasks[0].pk])
+        )
+        archived = ArchivedProject.objects.get(pk=self.project.pk)
+        self.assertEqual((archived.user_id, archived.name, archived.task_seq), (self.user.pk, 'My project', 3))
+        self.assertFalse(TaskStatusRollup.objects.filter(project_id=self.project.pk).exists())
+        counts = TaskStatusRollup.objects.get_counts(self.other.pk)[self.other.pk]
+        self.assertEqual((counts['total'], counts['deleted']), (1, 0))
+
+    def test_batches(self):
+        for task in self.tasks:
+            self.delete('/api/tasks/{}/'.format(task.pk))
+        self.age(1)
+        self.assertIn('archived 2 tasks', self.purge(retention_days=0, batch_size=2, max_batches=1))
+        self.assertEqual(services.archive_deleted(timezone.now(), 2), (1, 0))
+        self.assertEqual(ArchivedTask.objects.count(), 3)
+
+    def test_projects_wait_for_their_tasks(self):
+        self.delete('/api/projects/{}/'.format(self.project.pk))
+        self.age(1)
+        # The tasks are not flagged yet, so the project keeps them
+        self.assertEqual(services.archive_deleted(timezone.now()), (0, 0))
+        services.cascade_project_deletes()
+        self.assertEqual(services.archive_deleted(timezone.now()), (3, 1))
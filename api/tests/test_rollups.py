@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.models import Task, TaskStatusRollup
+from api.tests.base import APITestCase
+
+
+class TaskStatusRollupTests(APITestCase):
+
+    def setUp(self):
+        super(TaskStatusRollupTests, self).setUp()
+        self.project = self.create_project('My project')
+        self.tasks = self.create_tasks(self.project, 3) + self.create_tasks(self.project, 1, status=2)
+
+    def get_counts(self):
+        return dict(TaskStatusRollup.objects.get_counts(self.project.pk)[self.project.pk])
+
+    def test_counts_follow_the_writes(self):
+        self.assertEqual(self.get_counts(), {'pending': 3, 'progress': 0, 'done': 1, 'total': 4, 'deleted': 0})
+        self.put('/api/tasks/{}/'.format(self.tasks[0].pk), {'name': 'Task', 'description': 'd', 'status': 1})
+        self.delete('/api/tasks/{}/'.format(self.tasks[1].pk))
+        self.post('/api/tasks/bulk/', {
+            'create': [{'name': 'New', 'description': 'd', 'project': self.project.pk}],
+            'update': [{'id': self.tasks[2].pk, 'name': 'Task', 'description': 'd', 'status': 2}],
+            'delete': [self.tasks[3].pk],
+        })
+        counts = {'pending': 1, 'progress': 1, 'done': 1, 'total': 3, 'deleted': 2}
+        self.assertEqual(self.get_counts(), counts)
+        Task.objects.filter(pk=self.tasks[1].pk).delete()
+        counts['deleted'] = 1
+        self.assertEqual(self.get_counts(), counts)
+
+        TaskStatusRollup.objects.rebuild(self.project.pk)
+        self.assertEqual(self.get_counts(), counts)
+
+    def test_summary(self):
+        other = self.create_project('Other project')
+        self.create_tasks(other, 2, status=1)
+        data = self.get('/api/projects/summary/')
+        self.assertEqual([project['id'] for project in data['projects']], [other.pk, self.project.pk])
+        self.assertEqual(data['projects'][0]['task_counts']['progress'], 2)
+        self.assertEqual(dict(data['totals']), {'pending': 3, 'progress': 2, 'done': 1, 'total': 6, 'deleted': 0})
+
+    def test_project_payloads_carry_counts(self):
+        self.assertEqual(self.get('/api/projects/')['projects'][0]['task_counts']['total'], 4)
+        self.assertEqual(self.get('/api/projects/{}/'.format(self.project.pk))['project']['task_counts']['done'], 1)
+
+    def test_nested_projects_leave_counts_out(self):
+        data = self.get('/api/tasks/{}/'.format(self.tasks[0].pk))
+        self.assertNotIn('task_counts', data['tasks']['project'])
+        data = self.get('/api/projects/{}/'.format(self.project.pk))
+        self.assertNotIn('task_counts', data['tasks'][0]['project'])
+
+    def test_task_lists_do_not_query_per_project(self):
+        for number in range(5):
+            self.create_tasks(self.create_project('Project {}'.format(number)), 2)
+        self.get('/api/sync/')
+        with CaptureQueriesContext(connection) as context:
+            data = self.get('/api/sync/')
+        self.assertEqual(len(data['tasks']), 14)
+        self.assertFalse([query for query in context.captured_queries if 'api_taskstatusrollup' in query['sql']][1:])
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from rest_framework.test import APIClient
+
+from api.tests.base import APITestCase
+from ticapi.schema_generator import schema_cache
+
+
+class SchemaViewTests(APITestCase):
+
+    def setUp(self):
+        super(SchemaViewTests, self).setUp()
+        schema_cache.clear()
+        self.addCleanup(schema_cache.clear)
+
+    def get_docs(self, client=None, **extra):
+        response = (client or self.client).get('/api-docs/', **extra)
+        self.assertIn(response.status_code, (200, 304))
+        self.assertTrue({'Accept', 'Authorization'} <= set(name.strip() for name in response['Vary'].split(',')))
+        return response
+
+    def test_schema_is_cached(self):
+        first = self.get_docs(HTTP_ACCEPT='application/openapi+json')
+        self.assertEqual(len(schema_cache.entries), 1)
+        second = self.get_docs(HTTP_ACCEPT='application/openapi+json')
+        self.assertEqual(len(schema_cache.entries), 1)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_not_modified(self):
+        etag = self.get_docs(HTTP_ACCEPT='application/openapi+json')['ETag']
+        response = self.get_docs(HTTP_ACCEPT='application/openapi+json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+    def test_variants_have_their_own_etags(self):
+        etags = set([
+            self.get_docs(HTTP_ACCEPT='application/openapi+json')['ETag'],
+            self.get_docs(HTTP_ACCEPT='application/coreapi+json')['ETag'],
+            self.get_docs(APIClient(), HTTP_ACCEPT='application/openapi+json')['ETag'],
+        ])
+        self.assertEqual(len(etags), 3)
+        self.assertEqual(len(schema_cache.entries), 3)
+
+    def test_anonymous_users_see_fewer_views(self):
+        anonymous = self.get_docs(APIClient(), HTTP_ACCEPT='application/openapi+json')
+        user = self.get_docs(HTTP_ACCEPT='application/openapi+json')
+        self.assertEqual(anonymous.status_code, 200)
+        self.assertIn(b'/api/projects/', user.content)
+        self.assertNotIn(b'/api/projects/', anonymous.content)
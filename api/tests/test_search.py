@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api import search
+from api.models import Project, Task
+from api.tests.base import APITestCase
+
+
+class SearchTests(APITestCase):
+
+    def setUp(self):
+        super(SearchTests, self).setUp()
+        self.project = self.create_project('Web site', description='public pages')
+        self.login = self.create_tasks(self.project, 1, name='Fix login bug', description='users cannot sign in')[0]
+        self.docs = self.create_tasks(self.project, 1, name='Write docs', description='explain the login page')[0]
+        self.deploy = self.create_tasks(self.project, 1, name='Deploy', description='release it')[0]
+        self.path = '/api/projects/{}/'.format(self.project.pk)
+
+    def find(self, query):
+        return [task['id'] for task in self.get(self.path, {'q': query})['tasks']]
+
+    def test_backend(self):
+        self.assertIsInstance(search.get_backend(), search.SQLiteSearchBackend if connection.vendor == 'sqlite' else search.BaseSearchBackend)
+
+    def test_terms_match_word_prefixes(self):
+        self.assertEqual(sorted(self.find('login')), sorted([self.login.pk, self.docs.pk]))
+        self.assertEqual(self.find('LOG'), self.find('login'))
+        self.assertEqual(self.find('log sign'), [self.login.pk])
+        # Substrings inside a word no longer match, unlike the icontains filters
+        self.assertEqual(self.find('ogin'), [])
+        self.assertEqual(self.find('WS-3'), [self.deploy.pk])
+        self.assertEqual(self.find('!!'), [])
+
+    def test_fallback_matches_substrings(self):
+        tasks = search.FALLBACK_BACKEND.filter(Task.objects.all(), search.TASK, 'ogin')
+        self.assertEqual(sorted(tasks.values_list('pk', flat=True)), sorted([self.login.pk, self.docs.pk]))
+
+    def test_index_follows_writes(self):
+        self.put('/api/tasks/{}/'.format(self.deploy.pk), {'name': 'Ship', 'description': 'release it', 'status': 0})
+        self.assertEqual(self.find('deploy'), [])
+        self.assertEqual(self.find('ship'), [self.deploy.pk])
+        Task.objects.filter(pk=self.deploy.pk).delete()
+        self.assertEqual(search.get_backend().search(search.TASK, 'ship', project_id=self.project.pk), [])
+
+    def test_search_ranks_title_matches_first(self):
+        data = self.get(self.path, {'search': 'login'})
+        self.assertEqual([task['id'] for task in data['tasks']], [self.login.pk, self.docs.pk])
+        self.assertIsNone(data['next'])
+        self.assertEqual(self.get(self.path, {'search': 'login', 'page_size': 1})['tasks'][0]['id'], self.login.pk)
+
+    def test_search_is_scoped_to_the_user(self):
+        other = self.create_user('jane', 'jane@example.com')
+        self.create_project('Web shop', user=other)
+        data = self.get('/api/projects/', {'search': 'web'})
+        self.assertEqual([project['id'] for project in data['projects']], [self.project.pk])
+        self.assertEqual([project['id'] for project in self.get('/api/projects/', {'q': 'web'})['projects']], [self.project.pk])
+
+    def count_index_statements(self, path, data):
+        with CaptureQueriesContext(connection) as context:
+            self.post(path, data)
+        return len([query for query in context.captured_queries if search.TABLE in query['sql']])
+
+    def test_bulk_writes_index_in_batches(self):
+        create = [{'name': 'Bulk {}'.format(number), 'description': 'd', 'project': self.project.pk} for number in range(3)]
+        few = self.count_index_statements('/api/tasks/bulk/', {'create': create})
+        create = [{'name': 'Bulk {}'.format(number), 'description': 'd', 'project': self.project.pk} for number in range(30)]
+        self.assertEqual(self.count_index_statements('/api/tasks/bulk/', {'create': create}), few)
+        self.assertEqual(len(self.find('bulk')), 33)
+
+        tasks = Task.objects.filter(name__startswith='Bulk')
+        update = [{'id': task.pk, 'name': 'Batch', 'description': 'd', 'status': 0} for task in tasks]
+        self.assertEqual(self.count_index_statements('/api/tasks/bulk/', {'update': update}), few)
+        self.assertEqual((len(self.find('bulk')), len(self.find('batch'))), (0, 33))
+
+    def test_index_many_keeps_the_last_copy(self):
+        backend = search.get_backend()
+        self.deploy.name = 'Old'
+        first = Task(pk=self.deploy.pk, seq=self.deploy.seq, name='Ship', description='d', user=self.user, project=self.project)
+        backend.index_many(search.TASK, [self.deploy, first])
+        backend.index_many(search.TASK, [])
+        self.assertEqual(self.find('ship'), [self.deploy.pk])
+        self.assertEqual(self.find('old'), [])
+
+    def test_rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {}'.format(search.TABLE))
+        self.assertEqual(self.find('login'), [])
+        search.get_backend().rebuild(Project.objects.all(), Task.objects.all())
+        self.assertEqual(sorted(self.find('login')), sorted([self.login.pk, self.docs.pk]))
+
+    def test_ranked_pages_are_not_cut_short_by_filters(self):
+        # Better matches that the filters leave out must not take the slots
+        hidden = self.create_tasks(self.project, 3, name='Login login login', status=2)
+        Task.objects.filter(pk=hidden[0].pk).update(delete=True)
+        data = self.get(self.path, {'search': 'login', 'page_size': 2, 'status': 0})
+        self.assertEqual([task['id'] for task in data['tasks']], [self.login.pk, self.docs.pk])
+        data = self.get(self.path, {'search': 'login', 'page_size': 2, 'status': 2})
+        self.assertEqual(sorted(task['id'] for task in data['tasks']), sorted(task.pk for task in hidden[1:]))
+
+    def test_rank_within_queryset(self):
+        for backend in (search.get_backend(), search.FALLBACK_BACKEND):
+            tasks = Task.objects.filter(pk__in=[self.docs.pk, self.deploy.pk]).values('id')
+            self.assertEqual([row['id'] for row in backend.rank(tasks, search.TASK, 'login', 1)], [self.docs.pk])
+            self.assertEqual(backend.rank(Task.objects.none(), search.TASK, 'login', 1), [])
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from api.models import Project
+from api.tests.base import APITestCase
+
+
+class TaskSequenceTests(APITestCase):
+
+    def test_allocate_reserves_blocks(self):
+        project = self.create_project()
+        self.assertEqual(Project.objects.allocate_task_seq(project.pk), 1)
+        self.assertEqual(Project.objects.allocate_task_seq(project.pk, 10), 2)
+        self.assertEqual(Project.objects.allocate_task_seq(project.pk), 12)
+        self.assertEqual(Project.objects.get(pk=project.pk).task_seq, 12)
+
+    def test_projects_count_separately(self):
+        first = self.create_project('First project')
+        second = self.create_project('Second project')
+        Project.objects.allocate_task_seq(first.pk, 5)
+        self.assertEqual(Project.objects.allocate_task_seq(second.pk), 1)
+
+    def test_created_tasks_are_numbered(self):
+        project = self.create_project('My project')
+        seqs = [self.post('/api/tasks/', {'name': 'Task', 'description': 'd', 'project': project.pk})['task']['seq'] for number in range(3)]
+        self.assertEqual(seqs, ['MP-1', 'MP-2', 'MP-3'])
+
+    def test_numbers_of_deleted_tasks_are_not_reused(self):
+        project = self.create_project('My project')
+        task = self.post('/api/tasks/', {'name': 'Task', 'description': 'd', 'project': project.pk})['task']
+        self.delete('/api/tasks/{}/'.format(task['id']))
+        self.assertEqual(self.post('/api/tasks/', {'name': 'Task', 'description': 'd', 'project': project.pk})['task']['seq'], 'MP-2')
+
+    def test_bulk_create_numbers_per_project(self):
+        first = self.create_project('First project')
+        second = self.create_project('Second project')
+        data = self.post('/api/tasks/bulk/', {'create': [
+            {'name': 'Task', 'description': 'd', 'project': project.pk} for project in (first, second, first, first)
+        ]})
+        self.assertEqual([result['task']['seq'] for result in data['create']], ['FP-1', 'SP-1', 'FP-2', 'FP-3'])
+        self.assertEqual(Project.objects.get(pk=first.pk).task_seq, 3)
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.models import Task
+from api.serializers import ProjectSerializer, TaskSerializer, UserSerializer
+from api.tests.base import APITestCase
+
+
+class NestedSerializerTests(APITestCase):
+
+    def count_queries(self, project):
+        with CaptureQueriesContext(connection) as context:
+            tasks = TaskSerializer.setup_eager_loading(Task.objects.filter(project=project))
+            data = TaskSerializer(tasks, many=True, context={'nested_cache': {}}).data
+        return len(context.captured_queries), data
+
+    def test_related_paths(self):
+        self.assertEqual(sorted(TaskSerializer.get_related_paths()), ['project', 'project__user', 'user'])
+
+    def test_queries_do_not_grow_with_tasks(self):
+        project = self.create_project()
+        self.create_tasks(project, 2)
+        few, data = self.count_queries(project)
+        self.create_tasks(project, 20)
+        many, data = self.count_queries(project)
+        self.assertEqual(few, many)
+        self.assertEqual(len(data), 22)
+        self.assertEqual(data[0]['project']['user']['email'], 'john@example.com')
+
+    def test_nested_payloads_are_memoized(self):
+        project = self.create_project()
+        tasks = TaskSerializer.setup_eager_loading(Task.objects.filter(pk__in=[task.pk for task in self.create_tasks(project, 3)]))
+        cache = {}
+        data = TaskSerializer(tasks, many=True, context={'nested_cache': cache}).data
+        self.assertEqual(sorted(key[0].__name__ for key in cache), ['TaskProjectSerializer', 'UserSerializer'])
+        self.assertEqual(cache[(UserSerializer, self.user.pk)]['username'], 'john')
+        self.assertEqual(data[0]['project'], data[2]['project'])
+
+    def test_without_cache(self):
+        project = self.create_project()
+        task = self.create_tasks(project, 1)[0]
+        data = TaskSerializer(task).data
+        self.assertEqual(data['project']['id'], project.pk)
+        self.assertEqual(data['user'], ProjectSerializer(project).data['user'])
+
+    def test_project_detail_queries_do_not_grow_with_tasks(self):
+        project = self.create_project()
+        self.create_tasks(project, 2)
+        path = '/api/projects/{}/'.format(project.pk)
+        # Caches the token
+        self.get(path)
+        with CaptureQueriesContext(connection) as few:
+            self.assertEqual(len(self.get(path)['tasks']), 2)
+        self.create_tasks(project, 20)
+        with CaptureQueriesContext(connection) as many:
+            self.assertEqual(len(self.get(path)['tasks']), 22)
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+
+    def test_internal_columns_are_left_out(self):
+        project = self.create_project()
+        task = self.create_tasks(project, 1)[0]
+        internal = ('change_seq', 'task_seq', 'version')
+        payloads = [
+            ProjectSerializer(project).data,
+            TaskSerializer(task).data['project'],
+            self.get('/api/projects/')['projects'][0],
+            self.get('/api/tasks/{}/'.format(task.pk))['tasks']['project'],
+            self.get('/api/projects/{}/'.format(project.pk))['tasks'][0]['project'],
+        ]
+        for payload in payloads:
+            self.assertFalse(set(internal) & set(payload), payload)
+
+    def test_deletion_times_are_left_out(self):
+        project = self.create_project()
+        task = self.create_tasks(project, 1)[0]
+        payloads = [
+            ProjectSerializer(project).data,
+            TaskSerializer(task).data,
+            self.get('/api/projects/{}/'.format(project.pk))['tasks'][0],
+            self.get('/api/sync/')['tasks'][0],
+        ]
+        for payload in payloads:
+            self.assertNotIn('deleted_at', payload)
+            self.assertNotIn('deleted_at', payload.get('project', {}))
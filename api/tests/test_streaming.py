@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+from collections import OrderedDict
+
+from api.models import Task
+from api.streaming import iter_json, serialize_in_chunks
+from api.tests.base import APITestCase
+
+
+class StreamingTests(APITestCase):
+
+    def test_iter_json(self):
+        content = OrderedDict([('status', 'ok'), ('tasks', None), ('next', None)])
+        body = b''.join(iter_json(content, 'tasks', [[], [{'name': 'é'}], [{'name': 2}, {'name': 3}]]))
+        self.assertEqual(body, '{"status":"ok","next":null,"tasks":[{"name":"é"},{"name":2},{"name":3}]}'.encode('utf-8'))
+        self.assertEqual(json.loads(b''.join(iter_json({'a': 1}, 'tasks', [])).decode('utf-8')), {'a': 1, 'tasks': []})
+
+    def test_serialize_in_chunks(self):
+        project = self.create_project()
+        self.create_tasks(project, 5)
+        chunks = list(serialize_in_chunks(Task.objects.order_by('pk'), lambda rows: [row.pk for row in rows], chunk_size=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+
+    def test_stream_matches_the_pages(self):
+        project = self.create_project()
+        self.create_tasks(project, 7)
+        path = '/api/projects/{}/'.format(project.pk)
+        response = self.client.get(path, {'stream': 1})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertTrue(response['ETag'])
+        streamed = json.loads(b''.join(response.streaming_content).decode('utf-8'))
+        paged = self.get(path, {'page_size': 3})
+        tasks = paged['tasks']
+        while paged['next']:
+            paged = self.get_json(self.client.get(paged['next']))
+            tasks += paged['tasks']
+        self.assertEqual(streamed['status'], paged['status'])
+        self.assertEqual(streamed['project']['id'], project.pk)
+        self.assertIsNone(streamed['next'])
+        self.assertEqual(len(tasks), 7)
+        self.assertEqual(streamed['tasks'], tasks)
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from datetime import timedelta
+
+from django.utils import timezone
+
+from api.models import ChangeCounter, Project, Task
+from api.pagination import encode_cursor
+from api.tests.base import APITestCase
+
+
+class SyncTests(APITestCase):
+
+    def setUp(self):
+        super(SyncTests, self).setUp()
+        self.project = self.create_project('My project')
+        self.tasks = self.create_tasks(self.project, 3)
+
+    def sync(self, since=None, **params):
+        if since is not None:
+            params['since'] = since
+        data = self.get('/api/sync/', params)
+        self.assertTrue(data['status']['isSuccess'])
+        return data
+
+    def test_snapshot_then_nothing_new(self):
+        data = self.sync()
+        self.assertEqual([project['id'] for project in data['projects']], [self.project.pk])
+        self.assertEqual(sorted(task['id'] for task in data['tasks']), sorted(task.pk for task in self.tasks))
+        self.assertNotIn('change_seq', data['tasks'][0])
+        data = self.sync(data['since'])
+        self.assertEqual((data['projects'], data['tasks'], data['reset']), ([], [], False))
+
+    def test_status_change_refreshes_project_counts(self):
+        since = self.sync()['since']
+        self.put('/api/tasks/{}/'.format(self.tasks[0].pk), {'name': 'Done', 'description': 'd', 'status': 2})
+        data = self.sync(since)
+        self.assertEqual([task['id'] for task in data['tasks']], [self.tasks[0].pk])
+        self.assertEqual([project['id'] for project in data['projects']], [self.project.pk])
+        self.assertEqual((data['projects'][0]['task_counts']['pending'], data['projects'][0]['task_counts']['done']), (2, 1))
+
+    def test_rows_stamped_by_a_late_clock_are_not_skipped(self):
+        since = self.sync()['since']
+        # A write whose `modified` is far behind the clock of the cursor, as
+        # for a long transaction or a skewed application server
+        self.put('/api/tasks/{}/'.format(self.tasks[1].pk), {'name': 'Late', 'description': 'd', 'status': 0})
+        Task.objects.filter(pk=self.tasks[1].pk).update(modified=timezone.now() - timedelta(hours=1))
+        self.assertEqual([task['id'] for task in self.sync(since)['tasks']], [self.tasks[1].pk])
+
+    def test_deletes_are_tombstones(self):
+        since = self.sync()['since']
+        self.delete('/api/tasks/{}/'.format(self.tasks[0].pk))
+        data = self.sync(since)
+        self.assertEqual(data['deleted']['tasks'], [self.tasks[0].pk])
+        self.assertNotIn(self.tasks[0].pk, [task['id'] for task in data['tasks']])
+        self.delete('/api/projects/{}/'.format(self.project.pk))
+        data = self.sync(data['since'])
+        self.assertEqual((data['projects'], data['deleted']['projects']), ([], [self.project.pk]))
+
+    def test_pages_return_every_row_once(self):
+        self.create_tasks(self.project, 4)
+        since, seen, more = None, [], True
+        while more:
+            data = self.sync(since, limit=2)
+            self.assertLessEqual(len(data['tasks']), 2)
+            seen += [task['id'] for task in data['tasks']]
+            since, more = data['since'], data['more']
+        self.assertEqual(sorted(seen), sorted(Task.objects.values_list('pk', flat=True)))
+
+    def test_former_cursors_reset(self):
+        now = timezone.now()
+        data = self.sync(encode_cursor([now, now, self.project.pk, now, self.tasks[0].pk]))
+        self.assertTrue(data['reset'])
+        self.assertEqual(len(data['tasks']), 3)
+
+    def test_invalid_cursor(self):
+        data = self.get('/api/sync/', {'since': 'garbage'})
+        self.assertEqual(data['status']['message'], "Invalid cursor")
+
+
+class ChangeCounterTests(APITestCase):
+
+    def test_numbers_increase_per_user(self):
+        other = self.create_user('jane', 'jane@example.com')
+        first = ChangeCounter.objects.allocate(self.user.pk)
+        self.assertEqual(ChangeCounter.objects.allocate(self.user.pk), first + 1)
+        self.assertEqual(ChangeCounter.objects.allocate(other.pk), 1)
+
+    def test_writes_are_stamped_in_order(self):
+        project = self.create_project('My project')
+        task = self.create_tasks(project, 1)[0]
+        project = Project.objects.get(pk=project.pk)
+        # Creating the task bumped its project after stamping the task
+        self.assertGreater(project.change_seq, Task.objects.get(pk=task.pk).change_seq)
+        self.put('/api/tasks/{}/'.format(task.pk), {'name': 'Renamed', 'description': 'd', 'status': 1})
+        self.assertGreater(Task.objects.get(pk=task.pk).change_seq, project.change_seq)
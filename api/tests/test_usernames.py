@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.contrib.auth.models import User
+
+from api.models import UsernameCounter
+from api.tests.base import APITestCase
+from api.utils import create_username
+
+
+class UsernameTests(APITestCase):
+
+    def test_suffixes_count_up(self):
+        self.assertEqual([create_username('Jane Doe') for number in range(3)], ['JaneDoe', 'JaneDoe1', 'JaneDoe2'])
+        self.assertEqual(UsernameCounter.objects.get(base='JaneDoe').last, 2)
+
+    def test_counter_is_seeded_from_existing_usernames(self):
+        for username in ('JaneDoe', 'JaneDoe7', 'JaneDoe07', 'JaneDoeX'):
+            User.objects.create(username=username)
+        self.assertEqual(create_username('Jane Doe'), 'JaneDoe8')
+        self.assertEqual(create_username('Mary'), 'Mary')
+
+    def test_taken_candidates_are_skipped(self):
+        # JohnDoe12 is also JohnDoe1 + 2, which the counter of JohnDoe does not see
+        UsernameCounter.objects.create(base='JohnDoe', last=11)
+        User.objects.create(username='JohnDoe12')
+        self.assertEqual(create_username('John Doe'), 'JohnDoe13')
+
+    def test_names_are_cleaned(self):
+        self.assertEqual(create_username("Émile O'Brien-Smith"), 'ÉmileOBrienSmith')
+        self.assertEqual(create_username('!!!'), 'user')
+        self.assertEqual(len(create_username('x' * 100)), 29)
+
+    def test_signups_get_distinct_usernames(self):
+        usernames = [
+            self.post('/api/signup/', {'full_name': 'jane doe', 'email': 'jane{}@example.com'.format(number), 'password': 'p'})['user']['username']
+            for number in range(3)
+        ]
+        self.assertEqual(usernames, ['JaneDoe', 'JaneDoe1', 'JaneDoe2'])
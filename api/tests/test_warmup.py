@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import imp
+import os
+
+from django.test import TransactionTestCase
+from django.urls import get_resolver
+
+from api import fast_serializers, serializers
+from ticapi import warmup
+from ticapi.db import pool
+
+
+class FakeLog(object):
+
+    def __init__(self):
+        self.messages = []
+
+    def info(self, message, *args):
+        self.messages.append(message % args)
+
+
+class FakeConfig(object):
+
+    def __init__(self, preload_app):
+        self.preload_app = preload_app
+        self.worker_class_str = 'gthread'
+        self.threads = 16
+
+
+class FakeServer(object):
+
+    def __init__(self, preload_app):
+        self.cfg = FakeConfig(preload_app)
+        self.log = FakeLog()
+        self.num_workers = 2
+        self.pid = 42
+
+
+class WarmUpTests(TransactionTestCase):
+
+    def test_every_step_is_timed(self):
+        timings = warmup.warm_up()
+        self.assertEqual(list(timings), [name for name, step in warmup.STEPS])
+        self.assertTrue(all(value >= 0 for value in timings.values()))
+        self.assertRegexpMatches(warmup.format_timings(timings), r'^resolver=\d+ms serializers=\d+ms ')
+
+    def test_serializers_are_compiled(self):
+        fast_serializers._compiled.clear()
+        warmup.warm_serializers()
+        self.assertIn(serializers.ProjectSerializer, fast_serializers._compiled)
+        self.assertIn(serializers.TaskSerializer, fast_serializers._compiled)
+
+    def test_resolver_is_populated(self):
+        warmup.warm_resolver()
+        self.assertTrue(get_resolver()._populated)
+
+    def test_database_connections_are_handed_back(self):
+        warmup.warm_database()
+        for alias, backend_pool in pool.pools.items():
+            self.assertEqual(backend_pool.stats()['in_use'], 0, alias)
+            self.assertEqual(backend_pool.stats()['idle'], 0, alias)
+
+    def test_memory_usage(self):
+        usage = warmup.memory_usage()
+        self.assertTrue(usage)
+        self.assertTrue(all(value >= 0 for value in usage.values()))
+        self.assertGreater(max(usage.values()), 0)
+        self.assertRegexpMatches(warmup.format_memory(usage), r'^\w+=\d+\.\dMB')
+
+
+class GunicornConfigTests(TransactionTestCase):
+    path = os.path.join(os.path.dirname(warmup.__file__), 'gunicorn_conf.py')
+    names = ('GUNICORN_WORKER_CLASS', 'GUNICORN_MAX_WORKERS', 'GUNICORN_THREADS', 'GUNICORN_PRELOAD', 'WEB_CONCURRENCY')
+
+    def load(self, **environ):
+        saved = dict((name, os.environ.pop(name)) for name in self.names if name in os.environ)
+        os.environ.update(environ)
+        try:
+            return imp.load_source('gunicorn_conf_under_test', self.path)
+        finally:
+            for name in self.names:
+                os.environ.pop(name, None)
+            os.environ.update(saved)
+
+    def test_defaults(self):
+        config = self.load()
+        self.assertEqual((config.worker_class, config.threads, config.preload_app), ('gthread', 16, True))
+        self.assertEqual(config.workers, min(config.cpu_count + 1, 8))
+
+    def test_sync_workers_scale_with_cores(self):
+        config = self.load(GUNICORN_WORKER_CLASS='sync', GUNICORN_MAX_WORKERS='64')
+        self.assertEqual(config.workers, config.cpu_count * 2 + 1)
+        self.assertEqual(self.load(WEB_CONCURRENCY='3').workers, 3)
+        self.assertFalse(self.load(GUNICORN_PRELOAD='0').preload_app)
+
+    def test_master_warms_up_when_preloading(self):
+        config = self.load()
+        server = FakeServer(preload_app=True)
+        config.when_ready(server)
+        self.assertTrue(server.log.messages[0].startswith('Warmed up in the master: resolver='))
+        self.assertIn('gthread workers x 16 threads', server.log.messages[1])
+
+    def test_workers_warm_up_without_preloading(self):
+        config = self.load()
+        server = FakeServer(preload_app=False)
+        config.when_ready(server)
+        self.assertTrue(server.log.messages[0].startswith('Ready in'))
+        config.post_worker_init(server)
+        self.assertTrue(server.log.messages[1].startswith('Worker 42 warmed up: resolver='))
+        self.assertTrue(server.log.messages[2].startswith('Worker 42 booted'))
@@ -9,10 +9,18 @@ urlpatterns = [
     url(r'^auth/$', api_views.AuthenticateUserViewSet.as_view()),
 
     url(r'^projects/$', api_views.ProjectListViewSet.as_view()), # GET to all and POST to create a project
+    url(r'^projects/summary/$', api_views.ProjectSummaryViewSet.as_view()), # GET task counts of all projects
     url(r'^projects/(?P<pk>[0-9]*)/$', api_views.ProjectDetailViewSet.as_view()), # GET to all and POST to create a project
+    url(r'^projects/(?P<pk>[0-9]*)/calendar/$', api_views.ProjectCalendarViewSet.as_view()), # GET task counts per day
 
     url(r'^tasks/$', api_views.TaskCreateViewSet.as_view()),  # GET to all and POST to create a Task
     url(r'^tasks/(?P<pk>[0-9]*)/$', api_views.TaskDetailViewSet.as_view()),
+    url(r'^tasks/bulk/$', api_views.TaskBulkViewSet.as_view()),  # POST to create, update and delete Tasks in one batch
+
+    url(r'^sync/$', api_views.SyncViewSet.as_view()),  # GET projects and tasks changed since a cursor
+    url(r'^events/$', api_views.EventStreamViewSet.as_view()),  # GET a server-sent event stream of project and task changes
+
+    url(r'^metrics/$', api_views.MetricsViewSet.as_view()),  # GET request metrics in the Prometheus text format
 
     # url(r'^home/$', api_views.HomeViewSet.as_view()),
 ]
@@ -3,22 +3,19 @@ from datetime import datetime
 
 from django.utils import timezone
 
+from api.models import UsernameCounter
+
 
 def create_username(name, request=None, profile=False):
     name = ''.join(e for e in name if e.isalnum())
-    name = name[:29]
-    base_name = name
-    ctr = 1
+    name = name[:29] or 'user'
 
+    # A candidate can still be taken when another base ends in digits,
+    # e.g. John12 is both John + 12 and John1 + 2
     while True:
-        if not User.objects.filter(username=name).exists() and not User.objects.filter(username=name).exists():
-            break
-        else:
-            name = base_name + (str(ctr))
-            ctr += 1
-
-    # return the new name
-    return name
+        username = UsernameCounter.objects.allocate(name)
+        if not User.objects.filter(username=username).exists():
+            return username
 
 
 def pretty_date(time=False):
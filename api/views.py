@@ -1,13 +1,15 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
-from datetime import datetime
+from datetime import timedelta
+from functools import partial
 
 from rest_framework import permissions
 from rest_framework.views import APIView
 from rest_framework import parsers
-from rest_framework import renderers
 from rest_framework import status
+from rest_framework import exceptions
+from rest_framework import serializers
 from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
 
@@ -15,21 +17,45 @@ from django.shortcuts import get_object_or_404
 from django.contrib.auth import authenticate, login, logout, get_backends
 from django.contrib.auth.models import User
 from django.conf import settings
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils import six, timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_datetime
 
-from api.models import Project, Task
+from api import conditional, dates, events, metrics, search, services
+from api.authentication import QueryTokenAuthentication
+from api.counters import view_counter
+from api.fast_serializers import get_compiled
+from api.models import Project, Task, TaskDayBucket, TaskStatusRollup, UserEmail
+from api.pagination import KeysetPagination, decode_cursor, encode_cursor
 from api.serializers import (AuthCustomTokenSerializer, UserSerializer, SignupSerializer, ProjectCreateSerializer, ProjectSerializer,
-    TaskCreateSerializer, TaskSerializer, TaskEditSerializer
+    TaskBulkDeleteSerializer, TaskCreateSerializer, TaskSerializer, TaskEditSerializer, TaskFilterSerializer, CalendarSerializer
 )
+from api.streaming import StreamingJSONResponse, serialize_in_chunks
 
 class BaseAPIView(APIView):
     throttle_classes = ()
     permission_classes = ()
     parser_classes = (parsers.FormParser, parsers.MultiPartParser, parsers.JSONParser,)
-    renderer_classes = (renderers.JSONRenderer,)
+    renderer_classes = (metrics.JSONRenderer,)
 
     def get_serializer_context(self):
-        return {'request': self.request}
+        # One nested payload cache per request, shared by every serializer the view builds
+        if not hasattr(self, '_nested_cache'):
+            self._nested_cache = {}
+        return {'request': self.request, 'nested_cache': self._nested_cache}
+
+    def get_query_params(self, serializer_class):
+        """
+        Return the non-empty query parameters validated by `serializer_class`,
+        raising a ValidationError (400) for invalid ones.
+        """
+        data = dict((name, value) for name, value in self.request.GET.items() if value)
+        serializer = serializer_class(data=data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
 
 
 class AuthenticateUserViewSet(BaseAPIView):
@@ -62,20 +88,9 @@ class AuthenticateUserViewSet(BaseAPIView):
         email = serializer.validated_data['email']
         password = serializer.validated_data['password']
 
-        try:
-            user_request = get_object_or_404(User, email__iexact=email)
-        except:
-            content = {
-                'status': {
-                    'isSuccess': False,
-                    'code': "FAILURE",
-                    'message': "Invalid Credentials"
-                }
-            }
-            return Response(content, status.HTTP_200_OK)
-
-        username = user_request.username
-        user = authenticate(username=username, password=password)
+        # Unknown emails go through the backends too, which hash the password
+        # anyway and send `user_login_failed`
+        user = authenticate(request=request, username=UserEmail.objects.get_username(email), password=password)
 
         if user:
             token, created = Token.objects.get_or_create(user=user)
@@ -161,6 +176,27 @@ class ProjectListViewSet(BaseAPIView):
                     'type': 'string',
                     'paramType': 'query'
                 },
+                {
+                    'name': 'search',
+                    'required': False,
+                    'description': 'query returning the best matching projects first, without a next page',
+                    'type': 'string',
+                    'paramType': 'query'
+                },
+                {
+                    'name': 'cursor',
+                    'required': False,
+                    'description': 'cursor of the page to fetch, taken from `next`',
+                    'type': 'string',
+                    'paramType': 'query'
+                },
+                {
+                    'name': 'page_size',
+                    'required': False,
+                    'description': 'number of projects per page',
+                    'type': 'integer',
+                    'paramType': 'query'
+                },
             ]
         },
         'post':{
@@ -186,22 +222,36 @@ class ProjectListViewSet(BaseAPIView):
         Projects Endpoint for user to get all Projects
         """
         query = request.GET.get("q", "")
+        stamp = Project.objects.filter(user=request.user, delete=False).aggregate(
+            count=Count('id'), last=Max('id'), versions=Sum('version'), views=Sum('viewed')
+        )
+        etag = conditional.make_etag(request, 'projects', stamp['count'], stamp['last'], stamp['versions'], stamp['views'])
+        if conditional.is_not_modified(request, etag):
+            return conditional.not_modified(etag)
+
         projects = Project.objects.filter(user=request.user, delete=False).order_by('-viewed', '-created')
         if query:
-            for q in query.split():
-                projects = projects.filter(
-                    Q(name__icontains=q) | Q(description__icontains=q)
-                ).distinct().order_by('-created')
-        serializer = ProjectSerializer(projects, many=True, context=self.get_serializer_context())
+            projects = search.get_backend().filter(projects, search.PROJECT, query)
+        compiled = get_compiled(ProjectSerializer)
+        paginator = KeysetPagination()
+        ranked = request.GET.get("search", "")
+        if ranked:
+            projects = search.get_backend().rank(
+                compiled.values(projects), search.PROJECT, ranked, paginator.get_page_size(request), user_id=request.user.pk
+            )
+        else:
+            projects = paginator.paginate_queryset(compiled.values(projects), request, view=self)
+        projects = ProjectSerializer.prefetch_task_counts(projects)
         content = {
             'status': {
                 'isSuccess': True,
                 'code': "SUCCESS",
                 'message': "Success"
             },
-            'projects': serializer.data
+            'projects': compiled.serialize(projects),
+            'next': None if ranked else paginator.get_next_link()
         }
-        return Response(content, status.HTTP_200_OK)
+        return Response(content, status.HTTP_200_OK, headers={'ETag': etag})
 
     def post(self, request):
         """
@@ -227,6 +277,38 @@ class ProjectListViewSet(BaseAPIView):
         return Response(content, status.HTTP_200_OK)
 
 
+class ProjectSummaryViewSet(BaseAPIView):
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get(self, request):
+        """
+        Projects Endpoint for user to get the task counts of every Project
+        """
+        projects = Project.objects.filter(user=request.user, delete=False)
+        stamp = projects.aggregate(count=Count('id'), last=Max('id'), versions=Sum('version'))
+        etag = conditional.make_etag(request, 'summary', stamp['count'], stamp['last'], stamp['versions'])
+        if conditional.is_not_modified(request, etag):
+            return conditional.not_modified(etag)
+
+        projects = list(projects.order_by('-created').values('id', 'name'))
+        counts = TaskStatusRollup.objects.get_counts(*[project['id'] for project in projects])
+        totals = TaskStatusRollup.objects.get_empty_counts()
+        for project in projects:
+            project['task_counts'] = counts[project['id']]
+            for name, count in project['task_counts'].items():
+                totals[name] += count
+        content = {
+            'status': {
+                'isSuccess': True,
+                'code': "SUCCESS",
+                'message': "Success"
+            },
+            'projects': projects,
+            'totals': totals
+        }
+        return Response(content, status.HTTP_200_OK, headers={'ETag': etag})
+
+
 class ProjectDetailViewSet(BaseAPIView):
     permission_classes = (permissions.IsAuthenticated,)
 
@@ -240,6 +322,13 @@ class ProjectDetailViewSet(BaseAPIView):
                     'type': 'string',
                     'paramType': 'query'
                 },
+                {
+                    'name': 'search',
+                    'required': False,
+                    'description': 'query on task returning the best matching tasks first, without a next page',
+                    'type': 'string',
+                    'paramType': 'query'
+                },
                 {
                     'name': 'from',
                     'required': False,
@@ -254,12 +343,40 @@ class ProjectDetailViewSet(BaseAPIView):
                     'type': 'string',
                     'paramType': 'query'
                 },
+                {
+                    'name': 'tz',
+                    'required': False,
+                    'description': 'time zone of the from and to dates, e.g. Asia/Kolkata',
+                    'type': 'string',
+                    'paramType': 'query'
+                },
                 {
                     'name': 'status',
                     'required': False,
                     'description': 'query on status',
                     'type': 'string',
                     'paramType': 'query'
+                },
+                {
+                    'name': 'cursor',
+                    'required': False,
+                    'description': 'cursor of the page to fetch, taken from `next`',
+                    'type': 'string',
+                    'paramType': 'query'
+                },
+                {
+                    'name': 'page_size',
+                    'required': False,
+                    'description': 'number of tasks per page',
+                    'type': 'integer',
+                    'paramType': 'query'
+                },
+                {
+                    'name': 'stream',
+                    'required': False,
+                    'description': 'stream every task in one response instead of paginating',
+                    'type': 'boolean',
+                    'paramType': 'query'
                 }
             ]
         },
@@ -287,32 +404,67 @@ class ProjectDetailViewSet(BaseAPIView):
         """
         try:
             query = request.GET.get("q", "")
-            from_date = request.GET.get("from", "")
-            to_date = request.GET.get("to", "")
-            task_status = request.GET.get("status", "")
+            params = self.get_query_params(TaskFilterSerializer)
             project = Project.objects.get(pk=pk, user=request.user, delete=False)
-            project.viewed = project.viewed + 1
-            project.save()
+            view_counter.incr(project)
+            # `viewed` changes on every read, so it is left out of the ETag
+            etag = conditional.make_etag(request, 'project', project.pk, project.version)
+            if conditional.is_not_modified(request, etag):
+                return conditional.not_modified(etag)
+
             project_serializer = ProjectSerializer(project, context=self.get_serializer_context())
             tasks = project.task_set.filter(delete=False).order_by('-created')
+            if query or 'to' in params:
+                # Searches and date ranges list the most viewed tasks first
+                tasks = tasks.order_by('-viewed', '-created')
             if query:
-                for q in query.split():
-                    tasks = tasks.filter(
-                        Q(seq__icontains=q) | Q(name__icontains=q) | Q(description__icontains=q)
-                    ).distinct().order_by('-viewed', '-created')
-
-            if from_date and to_date:
-                tasks = tasks.filter(
-                    created__date__gte=datetime.strptime(from_date, "%Y-%m-%d").date(),
-                    created__date__lte=datetime.strptime(to_date, "%Y-%m-%d").date(),
-                ).distinct().order_by('-viewed', '-created')
-            elif from_date and not to_date:
-                tasks = tasks.filter(created__date=datetime.strptime(from_date, "%Y-%m-%d").date())
-
-            if task_status:
-                tasks = tasks.filter(status=int(task_status))
-
-            task_serializer = TaskSerializer(tasks, many=True, context=self.get_serializer_context())
+                tasks = search.get_backend().filter(tasks, search.TASK, query)
+
+            if 'from' in params:
+                # Half-open range of timestamps, so the filter can use the index on `created`
+                first = params['from']
+                start, end = dates.day_range(first, params.get('to', first), params.get('tz') or dates.get_timezone())
+                tasks = tasks.filter(created__gte=start, created__lt=end)
+
+            if 'status' in params:
+                tasks = tasks.filter(status=params['status'])
+
+            compiled = get_compiled(TaskSerializer)
+            ranked = request.GET.get("search", "")
+            if ranked:
+                paginator = KeysetPagination()
+                tasks = search.get_backend().rank(
+                    compiled.values(tasks), search.TASK, ranked, paginator.get_page_size(request), project_id=project.pk
+                )
+                content = {
+                    'status': {
+                        'isSuccess': True,
+                        'code': "SUCCESS",
+                        'message': "Success"
+                    },
+                    'project': project_serializer.data,
+                    'tasks': compiled.serialize(tasks),
+                    'next': None
+                }
+                return Response(content, status.HTTP_200_OK, headers={'ETag': etag})
+
+            if request.GET.get("stream"):
+                content = {
+                    'status': {
+                        'isSuccess': True,
+                        'code': "SUCCESS",
+                        'message': "Success"
+                    },
+                    'project': project_serializer.data,
+                    'next': None
+                }
+                chunks = serialize_in_chunks(compiled.values(tasks), partial(compiled.serialize, memo={}))
+                response = StreamingJSONResponse(content, 'tasks', chunks)
+                response['ETag'] = etag
+                return response
+
+            paginator = KeysetPagination()
+            tasks = paginator.paginate_queryset(compiled.values(tasks), request, view=self)
             content = {
                 'status': {
                     'isSuccess': True,
@@ -320,9 +472,12 @@ class ProjectDetailViewSet(BaseAPIView):
                     'message': "Success"
                 },
                 'project': project_serializer.data,
-                'tasks': task_serializer.data
+                'tasks': compiled.serialize(tasks),
+                'next': paginator.get_next_link()
             }
-            return Response(content, status.HTTP_200_OK)
+            return Response(content, status.HTTP_200_OK, headers={'ETag': etag})
+        except exceptions.ValidationError:
+            raise
         except:
             content = {
                 'status': {
@@ -342,6 +497,7 @@ class ProjectDetailViewSet(BaseAPIView):
             serializer = ProjectCreateSerializer(project, data=request.data)
             serializer.is_valid(raise_exception=True)
             serializer.save()
+            Project.objects.bump_version(project.pk)
             serializer = ProjectSerializer(project, context=self.get_serializer_context())
             content = {
                 'status': {
@@ -367,7 +523,7 @@ class ProjectDetailViewSet(BaseAPIView):
         Projects Endpoint for user to delete their Project
         """
         try:
-            project = Project.objects.filter(pk=pk, user=request.user).update(delete=True)
+            services.delete_project(request.user, pk)
             content = {
                 'status': {
                     'isSuccess': True,
@@ -387,6 +543,115 @@ class ProjectDetailViewSet(BaseAPIView):
             return Response(content, status.HTTP_200_OK)
 
 
+class ProjectCalendarViewSet(BaseAPIView):
+    permission_classes = (permissions.IsAuthenticated,)
+    intervals = {
+        'day': lambda day: day,
+        'week': lambda day: day - timedelta(days=day.weekday()),
+        'month': lambda day: day.replace(day=1),
+    }
+
+    api_docs = {
+        'get': {
+            'fields': [
+                {
+                    'name': 'from',
+                    'required': False,
+                    'description': 'first day to count',
+                    'type': 'string',
+                    'paramType': 'query'
+                },
+                {
+                    'name': 'to',
+                    'required': False,
+                    'description': 'last day to count',
+                    'type': 'string',
+                    'paramType': 'query'
+                },
+                {
+                    'name': 'tz',
+                    'required': False,
+                    'description': 'time zone of the days, e.g. Asia/Kolkata',
+                    'type': 'string',
+                    'paramType': 'query'
+                },
+                {
+                    'name': 'interval',
+                    'required': False,
+                    'description': 'day, week or month',
+                    'type': 'string',
+                    'paramType': 'query'
+                }
+            ]
+        }
+    }
+
+    def get_counts(self, project, first, last, tz):
+        if getattr(tz, 'zone', None) == getattr(dates.get_bucket_timezone(), 'zone', None):
+            buckets = TaskDayBucket.objects.filter(project=project, count__gt=0)
+            if first:
+                buckets = buckets.filter(day__gte=first)
+            if last:
+                buckets = buckets.filter(day__lte=last)
+            return buckets.order_by('day').values_list('day', 'count')
+
+        # The buckets are counted in the default time zone, other zones are counted from the tasks
+        start, end = dates.day_range(first, last, tz)
+        tasks = project.task_set.filter(delete=False)
+        if start:
+            tasks = tasks.filter(created__gte=start)
+        if end:
+            tasks = tasks.filter(created__lt=end)
+        counts = {}
+        for created in tasks.values_list('created', flat=True).iterator():
+            day = dates.local_day(created, tz)
+            counts[day] = counts.get(day, 0) + 1
+        return sorted(counts.items())
+
+    def get(self, request, pk):
+        """
+        Projects Endpoint for user to get the number of tasks created per day, week or month
+        """
+        try:
+            params = self.get_query_params(CalendarSerializer)
+            grouper = self.intervals[params.get('interval', 'day')]
+            tz = params.get('tz') or dates.get_timezone()
+            project = Project.objects.get(pk=pk, user=request.user, delete=False)
+            etag = conditional.make_etag(request, 'calendar', project.pk, project.version)
+            if conditional.is_not_modified(request, etag):
+                return conditional.not_modified(etag)
+
+            counts = self.get_counts(project, params.get('from'), params.get('to'), tz)
+            days = []
+            for day, count in counts:
+                day = grouper(day)
+                if days and days[-1]['day'] == day:
+                    days[-1]['count'] += count
+                else:
+                    days.append({'day': day, 'count': count})
+            content = {
+                'status': {
+                    'isSuccess': True,
+                    'code': "SUCCESS",
+                    'message': "Success"
+                },
+                'days': days,
+                'total': sum(item['count'] for item in days)
+            }
+            return Response(content, status.HTTP_200_OK, headers={'ETag': etag})
+        except exceptions.ValidationError:
+            raise
+        except:
+            content = {
+                'status': {
+                    'isSuccess': False,
+                    'code': "FAILURE",
+                    'message': "Not Found"
+                }
+            }
+            return Response(content, status.HTTP_200_OK)
+
+
 class TaskCreateViewSet(BaseAPIView):
     permission_classes = (permissions.IsAuthenticated,)
 
@@ -419,17 +684,9 @@ class TaskCreateViewSet(BaseAPIView):
         """
         Tasks Endpoint for user to create task of a project
         """
-        serializer = TaskCreateSerializer(data=request.data)
+        serializer = TaskCreateSerializer(data=request.data, context=self.get_serializer_context())
         serializer.is_valid(raise_exception=True)
-        project = serializer.validated_data['project']
-        seq = "{}-{}".format(project.project_initial, project.task_set.all().count()+1)
-        task = Task.objects.create(
-            seq=seq,
-            name=serializer.validated_data['name'],
-            project=serializer.validated_data['project'],
-            description=serializer.validated_data['description'],
-            user=request.user
-        )
+        task = services.create_tasks(request.user, [serializer.validated_data])[0]
         serializer = TaskSerializer(task, context=self.get_serializer_context())
         content = {
             'status': {
@@ -475,9 +732,8 @@ class TaskDetailViewSet(BaseAPIView):
         Tasks Endpoint for user to get a task of project
         """
         try:
-            task = Task.objects.get(pk=pk, user=request.user)
-            task.viewed = task.viewed + 1
-            task.save()
+            task = Task.objects.get(pk=pk, user=request.user, delete=False, project__delete=False)
+            view_counter.incr(task)
             serializer = TaskSerializer(task, context=self.get_serializer_context())
             content = {
                 'status': {
@@ -503,10 +759,10 @@ class TaskDetailViewSet(BaseAPIView):
         Tasks Endpoint for user to update a task of project
         """
         try:
-            task = Task.objects.get(pk=pk, user=request.user)
+            task = Task.objects.get(pk=pk, user=request.user, delete=False, project__delete=False)
             serializer = TaskEditSerializer(task, data=request.data)
             serializer.is_valid(raise_exception=True)
-            serializer.save()
+            services.update_tasks(request.user, [(task, serializer.validated_data)])
             serializer = TaskSerializer(task, context=self.get_serializer_context())
             content = {
                 'status': {
@@ -532,7 +788,7 @@ class TaskDetailViewSet(BaseAPIView):
         Tasks Endpoint for user to delete a task of project
         """
         try:
-            task = Task.objects.filter(pk=pk, user=request.user).update(delete=True)
+            services.delete_tasks(request.user, [pk])
             content = {
                 'status': {
                     'isSuccess': True,
@@ -550,3 +806,351 @@ class TaskDetailViewSet(BaseAPIView):
                 }
             }
             return Response(content, status.HTTP_200_OK)
+
+
+class TaskBulkViewSet(BaseAPIView):
+    permission_classes = (permissions.IsAuthenticated,)
+    max_items = 500
+
+    api_docs = {
+        'post':{
+            'fields': [
+                {
+                    'name': 'create',
+                    'required': False,
+                    'description': 'list of tasks to create, each with name, description and project',
+                    'type': 'array',
+                    'paramType': 'body'
+                },
+                {
+                    'name': 'update',
+                    'required': False,
+                    'description': 'list of tasks to update, each with id, name and description',
+                    'type': 'array',
+                    'paramType': 'body'
+                },
+                {
+                    'name': 'delete',
+                    'required': False,
+                    'description': 'list of task ids to delete',
+                    'type': 'array',
+                    'paramType': 'body'
+                },
+            ]
+        }
+    }
+
+    def get_items(self, request, key):
+        items = request.data.get(key) or []
+        if not isinstance(items, list):
+            raise exceptions.ValidationError({key: "Expected a list."})
+        if len(items) > self.max_items:
+            raise exceptions.ValidationError({key: "At most {} items are allowed.".format(self.max_items)})
+        return items
+
+    def get_update_id(self, data):
+        """
+        Return the `id` of an update item, validated like the delete ids, or
+        None when it is missing or malformed.
+        """
+        if not isinstance(data, dict):
+            return None
+        try:
+            return serializers.IntegerField().run_validation(data.get('id'))
+        except exceptions.ValidationError:
+            return None
+
+    def get_result(self, is_success, message, **kwargs):
+        result = {
+            'status': {
+                'isSuccess': is_success,
+                'code': "SUCCESS" if is_success else "FAILURE",
+                'message': message
+            }
+        }
+        result.update(kwargs)
+        return result
+
+    def post(self, request):
+        """
+        Tasks Endpoint for user to create, update and delete many tasks in one transaction
+        """
+        create_items = self.get_items(request, 'create')
+        update_items = self.get_items(request, 'update')
+        serializer = TaskBulkDeleteSerializer(data={'delete': self.get_items(request, 'delete')})
+        serializer.is_valid(raise_exception=True)
+        delete_items = serializer.validated_data['delete']
+        context = self.get_serializer_context()
+
+        create_results = [None] * len(create_items)
+        creates = []
+        for index, data in enumerate(create_items):
+            serializer = TaskCreateSerializer(data=data, context=context)
+            if serializer.is_valid():
+                creates.append((index, serializer.validated_data))
+            else:
+                create_results[index] = self.get_result(False, "Invalid", errors=serializer.errors)
+
+        update_results = [None] * len(update_items)
+        ids = [self.get_update_id(data) for data in update_items]
+        tasks = TaskSerializer.setup_eager_loading(Task.objects.filter(
+            pk__in=[pk for pk in ids if pk is not None], user=request.user, delete=False, project__delete=False
+        ))
+        tasks = dict((task.pk, task) for task in tasks)
+        updates = []
+        for index, data in enumerate(update_items):
+            task = tasks.pop(ids[index], None) if ids[index] is not None else None
+            if task is None:
+                update_results[index] = self.get_result(False, "Not Found")
+                continue
+            serializer = TaskEditSerializer(task, data=data)
+            if serializer.is_valid():
+                updates.append((index, task, serializer.validated_data))
+            else:
+                update_results[index] = self.get_result(False, "Invalid", id=task.pk, errors=serializer.errors)
+
+        with transaction.atomic():
+            created = services.create_tasks(request.user, [data for index, data in creates]) if creates else []
+            if updates:
+                services.update_tasks(request.user, [(task, data) for index, task, data in updates])
+            deleted = set(services.delete_tasks(request.user, delete_items)) if delete_items else set()
+
+        for (index, data), task in zip(creates, created):
+            create_results[index] = self.get_result(True, "Success", task=TaskSerializer(task, context=context).data)
+        for index, task, data in updates:
+            update_results[index] = self.get_result(True, "Success", id=task.pk, task=TaskSerializer(task, context=context).data)
+        delete_results = [
+            self.get_result(pk in deleted, "Success" if pk in deleted else "Not Found", id=pk) for pk in delete_items
+        ]
+
+        content = {
+            'status': {
+                'isSuccess': True,
+                'code': "SUCCESS",
+                'message': "Success"
+            },
+            'create': create_results,
+            'update': update_results,
+            'delete': delete_results
+        }
+        return Response(content, status.HTTP_200_OK)
+
+
+class SyncViewSet(BaseAPIView):
+    """
+    Change feed of the projects and tasks of the user. Every row written
+    after the `since` cursor is returned once, in `(change_seq, id)` order;
+    deleted rows only by id, under `deleted`. Change numbers are handed out
+    per user under a lock held until the write commits (`ChangeCounter`),
+    so no write can become visible behind the cursor.
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+
+    api_docs = {
+        'get': {
+            'fields': [
+                {
+                    'name': 'since',
+                    'required': False,
+                    'description': 'cursor of the previous response, omit for a full snapshot',
+                    'type': 'string',
+                    'paramType': 'query'
+                },
+                {
+                    'name': 'limit',
+                    'required': False,
+                    'description': 'maximum number of projects and of tasks returned',
+                    'type': 'integer',
+                    'paramType': 'query'
+                },
+            ]
+        }
+    }
+
+    @property
+    def options(self):
+        options = {'PAGE_SIZE': 500, 'MAX_PAGE_SIZE': 1000}
+        options.update(getattr(settings, 'SYNC', {}))
+        return options
+
+    def get_limit(self, request):
+        options = self.options
+        try:
+            limit = int(request.GET.get('limit', options['PAGE_SIZE']))
+        except ValueError:
+            limit = options['PAGE_SIZE']
+        return min(limit, options['MAX_PAGE_SIZE']) if limit > 0 else options['PAGE_SIZE']
+
+    def get_changes(self, queryset, position, limit):
+        """
+        Return up to `limit` `.values()` rows of `queryset` written after the
+        `[change_seq, id]` position, and the new position.
+        """
+        queryset = queryset.order_by('change_seq', 'pk')
+        if position[0] is not None:
+            queryset = queryset.filter(KeysetPagination().get_keyset_filter(queryset, ['change_seq', 'pk'], position))
+        rows = list(queryset[:limit + 1])
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if rows:
+            position = [rows[-1]['change_seq'], rows[-1]['id']]
+        return rows, position, more
+
+    def is_position(self, values):
+        # Cursors of the former `(modified, id)` feed hold dates instead
+        return all(
+            value is None or isinstance(value, six.integer_types) and not isinstance(value, bool) for value in values
+        )
+
+    def is_deleted(self, row):
+        # Tasks of a deleted project are flagged later by `purge_deleted`
+        return row['delete'] or row.get('project__delete', False)
+
+    def get(self, request):
+        """
+        Sync Endpoint for user to get the Projects and Tasks changed since a cursor
+        """
+        since = request.GET.get("since", "")
+        limit = self.get_limit(request)
+        now = timezone.now()
+        positions = [None, None, None, None]
+        reset = False
+        if since:
+            try:
+                values = decode_cursor(since)
+                synced = parse_datetime(values[0]) if len(values) == 5 else None
+            except (exceptions.ValidationError, TypeError, ValueError):
+                synced = None
+            if synced is None or timezone.is_naive(synced):
+                content = {
+                    'status': {
+                        'isSuccess': False,
+                        'code': "FAILURE",
+                        'message': "Invalid cursor"
+                    }
+                }
+                return Response(content, status.HTTP_200_OK)
+            # Tombstones older than the retention window have been purged
+            if synced < now - timedelta(days=services.get_purge_options()['RETENTION_DAYS']):
+                reset = True
+            elif not self.is_position(values[1:]):
+                reset = True
+            else:
+                positions = values[1:]
+
+        project_compiled = get_compiled(ProjectSerializer)
+        projects, project_position, more_projects = self.get_changes(
+            project_compiled.values(Project.objects.filter(user=request.user)), positions[:2], limit
+        )
+        task_compiled = get_compiled(TaskSerializer)
+        tasks, task_position, more_tasks = self.get_changes(
+            task_compiled.values(Task.objects.filter(user=request.user)), positions[2:], limit
+        )
+
+        live_projects = ProjectSerializer.prefetch_task_counts([row for row in projects if not row['delete']])
+        memo = {}
+        content = {
+            'status': {
+                'isSuccess': True,
+                'code': "SUCCESS",
+                'message': "Success"
+            },
+            'reset': reset,
+            'projects': project_compiled.serialize(live_projects, memo),
+            'tasks': task_compiled.serialize([row for row in tasks if not self.is_deleted(row)], memo),
+            'deleted': {
+                'projects': [row['id'] for row in projects if row['delete']],
+                'tasks': [row['id'] for row in tasks if self.is_deleted(row)]
+            },
+            'since': encode_cursor([now] + project_position + task_position),
+            'more': more_projects or more_tasks
+        }
+        return Response(content, status.HTTP_200_OK)
+
+
+class EventStreamViewSet(BaseAPIView):
+    """
+    Server-sent events of the writes to the projects and tasks of the user,
+    or of one project with `?project=`. `EventSource` cannot send headers,
+    so the token may be passed as `?token=`, which puts it in the access
+    logs of the server and of proxies. Events carry ids only; clients
+    should read `/api/sync/` when the stream opens and on `resync` events.
+    """
+    authentication_classes = (QueryTokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+    renderer_classes = (metrics.JSONRenderer, events.EventStreamRenderer)
+
+    api_docs = {
+        'get': {
+            'fields': [
+                {
+                    'name': 'project',
+                    'required': False,
+                    'description': 'id of the project to follow, all projects of the user by default',
+                    'type': 'integer',
+                    'paramType': 'query'
+                },
+                {
+                    'name': 'token',
+                    'required': False,
+                    'description': 'authentication token, for clients that cannot set the Authorization header; it is written to access logs',
+                    'type': 'string',
+                    'paramType': 'query'
+                },
+            ]
+        }
+    }
+
+    def get(self, request):
+        """
+        Events Endpoint for user to follow the changes of their Projects and Tasks
+        """
+        project_id = request.GET.get("project", "")
+        if project_id:
+            if not project_id.isdigit() or not Project.objects.filter(pk=project_id, user=request.user, delete=False).exists():
+                content = {
+                    'status': {
+                        'isSuccess': False,
+                        'code': "FAILURE",
+                        'message': "Not Found"
+                    }
+                }
+                return Response(content, status.HTTP_200_OK)
+            channels = [events.project_channel(int(project_id))]
+        else:
+            channels = [events.user_channel(request.user.pk)]
+
+        options = events.get_options()
+        # Every stream holds a server thread, so a process only serves a few
+        subscription = events.hub.subscribe(channels, options['QUEUE_SIZE'], options['MAX_STREAMS'])
+        if subscription is None:
+            content = {
+                'status': {
+                    'isSuccess': False,
+                    'code': "FAILURE",
+                    'message': "Too many event streams, poll /api/sync/ instead"
+                }
+            }
+            return Response(content, status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '30'})
+        events.get_broker().start()
+
+        return events.EventStreamResponse(subscription, options)
+
+
+class MetricsViewSet(BaseAPIView):
+    """
+    Request metrics of this process in the Prometheus text format. When
+    `METRICS['TOKEN']` is set, scrapers must send it as a bearer token;
+    otherwise only staff users may read them.
+    """
+    exclude_from_schema = True
+
+    def get(self, request):
+        token = metrics.metrics.options['TOKEN']
+        if token:
+            allowed = constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), 'Bearer {}'.format(token))
+        else:
+            allowed = request.user and request.user.is_staff
+        if not allowed:
+            return HttpResponseForbidden()
+        return HttpResponse(metrics.metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,37 @@
+"""
+PostgreSQL backend with timed cursors whose connections come from
+`ticapi.db.pool`.
+"""
+from django.db.backends.postgresql import base
+
+from api.metrics import TimedDatabaseWrapperMixin
+from ticapi.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(TimedDatabaseWrapperMixin, PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        connection = super(DatabaseWrapper, self).get_new_connection(conn_params)
+        # Set by the base class only when it opens the connection
+        self.isolation_level = self.settings_dict['OPTIONS'].get('isolation_level', connection.isolation_level)
+        return connection
+
+    def ping_connection(self, connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if connection.get_transaction_status() != base.Database.extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+            return True
+        except base.Database.Error:
+            return False
+
+    def reset_connection(self, connection):
+        if connection.closed:
+            return False
+        try:
+            if connection.get_transaction_status() != base.Database.extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+            return True
+        except base.Database.Error:
+            return False
@@ -0,0 +1,15 @@
+"""
+SQLite backend with timed cursors whose connections come from
+`ticapi.db.pool`. In-memory databases, such as the test database, are not
+pooled.
+"""
+from django.db.backends.sqlite3 import base
+
+from api.metrics import TimedDatabaseWrapperMixin
+from ticapi.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(TimedDatabaseWrapperMixin, PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+
+    def is_pooled(self):
+        return not self.is_in_memory_db() and super(DatabaseWrapper, self).is_pooled()
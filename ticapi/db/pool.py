@@ -0,0 +1,281 @@
+"""
+Process-wide pools of database connections shared by the threads of a
+worker.
+
+Django keeps one connection per thread and alias. With the backends of
+`ticapi.db.backends` and `DATABASE_POOL['ENABLED']` set, a thread instead
+checks a connection out of the pool of its alias when it first queries and
+returns it when Django closes the connection, at the end of every request
+(`CONN_MAX_AGE` is 0). A
+process never opens more than `MAX_SIZE` connections per alias; a thread
+that finds them all in use waits up to `TIMEOUT` seconds and then fails
+with an `OperationalError`. Idle connections are pinged before they are
+handed out (`PRE_PING`) and replaced after `MAX_AGE` seconds.
+"""
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from api.metrics import metrics
+
+
+def get_options():
+    options = {'ENABLED': False, 'MAX_SIZE': 16, 'TIMEOUT': 5, 'MAX_AGE': 600, 'PRE_PING': True}
+    options.update(getattr(settings, 'DATABASE_POOL', {}))
+    return options
+
+
+class ConnectionPool(object):
+    """
+    Bounded LIFO pool of raw DB-API connections. `ping(connection)` and
+    `close(connection)` are supplied by the backend; `error_class` is the
+    driver's `OperationalError`, which Django turns into its own.
+    """
+
+    def __init__(self, alias, ping, close, error_class, max_size=16, timeout=5, max_age=600, pre_ping=True):
+        self.alias = alias
+        self.ping = ping
+        self.close = close
+        self.error_class = error_class
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_age = max_age
+        self.pre_ping = pre_ping
+        self.condition = threading.Condition()
+        self.pid = os.getpid()
+        self.idle = []
+        self.opened = {}
+        self.size = 0
+        self.waiting = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.ping_failures = 0
+        self.wait_time = 0
+
+    def check_pid(self):
+        # A forked child must not share the sockets of its parent; they are
+        # left to the parent rather than closed.
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.idle = []
+            self.opened = {}
+            self.size = 0
+            self.checkouts = self.timeouts = self.connects = self.ping_failures = 0
+            self.wait_time = 0
+
+    def acquire(self, start):
+        """
+        Return an idle connection, or None once a slot for a new one is
+        reserved.
+        """
+        with self.condition:
+            self.check_pid()
+            while True:
+                if self.idle:
+                    connection = self.idle.pop()
+                    break
+                if self.size < self.max_size:
+                    self.size += 1
+                    connection = None
+                    break
+                remaining = start + self.timeout - time.time()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise self.error_class(
+                        "No connection of the '{}' pool was free within {}s ({} in use).".format(
+                            self.alias, self.timeout, self.size
+                        )
+                    )
+                self.waiting += 1
+                try:
+                    self.condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            self.checkouts += 1
+            self.wait_time += time.time() - start
+        return connection
+
+    def checkout(self, connect):
+        """
+        Return a live connection, opening one with `connect()` when none is
+        idle and the pool is not full.
+        """
+        start = time.time()
+        while True:
+            connection = self.acquire(start)
+            if connection is None:
+                try:
+                    connection = connect()
+                except Exception:
+                    self.forget(None)
+                    raise
+                with self.condition:
+                    self.opened[id(connection)] = time.time()
+                    self.connects += 1
+                return connection
+            if time.time() - self.opened.get(id(connection), 0) > self.max_age:
+                self.discard(connection)
+            elif self.pre_ping and not self.ping(connection):
+                with self.condition:
+                    self.ping_failures += 1
+                self.discard(connection)
+            else:
+                return connection
+
+    def checkin(self, connection, reusable=True):
+        with self.condition:
+            opened = self.opened.get(id(connection))
+            if reusable and opened is not None and self.pid == os.getpid() and time.time() - opened <= self.max_age:
+                self.idle.append(connection)
+                self.condition.notify()
+                return
+        self.discard(connection)
+
+    def discard(self, connection):
+        try:
+            self.close(connection)
+        except Exception:
+            pass
+        self.forget(connection)
+
+    def forget(self, connection):
+        with self.condition:
+            if connection is None or self.opened.pop(id(connection), None) is not None:
+                self.size -= 1
+            self.condition.notify()
+
+    def close_idle(self):
+        with self.condition:
+            self.check_pid()
+            idle, self.idle = self.idle, []
+        for connection in idle:
+            self.discard(connection)
+        return len(idle)
+
+    def stats(self):
+        with self.condition:
+            return {
+                'max_size': self.max_size,
+                'idle': len(self.idle),
+                'in_use': self.size - len(self.idle),
+                'waiting': self.waiting,
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'connects': self.connects,
+                'ping_failures': self.ping_failures,
+                'wait_time': self.wait_time,
+            }
+
+
+pools = {}
+_lock = threading.Lock()
+
+
+def get_pool(wrapper):
+    """
+    Return the pool of the alias of the `DatabaseWrapper` `wrapper`.
+    """
+    pool = pools.get(wrapper.alias)
+    if pool is None:
+        with _lock:
+            pool = pools.get(wrapper.alias)
+            if pool is None:
+                options = get_options()
+                pool = pools[wrapper.alias] = ConnectionPool(
+                    wrapper.alias, wrapper.ping_connection, wrapper.close_connection, wrapper.Database.OperationalError,
+                    max_size=options['MAX_SIZE'], timeout=options['TIMEOUT'], max_age=options['MAX_AGE'],
+                    pre_ping=options['PRE_PING']
+                )
+    return pool
+
+
+def close_idle_connections():
+    """
+    Close the idle connections of every pool, e.g. in the master before
+    gunicorn forks its workers.
+    """
+    return sum(pool.close_idle() for pool in list(pools.values()))
+
+
+class PooledDatabaseWrapperMixin(object):
+    """
+    Mixin of a backend's `DatabaseWrapper` that takes its connections from
+    the pool of its alias when `DATABASE_POOL['ENABLED']` is set. Backends
+    may turn pooling off with `is_pooled`, and override `ping_connection`
+    and `reset_connection` where the driver can tell the state of a
+    connection without a round trip.
+    """
+
+    def is_pooled(self):
+        return get_options()['ENABLED']
+
+    def ping_connection(self, connection):
+        """
+        Return whether an idle connection still answers.
+        """
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute('SELECT 1')
+            finally:
+                cursor.close()
+        except self.Database.Error:
+            return False
+        return self.reset_connection(connection)
+
+    def reset_connection(self, connection):
+        """
+        Prepare a connection for its next user; return False if it is broken.
+        """
+        try:
+            connection.rollback()
+        except self.Database.Error:
+            return False
+        return True
+
+    def close_connection(self, connection):
+        connection.close()
+
+    def get_unpooled_connection(self, conn_params):
+        """
+        Open a connection the pool knows nothing of, for a long-lived user
+        such as a LISTEN thread, which would otherwise hold a slot for good.
+        """
+        return super(PooledDatabaseWrapperMixin, self).get_new_connection(conn_params)
+
+    def get_new_connection(self, conn_params):
+        if not self.is_pooled():
+            return self.get_unpooled_connection(conn_params)
+        return get_pool(self).checkout(lambda: self.get_unpooled_connection(conn_params))
+
+    def _close(self):
+        if self.connection is None or not self.is_pooled():
+            return super(PooledDatabaseWrapperMixin, self)._close()
+        # Closed inside `atomic`, the wrapper keeps the connection until the
+        # block exits, so it cannot be handed to another thread.
+        reusable = not self.in_atomic_block and self.reset_connection(self.connection)
+        with self.wrap_database_errors:
+            get_pool(self).checkin(self.connection, reusable)
+
+
+@metrics.register_collector
+def collect_pools():
+    stats = [(alias, pool.stats()) for alias, pool in sorted(pools.items())]
+    by_alias = lambda name: dict(((('alias', alias),), values[name]) for alias, values in stats)
+    connections = {}
+    for alias, values in stats:
+        connections[(('alias', alias), ('state', 'idle'))] = values['idle']
+        connections[(('alias', alias), ('state', 'in_use'))] = values['in_use']
+    return [
+        ('ticapi_db_pool_connections', "Open pooled database connections.", connections),
+        ('ticapi_db_pool_max_size', "Most connections a pool opens.", by_alias('max_size')),
+        ('ticapi_db_pool_waiting', "Threads waiting for a pooled connection.", by_alias('waiting')),
+        ('ticapi_db_pool_checkouts', "Connections handed out since the process started.", by_alias('checkouts')),
+        ('ticapi_db_pool_timeouts', "Checkouts that gave up waiting for a connection.", by_alias('timeouts')),
+        ('ticapi_db_pool_connects', "Connections opened by the pool.", by_alias('connects')),
+        ('ticapi_db_pool_ping_failures', "Idle connections found dead by the pre-ping.", by_alias('ping_failures')),
+        ('ticapi_db_pool_wait_seconds', "Time spent waiting for connections.", by_alias('wait_time')),
+    ]
@@ -0,0 +1,70 @@
+"""
+Gunicorn settings for ticapi.
+
+By default every worker process serves requests from a bounded pool of
+threads (the `gthread` worker), so a request waiting on the database only
+holds one thread and idle keep-alive connections are parked in the worker's
+event loop. Set GUNICORN_WORKER_CLASS=sync to go back to one request per
+process.
+
+The application is loaded and warmed up (`ticapi.warmup`) in the master
+before the workers are forked, so they start warm and share its memory.
+Set GUNICORN_PRELOAD=0 to load it in every worker instead, e.g. to let
+`--reload` pick up code changes. Startup time and the memory of the master
+and of every worker are logged.
+
+For more information on this file, see
+http://docs.gunicorn.org/en/19.7.1/settings.html
+"""
+
+import multiprocessing
+import os
+import time
+
+started = time.time()
+
+bind = '0.0.0.0:{}'.format(os.environ.get('PORT', '8000'))
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+cpu_count = multiprocessing.cpu_count()
+# Threads overlap the I/O waits of a process but not its Python work, so a
+# threaded server wants about one process per core; a sync one needs more.
+default_workers = cpu_count + 1 if worker_class == 'gthread' else cpu_count * 2 + 1
+workers = int(os.environ.get('WEB_CONCURRENCY', min(default_workers, int(os.environ.get('GUNICORN_MAX_WORKERS', 8)))))
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 75))
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+
+# The request line of the access log includes the query string, and with it
+# the `?token=` of /api/events/ (api.authentication.QueryTokenAuthentication).
+accesslog = os.environ.get('GUNICORN_ACCESSLOG')
+
+
+def when_ready(server):
+    # Runs in the master once the application is loaded, before any fork
+    from ticapi import warmup
+
+    if server.cfg.preload_app:
+        timings = warmup.warm_up()
+        server.log.info("Warmed up in the master: %s", warmup.format_timings(timings))
+    server.log.info(
+        "Ready in %.2fs with %s %s workers x %s threads; master %s",
+        time.time() - started, server.num_workers, server.cfg.worker_class_str, server.cfg.threads,
+        warmup.format_memory(warmup.memory_usage())
+    )
+
+
+def post_worker_init(worker):
+    from ticapi import warmup
+
+    if not worker.cfg.preload_app:
+        timings = warmup.warm_up()
+        worker.log.info("Worker %s warmed up: %s", worker.pid, warmup.format_timings(timings))
+    # With the pooled database backends the first request finds a connection ready
+    warmup.open_connections()
+    worker.log.info("Worker %s booted %.2fs after start; %s", worker.pid, time.time() - started,
+                    warmup.format_memory(warmup.memory_usage()))
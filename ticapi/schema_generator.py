@@ -5,12 +5,22 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_swagger import renderers
 
+import hashlib
+import threading
 import urlparse
+from collections import OrderedDict
+
 import coreapi
+from django.http import HttpResponseNotModified
+from django.urls import get_resolver
+from django.utils.cache import patch_vary_headers
+from django.utils.http import quote_etag
 from rest_framework.schemas import SchemaGenerator
 from openapi_codec.utils import get_location
 from openapi_codec import encode
 
+from api.conditional import is_not_modified
+
 
 def _custom_get_responses(link):
     if not link.action in link._api_docs:
@@ -98,6 +108,55 @@ class CustomSchemaGenerator(SchemaGenerator):
         return view.api_docs if hasattr(view, 'api_docs') else {}
 
 
+def get_variant(request):
+    """
+    The schema only lists the views the user may call, so anonymous and
+    authenticated users get different documents.
+    """
+    return 'user' if request.user and request.user.is_authenticated else 'anonymous'
+
+
+class SchemaCache(object):
+    """
+    Generated schemas and their ETags, kept until the URL configuration
+    changes, per requested URI, renderer and user variant.
+    """
+    maxsize = 64
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get_key(self, request, url):
+        # Without a url the document is addressed by the requested URI
+        return (url or request.build_absolute_uri(), request.accepted_renderer.format, get_variant(request))
+
+    def get(self, request, title, url):
+        resolver = get_resolver(getattr(request, 'urlconf', None))
+        key = self.get_key(request, url)
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is not None and entry[0] is resolver:
+            return entry[1], entry[2]
+
+        generator = CustomSchemaGenerator(title=title, url=url)  # this is altered line
+        schema = generator.get_schema(request=request)
+        digest = hashlib.md5(CoreJSONRenderer().render(schema, renderer_context={})).hexdigest() if schema else None
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (resolver, schema, digest)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return schema, digest
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+schema_cache = SchemaCache()
+
+
 def get_swagger_view(title=None, url=None):
     """
     Returns schema view which renders Swagger/OpenAPI.
@@ -114,12 +173,22 @@ def get_swagger_view(title=None, url=None):
         ]
 
         def get(self, request):
-            generator = CustomSchemaGenerator(title=title, url=url)  # this is altered line
-            schema = generator.get_schema(request=request)
+            schema, digest = schema_cache.get(request, title, url)
             if not schema:
                 raise exceptions.ValidationError(
                     'The schema generator did not return a schema   Document'
                 )
-            return Response(schema)
+            etag = quote_etag('{}-{}-{}'.format(digest, request.accepted_renderer.format, get_variant(request)))
+            if is_not_modified(request, etag):
+                response = HttpResponseNotModified()
+                response['ETag'] = etag
+                return response
+            return Response(schema, headers={'ETag': etag})
+
+        def finalize_response(self, request, response, *args, **kwargs):
+            response = super(SwaggerSchemaView, self).finalize_response(request, response, *args, **kwargs)
+            # The document depends on the negotiated renderer and on the user
+            patch_vary_headers(response, ('Accept', 'Authorization'))
+            return response
 
     return SwaggerSchemaView.as_view()
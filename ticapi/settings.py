@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -52,7 +53,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware'
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'api.profiling.ProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'ticapi.urls'
@@ -79,6 +81,27 @@ WSGI_APPLICATION = 'ticapi.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/1.11/ref/settings/#databases
 
+# The ticapi.db.backends engines time every query for api.metrics. With
+# DATABASE_POOL=1 they also share connections between the threads of a
+# process through a pool (ticapi.db.pool) of at most MAX_SIZE connections
+# per database, by default one per gunicorn thread. A thread waits up to
+# TIMEOUT seconds for one; idle connections are pinged before reuse
+# (PRE_PING) and replaced after MAX_AGE seconds. By default every thread
+# keeps one persistent connection.
+DATABASE_POOL = {
+    'ENABLED': os.environ.get('DATABASE_POOL', '0') != '0',
+    'MAX_SIZE': int(os.environ.get('DATABASE_POOL_SIZE', 16)),
+    'TIMEOUT': 5,
+    'MAX_AGE': 600,
+    'PRE_PING': True,
+}
+
+ENGINES = {
+    'django.db.backends.postgresql': 'ticapi.db.backends.postgresql',
+    'django.db.backends.postgresql_psycopg2': 'ticapi.db.backends.postgresql',
+    'django.db.backends.sqlite3': 'ticapi.db.backends.sqlite3',
+}
+
 if DEBUG:
     DATABASES = {
         'default': {
@@ -88,9 +111,12 @@ if DEBUG:
     }
 else:
     DATABASES = {
-        'default': dj_database_url.config(conn_max_age=600),
+        'default': dj_database_url.config(conn_max_age=0 if DATABASE_POOL['ENABLED'] else 600),
     }
 
+for database in DATABASES.values():
+    database['ENGINE'] = ENGINES.get(database['ENGINE'], database['ENGINE'])
+
 
 # Password validation
 # https://docs.djangoproject.com/en/1.11/ref/settings/#auth-password-validators
@@ -120,7 +146,7 @@ REST_FRAMEWORK = {
     # 'EXCEPTION_HANDLER': 'sides.exception.custom_exception_handler',
     'PAGE_SIZE': 100,
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated'
@@ -145,6 +171,72 @@ SWAGGER_SETTINGS = {
     "SHOW_REQUEST_HEADERS": True
 }
 
+# In-process token authentication cache (api.authentication), bounded to
+# MAXSIZE tokens that are re-read from the database after TTL seconds.
+# Deleting a token or deactivating a user only empties the cache of the
+# process that did it: every other gunicorn worker keeps accepting the
+# token for up to TTL seconds.
+TOKEN_CACHE = {
+    'MAXSIZE': 10000,
+    'TTL': 60,
+}
+
+# Write-behind `viewed` counters (api.counters), flushed every FLUSH_INTERVAL
+# seconds or once MAX_PENDING objects have unflushed views.
+VIEW_COUNTERS = {
+    'FLUSH_INTERVAL': 5,
+    'MAX_PENDING': 1000,
+}
+
+# Per-view request metrics (api.metrics) served at /api/metrics/, which
+# requires `Authorization: Bearer <TOKEN>` when a TOKEN is set and a staff
+# user otherwise.
+# SERVER_TIMING adds a Server-Timing header to every response.
+METRICS = {
+    'ENABLED': True,
+    'SERVER_TIMING': os.environ.get('METRICS_SERVER_TIMING') == '1',
+    'TOKEN': os.environ.get('METRICS_TOKEN'),
+}
+
+# Staff-only request profiler (api.profiling), triggered by the X-Profile
+# header or ?profile=sample|cprofile. Profiles are written to DIRECTORY
+# when set, otherwise returned in place of the response; the sampler
+# records a stack every INTERVAL seconds.
+PROFILER = {
+    'ENABLED': True,
+    'DIRECTORY': os.environ.get('PROFILER_DIRECTORY'),
+    'INTERVAL': 0.002,
+}
+
+# Soft deleted projects and tasks are moved to the archive tables by the
+# `purge_deleted` command RETENTION_DAYS after their deletion, BATCH_SIZE
+# rows per transaction.
+PURGE = {
+    'RETENTION_DAYS': 30,
+    'BATCH_SIZE': 500,
+}
+
+# Change feed at /api/sync/: at most PAGE_SIZE (MAX_PAGE_SIZE with ?limit=)
+# projects and tasks per response.
+SYNC = {
+    'PAGE_SIZE': 500,
+    'MAX_PAGE_SIZE': 1000,
+}
+
+# Server-sent events at /api/events/ (api.events). BROKER is the dotted path
+# of the broker class, PostgresBroker on PostgreSQL and LocalBroker (this
+# process only) elsewhere by default. Each process serves MAX_STREAMS
+# streams of at most MAX_AGE seconds, each buffering QUEUE_SIZE events.
+EVENTS = {
+    'ENABLED': True,
+    'BROKER': os.environ.get('EVENTS_BROKER'),
+    'QUEUE_SIZE': 100,
+    'HEARTBEAT': 15,
+    'MAX_AGE': 300,
+    'MAX_STREAMS': int(os.environ.get('EVENTS_MAX_STREAMS', 8)),
+    'RETRY': 3000,
+}
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/1.11/topics/i18n/
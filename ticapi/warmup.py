@@ -0,0 +1,150 @@
+"""
+Work done once before the first request, so gunicorn workers start warm.
+
+With `preload_app` gunicorn imports the application in the master process
+and `warm_up()` runs there before the workers are forked: the URL resolver
+is compiled, the serializers and the API schema are built, templates are
+loaded and the database driver is exercised. Forked workers share those
+pages with the master until they write to them.
+"""
+import gc
+import inspect
+import os
+import resource
+import sys
+import time
+from collections import OrderedDict
+
+from django.db import connections
+from django.template.loader import get_template
+from django.urls import get_resolver, resolve
+
+from ticapi.db.pool import close_idle_connections
+
+
+# Paths resolved at warm up; every one of them is matched against the patterns
+# in order, which compiles the regexes on the way.
+WARM_PATHS = (
+    '/api/projects/',
+    '/api/projects/1/',
+    '/api/tasks/1/',
+    '/api/sync/',
+    '/api/metrics/',
+    '/api-docs/',
+)
+
+
+def warm_resolver():
+    resolver = get_resolver()
+    # Populates the reverse lookup tables and imports every view module
+    resolver.reverse_dict
+    for path in WARM_PATHS:
+        resolve(path)
+
+
+def warm_serializers():
+    from rest_framework import serializers as drf_serializers
+
+    from api import serializers
+    from api.fast_serializers import get_compiled
+
+    for name, value in sorted(vars(serializers).items()):
+        if (inspect.isclass(value) and issubclass(value, drf_serializers.BaseSerializer)
+                and value.__module__ == serializers.__name__):
+            value(context={}).fields
+    get_compiled(serializers.ProjectSerializer)
+    get_compiled(serializers.TaskSerializer)
+
+
+def warm_schema():
+    from openapi_codec import OpenAPICodec
+
+    from ticapi.schema_generator import CustomSchemaGenerator
+
+    schema = CustomSchemaGenerator(title='tic API').get_schema(request=None)
+    if schema is not None:
+        OpenAPICodec().encode(schema)
+
+
+def warm_templates():
+    for name in ('home.html', 'app.html'):
+        get_template(name)
+
+
+def warm_database():
+    # Loads the driver and checks the database is reachable; the connection
+    # itself must not be inherited by the forked workers.
+    open_connections()
+    close_idle_connections()
+
+
+def open_connections():
+    """
+    Open a connection to every database and hand it back, to the pool of
+    the process when the pooled backends are used.
+    """
+    for connection in connections.all():
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    connections.close_all()
+
+
+STEPS = (
+    ('resolver', warm_resolver),
+    ('serializers', warm_serializers),
+    ('schema', warm_schema),
+    ('templates', warm_templates),
+    ('database', warm_database),
+)
+
+
+def warm_up():
+    """
+    Run every warm up step and return the seconds each one took.
+    """
+    timings = OrderedDict()
+    for name, step in STEPS:
+        start = time.time()
+        step()
+        timings[name] = time.time() - start
+    if hasattr(gc, 'freeze'):
+        # Python 3.7+: keep the collector from touching, and so copying,
+        # the objects created so far in every worker
+        gc.freeze()
+    return timings
+
+
+def memory_usage(pid=None):
+    """
+    Return the `rss`, `pss`, `shared` and `private` memory of a process in
+    bytes. PSS splits every shared page between the processes sharing it, so
+    the sum over the workers is their real footprint. Without
+    `/proc/<pid>/smaps_rollup` only the peak RSS of the current process is
+    known.
+    """
+    path = '/proc/{}/smaps_rollup'.format(pid or 'self')
+    if not os.path.exists(path):
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return OrderedDict([('max_rss', maxrss if sys.platform == 'darwin' else maxrss * 1024)])
+
+    values = {}
+    with open(path) as smaps:
+        for line in smaps:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    return OrderedDict([
+        ('rss', values.get('Rss', 0)),
+        ('pss', values.get('Pss', 0)),
+        ('shared', values.get('Shared_Clean', 0) + values.get('Shared_Dirty', 0)),
+        ('private', values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)),
+    ])
+
+
+def format_memory(usage):
+    return ' '.join('{}={:.1f}MB'.format(name, value / 1048576.0) for name, value in usage.items())
+
+
+def format_timings(timings):
+    return ' '.join('{}={:.0f}ms'.format(name, value * 1000) for name, value in timings.items())